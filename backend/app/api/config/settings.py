@@ -0,0 +1,125 @@
+import os
+import tempfile
+
+# Configurações lidas de variáveis de ambiente (com valores padrão para desenvolvimento)
+
+# Download de tiles
+TILE_MAX_CONCORRENCIA = int(os.getenv("TILE_MAX_CONCORRENCIA", "8"))
+TILE_TIMEOUT = float(os.getenv("TILE_TIMEOUT", "10"))
+TILE_PRAZO_TOTAL = float(os.getenv("TILE_PRAZO_TOTAL", "30"))
+
+# Origem dos tiles: "xyz" (servidor HTTP no modelo de URL), "mbtiles" (arquivo
+# local) ou "diretorio" ({z}/{x}/{y}.jpg|png|webp)
+TILE_PROVEDOR = os.getenv("TILE_PROVEDOR", "xyz")
+TILE_URL_MODELO = os.getenv("TILE_URL_MODELO", "https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}")
+TILE_MBTILES = os.getenv("TILE_MBTILES", "tiles.mbtiles")
+TILE_MBTILES_MMAP_BYTES = int(os.getenv("TILE_MBTILES_MMAP_BYTES", str(1024 * 1024 * 1024)))
+TILE_DIRETORIO = os.getenv("TILE_DIRETORIO", "tiles")
+
+# Cache de tiles em disco (compartilhado entre workers)
+TILE_CACHE_HABILITADO = os.getenv("TILE_CACHE_HABILITADO", "true").lower() == "true"
+TILE_CACHE_DIR = os.getenv("TILE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "sip_tile_cache"))
+TILE_CACHE_MAX_BYTES = int(os.getenv("TILE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+TILE_CACHE_TTL = float(os.getenv("TILE_CACHE_TTL", str(7 * 24 * 3600)))
+# Últimos acessos gravados em lote no índice; limite de bytes conferido por
+# estimativa local, com a soma completa refeita a cada N gravações
+TILE_CACHE_ACESSOS_POR_LOTE = int(os.getenv("TILE_CACHE_ACESSOS_POR_LOTE", "256"))
+TILE_CACHE_INTERVALO_ACESSOS = float(os.getenv("TILE_CACHE_INTERVALO_ACESSOS", "30"))
+TILE_CACHE_VERIFICAR_LIMITE_A_CADA = int(os.getenv("TILE_CACHE_VERIFICAR_LIMITE_A_CADA", "256"))
+
+# Cache em memória de tiles já decodificados (por processo)
+TILE_CACHE_MEMORIA_MAX_BYTES = int(os.getenv("TILE_CACHE_MEMORIA_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Cliente HTTP compartilhado (pool de conexões com keep-alive)
+HTTP_MAX_CONEXOES = int(os.getenv("HTTP_MAX_CONEXOES", "32"))
+HTTP_MAX_CONEXOES_POR_HOST = int(os.getenv("HTTP_MAX_CONEXOES_POR_HOST", "8"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_MAX_TENTATIVAS = int(os.getenv("HTTP_MAX_TENTATIVAS", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.25"))
+
+# Pool de navegadores headless (fallback via Selenium)
+CHROME_POOL_MAX = int(os.getenv("CHROME_POOL_MAX", "2"))
+CHROME_POOL_MAX_USOS = int(os.getenv("CHROME_POOL_MAX_USOS", "25"))
+CHROME_POOL_AQUECER = os.getenv("CHROME_POOL_AQUECER", "false").lower() == "true"
+CHROME_POOL_TIMEOUT_AQUISICAO = float(os.getenv("CHROME_POOL_TIMEOUT_AQUISICAO", "60"))
+CHROME_PRONTIDAO_TIMEOUT = float(os.getenv("CHROME_PRONTIDAO_TIMEOUT", "15"))
+CHROME_PRONTIDAO_JANELA_ESTAVEL = float(os.getenv("CHROME_PRONTIDAO_JANELA_ESTAVEL", "1.5"))
+
+# Cache de resultados de análise (Redis; sem REDIS_URL usa memória local)
+REDIS_URL = os.getenv("REDIS_URL")
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", str(24 * 3600)))
+RESULT_CACHE_PRECISAO = int(os.getenv("RESULT_CACHE_PRECISAO", "5"))  # casas decimais (~1 m)
+
+# Versão do modelo de detecção (invalida resultados em cache ao mudar)
+MODEL_VERSION = os.getenv("MODEL_VERSION", "0")
+
+# Persistência das análises (PostgreSQL em produção, ou SQLite); habilitada
+# quando DATABASE_URL está configurado
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+PERSISTENCIA_HABILITADA = os.getenv("PERSISTENCIA_HABILITADA", "true" if DATABASE_URL else "false").lower() == "true"
+REUSO_ANALISE_MAX_IDADE = float(os.getenv("REUSO_ANALISE_MAX_IDADE", str(7 * 24 * 3600)))
+
+# Inferência (detector de vagas, CPU)
+MODEL_PATH = os.getenv("MODEL_PATH", "models/parking_detector.pt")
+INFERENCIA_TAMANHO_ENTRADA = int(os.getenv("INFERENCIA_TAMANHO_ENTRADA", "1280"))
+INFERENCIA_CONFIANCA_MIN = float(os.getenv("INFERENCIA_CONFIANCA_MIN", "0.25"))
+INFERENCIA_IOU_NMS = float(os.getenv("INFERENCIA_IOU_NMS", "0.45"))
+INFERENCIA_MAX_LOTE = int(os.getenv("INFERENCIA_MAX_LOTE", "8"))
+INFERENCIA_MAX_ESPERA_MS = float(os.getenv("INFERENCIA_MAX_ESPERA_MS", "25"))
+INFERENCIA_THREADS = int(os.getenv("INFERENCIA_THREADS", str(os.cpu_count() or 1)))
+
+# Backend de inferência: "torch" (ultralytics), "onnx" ou "onnx-int8"
+INFERENCIA_BACKEND = os.getenv("INFERENCIA_BACKEND", "torch")
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", os.path.splitext(MODEL_PATH)[0] + ".onnx")
+ONNX_INT8_MODEL_PATH = os.getenv("ONNX_INT8_MODEL_PATH", os.path.splitext(MODEL_PATH)[0] + "-int8.onnx")
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", str(INFERENCIA_THREADS)))
+ONNX_INTER_OP_THREADS = int(os.getenv("ONNX_INTER_OP_THREADS", "1"))
+
+# Inferência fatiada (imagens maiores que a entrada do modelo)
+INFERENCIA_JANELA = int(os.getenv("INFERENCIA_JANELA", str(INFERENCIA_TAMANHO_ENTRADA)))
+INFERENCIA_SOBREPOSICAO = float(os.getenv("INFERENCIA_SOBREPOSICAO", "0.2"))
+
+# Mosaico guiado pelo polígono
+MOSAICO_MAX_TILES = int(os.getenv("MOSAICO_MAX_TILES", "400"))
+# Buffers NumPy reaproveitados na montagem dos mosaicos de polígono (bytes ociosos retidos)
+MOSAICO_POOL_MAX_BYTES = int(os.getenv("MOSAICO_POOL_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Planejamento de zoom: menor zoom em que a vaga tem pixels suficientes para
+# o detector, dentro do orçamento de tiles e pixels
+ZOOM_MIN = int(os.getenv("ZOOM_MIN", "16"))
+ZOOM_MAX = int(os.getenv("ZOOM_MAX", "20"))
+VAGA_LARGURA_METROS = float(os.getenv("VAGA_LARGURA_METROS", "2.5"))
+VAGA_MIN_PIXELS = float(os.getenv("VAGA_MIN_PIXELS", "12"))
+ORCAMENTO_TILES = int(os.getenv("ORCAMENTO_TILES", str(MOSAICO_MAX_TILES)))
+ORCAMENTO_PIXELS = int(os.getenv("ORCAMENTO_PIXELS", str(4096 * 4096)))
+
+# Streaming das respostas de análise (features por bloco)
+STREAM_TAMANHO_LOTE = int(os.getenv("STREAM_TAMANHO_LOTE", "1000"))
+
+# Jobs de análise assíncronos (fila Redis se REDIS_URL, senão em memória)
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_TTL = int(os.getenv("JOBS_TTL", str(24 * 3600)))
+JOBS_INTERVALO_PROGRESSO = float(os.getenv("JOBS_INTERVALO_PROGRESSO", "0.25"))
+# Jobs em processamento sem atualização há mais que isso voltam à fila (réplica que caiu)
+JOBS_PRAZO_PROCESSAMENTO = float(os.getenv("JOBS_PRAZO_PROCESSAMENTO", "900"))
+
+# Análise em lote: máximo de áreas por requisição e de tiles únicos em
+# memória por bloco (cada tile decodificado ocupa ~192 KB)
+LOTE_MAX_AREAS = int(os.getenv("LOTE_MAX_AREAS", "500"))
+LOTE_MAX_TILES = int(os.getenv("LOTE_MAX_TILES", "1000"))
+
+# Codificação das imagens de /satellite-image/
+IMAGEM_QUALIDADE_PADRAO = int(os.getenv("IMAGEM_QUALIDADE_PADRAO", "95"))
+IMAGEM_WEBP_METODO = int(os.getenv("IMAGEM_WEBP_METODO", "2"))  # 0 (rápido) a 6 (menor)
+IMAGEM_CACHE_MAX_BYTES = int(os.getenv("IMAGEM_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+# Pré-aquecimento do cache de tiles (CLI e API de administração): lotes
+# pequenos, concorrência abaixo da interativa e pausa entre lotes
+PREFETCH_CONCORRENCIA = int(os.getenv("PREFETCH_CONCORRENCIA", "4"))
+PREFETCH_TAMANHO_LOTE = int(os.getenv("PREFETCH_TAMANHO_LOTE", "64"))
+PREFETCH_PAUSA = float(os.getenv("PREFETCH_PAUSA", "0.5"))
+PREFETCH_MAX_TILES = int(os.getenv("PREFETCH_MAX_TILES", "50000"))
+PREFETCH_MAX_SIMULTANEOS = int(os.getenv("PREFETCH_MAX_SIMULTANEOS", "1"))
+
+# Token exigido (cabeçalho X-Admin-Token) pela API de administração; vazio a desabilita
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
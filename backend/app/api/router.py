@@ -2,9 +2,11 @@
 from fastapi import APIRouter
 
 # O caminho correto para o import é DENTRO da pasta v1
-from app.api.v1.endpoints import parking
+from app.api.v1.endpoints import parking, jobs, admin
 
 api_router = APIRouter()
 
 # O prefixo correto para a URL inclui o /v1
-api_router.include_router(parking.router, prefix="/v1/parking", tags=["Parking Analysis"])
\ No newline at end of file
+api_router.include_router(parking.router, prefix="/v1/parking", tags=["Parking Analysis"])
+api_router.include_router(jobs.router, prefix="/v1/jobs", tags=["Jobs"])
+api_router.include_router(admin.router, prefix="/v1/admin", tags=["Admin"])
\ No newline at end of file
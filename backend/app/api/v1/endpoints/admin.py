@@ -0,0 +1,62 @@
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from app.api.config import settings
+from app.schemas.parking_schema import PrefetchRequest
+from app.services.tile_prefetch import gerenciador_prefetch
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def exigir_token_admin(x_admin_token: Optional[str] = Header(None)):
+    """Libera a rota só com o cabeçalho `X-Admin-Token` igual a ADMIN_TOKEN."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="API de administração desabilitada (ADMIN_TOKEN não configurado)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Token de administração inválido")
+
+
+router = APIRouter(dependencies=[Depends(exigir_token_admin)])
+
+
+@router.post("/prefetch", status_code=202, summary="Pré-carrega tiles no cache em disco")
+async def iniciar_prefetch(request: PrefetchRequest):
+    """
+    Enumera os tiles das áreas (polígonos ou bboxes) nos zooms pedidos e os
+    baixa em segundo plano, em lotes com concorrência limitada, pulando os
+    que ainda estão frescos no cache. O progresso é consultado em
+    `GET /admin/prefetch/{prefetch_id}`.
+
+    Exige o cabeçalho `X-Admin-Token`; no máximo PREFETCH_MAX_SIMULTANEOS
+    pré-carregamentos rodam ao mesmo tempo (503 além disso).
+    """
+    try:
+        execucao = await gerenciador_prefetch.iniciar(request)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {
+        "prefetch_id": execucao["id"],
+        "status": execucao["status"],
+        "total_tiles": execucao["progresso"]["total"],
+        "status_url": f"/api/v1/admin/prefetch/{execucao['id']}",
+    }
+
+
+@router.get("/prefetch", summary="Pré-carregamentos recentes")
+async def listar_prefetch():
+    return gerenciador_prefetch.listar()
+
+
+@router.get("/prefetch/{prefetch_id}", summary="Progresso de um pré-carregamento")
+async def obter_prefetch(prefetch_id: str):
+    """
+    Retorna `status` (processando, concluido, erro) e `progresso`, com o
+    total de tiles e quantos estavam frescos, foram baixados ou falharam.
+    """
+    execucao = gerenciador_prefetch.obter(prefetch_id)
+    if execucao is None:
+        raise HTTPException(status_code=404, detail="Pré-carregamento não encontrado")
+    return execucao
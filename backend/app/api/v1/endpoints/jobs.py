@@ -0,0 +1,71 @@
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.schemas.parking_schema import AnaliseRequest
+from app.services import serializacao
+from app.services.job_queue import fila_analises
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def _publico_em_partes(job):
+    """
+    Estado do job exposto aos clientes (sem os pontos de entrada), em JSON.
+    O resultado, quando presente, sai como GeoJSON gerado em blocos.
+    """
+    publico = {campo: valor for campo, valor in job.items() if campo != "pontos"}
+    if publico.get("resultado") is None:
+        return iter([serializacao.dumps(publico)])
+    resultado = publico.pop("resultado")
+    return serializacao.objeto_com_resultado_em_partes(publico, resultado)
+
+
+@router.post("/analises", status_code=202, summary="Enfileira uma análise de estacionamento")
+async def submeter_analise(request: AnaliseRequest):
+    """
+    Cria um job de análise e retorna imediatamente o seu id. O resultado é
+    obtido consultando `GET /jobs/{job_id}` ou acompanhando o WebSocket
+    `/jobs/{job_id}/ws`, que envia cada atualização de progresso.
+    """
+    job = await fila_analises.submeter(request.pontos)
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/api/v1/jobs/{job['id']}",
+        "websocket_url": f"/api/v1/jobs/{job['id']}/ws",
+    }
+
+
+@router.get("/metricas", summary="Métricas da fila de jobs")
+async def metricas_jobs():
+    return fila_analises.estatisticas()
+
+
+@router.get("/{job_id}", summary="Estado de um job de análise")
+async def obter_job(job_id: str):
+    """
+    Retorna `status` (pendente, processando, concluido, erro), `etapa`,
+    `progresso` (0 a 1) e, quando concluído, o `resultado` da análise.
+    """
+    job = await fila_analises.obter(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou expirado")
+    return StreamingResponse(_publico_em_partes(job), media_type="application/json")
+
+
+@router.websocket("/{job_id}/ws")
+async def acompanhar_job(websocket: WebSocket, job_id: str):
+    """Envia o estado do job a cada atualização e fecha ao atingir um estado final."""
+    await websocket.accept()
+    enviados = 0
+    try:
+        async for job in fila_analises.acompanhar(job_id):
+            await websocket.send_text(b"".join(_publico_em_partes(job)).decode("utf-8"))
+            enviados += 1
+    except WebSocketDisconnect:
+        return
+    if enviados == 0:
+        await websocket.close(code=4404, reason="Job não encontrado ou expirado")
+        return
+    await websocket.close()
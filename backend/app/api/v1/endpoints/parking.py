@@ -1,94 +1,102 @@
-import io
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import Response
-from app.schemas.parking_schema import AnaliseRequest
-from app.services import geo_service, map_service, ai_service
+import json
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Header
+from fastapi.responses import Response, StreamingResponse
+from app.schemas.parking_schema import AnaliseRequest, AnaliseLoteRequest
+from app.services import map_service, analise_service, ai_service, tile_cache, serializacao, image_encoder, buffer_pool
+from app.api.config import settings
+from app.services.result_cache import cache_resultados
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.post("/analisar-estacionamento", summary="Analisa uma área de estacionamento")
-async def analisar_estacionamento(request: AnaliseRequest):
+async def analisar_estacionamento(
+    request: AnaliseRequest,
+    formato: str = Query("json", pattern="^(json|ndjson)$", description="json (sumário + FeatureCollection) ou ndjson (uma Feature por linha)")
+):
     """
     Analisa uma área de estacionamento a partir de pontos GPS.
     
     - Obtém imagem de satélite via web scraping do Google Maps
     - Detecta vagas de estacionamento usando IA
-    - Retorna GeoJSON com as vagas identificadas
+    - Retorna GeoJSON com as vagas identificadas, transmitido em blocos
+    
+    Com `formato=ndjson` as vagas são enviadas como GeoJSON delimitado por
+    linhas e o sumário vai no cabeçalho `X-Sumario`.
     """
     try:
-        logger.info(f"Iniciando análise com {len(request.pontos)} pontos")
-        
-        # Calcular bounding box
-        bbox_gps = geo_service.calcular_bounding_box(request.pontos)
-        logger.info(f"Bounding box calculado: {bbox_gps}")
-        
-        # Obter imagem de satélite via scraping (com retry)
-        img_width, img_height = 1280, 1280
-        logger.info("Obtendo imagem de satélite do Google Maps...")
-        imagem = map_service.obter_imagem_satelite_com_retry(
-            bbox_gps, 
-            width=img_width, 
-            height=img_height,
-            max_retries=2
-        )
-        logger.info("Imagem obtida com sucesso")
-        
-        # Analisar imagem com IA
-        logger.info("Analisando imagem com IA...")
-        vagas_pixels = ai_service.analisar_imagem_com_ia(imagem)
-        logger.info(f"{len(vagas_pixels)} vagas detectadas")
+        resultado = await analise_service.analisar_area(request.pontos)
         
-        # Converter coordenadas de pixels para GPS
-        vagas_com_gps = []
-        for vaga in vagas_pixels:
-            coords_gps = geo_service.pixel_para_gps(
-                vaga['box_pixels'], 
-                bbox_gps, 
-                img_width, 
-                img_height
+        if formato == "ndjson":
+            return StreamingResponse(
+                serializacao.features_ndjson_em_partes(resultado),
+                media_type="application/x-ndjson",
+                headers={"X-Sumario": json.dumps(resultado["sumario"])}
             )
-            vagas_com_gps.append({
-                "tipo": vaga['tipo'], 
-                "coords_gps": coords_gps
-            })
-        
-        # Criar GeoJSON
-        geojson_result = geo_service.criar_geojson(vagas_com_gps)
-        
-        # Calcular estatísticas
-        total_vagas = len(vagas_com_gps)
-        tipos_vagas = {vaga['tipo'] for vaga in vagas_com_gps}
-        contagem_tipos = {
-            tipo: sum(1 for v in vagas_com_gps if v['tipo'] == tipo) 
-            for tipo in tipos_vagas
-        }
-        
-        logger.info(f"Análise concluída: {total_vagas} vagas encontradas")
-        
-        return {
-            "sumario": {
-                "total_de_vagas_identificadas": total_vagas,
-                "tipos_de_vagas": list(tipos_vagas),
-                "contagem_por_tipo": contagem_tipos
-            },
-            "vagas_geojson": geojson_result
-        }
+        return StreamingResponse(
+            serializacao.resultado_json_em_partes(resultado),
+            media_type="application/json"
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro na análise: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/analisar-estacionamentos/lote", summary="Analisa várias áreas de estacionamento em lote")
+async def analisar_estacionamentos_lote(request: AnaliseLoteRequest):
+    """
+    Analisa várias áreas em uma única requisição. Os tiles compartilhados
+    entre as áreas são baixados uma só vez e as detecções de todas as áreas
+    são agrupadas nos mesmos lotes de inferência.
+    
+    A resposta é NDJSON: uma linha por área, na ordem em que terminam, com
+    `indice` (posição em `lotes`) e `resultado` ou `erro`.
+    """
+    async def linhas():
+        async for indice, resultado in analise_service.analisar_lote([lote.pontos for lote in request.lotes]):
+            if isinstance(resultado, Exception):
+                linha = {"indice": indice, "erro": getattr(resultado, "detail", None) or str(resultado)}
+                yield serializacao.dumps(linha) + b"\n"
+            else:
+                for parte in serializacao.objeto_com_resultado_em_partes({"indice": indice}, resultado):
+                    yield parte
+                yield b"\n"
+    
+    return StreamingResponse(linhas(), media_type="application/x-ndjson")
+
+
+@router.post("/analisar-estacionamento/invalidar-cache", summary="Invalida o resultado em cache de uma área")
+async def invalidar_cache_analise(request: AnaliseRequest):
+    """
+    Remove o resultado em cache da área definida pelos pontos GPS e as
+    análises armazenadas que se sobrepõem a ela, forçando uma nova análise
+    na próxima requisição.
+    """
+    removidos = await analise_service.invalidar_cache(request.pontos)
+    return {"removidos": removidos}
+
+
+@router.delete("/analisar-estacionamento/cache", summary="Limpa o cache de resultados de análise")
+async def limpar_cache_analises():
+    """Remove todos os resultados de análise em cache e as análises armazenadas."""
+    removidos = await analise_service.invalidar_cache()
+    return {"removidos": removidos}
+
+
 @router.get(
     "/satellite-image/",
     summary="Obter Imagem de Satélite via Scraping",
     response_class=Response,
     responses={
         200: {
-            "content": {"image/jpeg": {}},
-            "description": "Imagem de satélite em formato JPEG"
+            "content": {tipo: {} for tipo in image_encoder.TIPOS_MIDIA.values()},
+            "description": "Imagem de satélite (JPEG, WebP ou PNG)"
         }
     }
 )
@@ -96,51 +104,67 @@ async def get_satellite_image(
     lat: float = Query(..., description="Latitude do ponto central. Ex: -10.9472"),
     lon: float = Query(..., description="Longitude do ponto central. Ex: -37.0731"),
     width: int = Query(1280, description="Largura da imagem em pixels", ge=640, le=2560),
-    height: int = Query(1280, description="Altura da imagem em pixels", ge=640, le=2560)
+    height: int = Query(1280, description="Altura da imagem em pixels", ge=640, le=2560),
+    formato: Optional[str] = Query(None, pattern="^(jpeg|webp|png)$", description="Formato de saída; sem ele, WebP se o cabeçalho Accept o listar com q > 0, senão JPEG"),
+    qualidade: int = Query(settings.IMAGEM_QUALIDADE_PADRAO, ge=1, le=100, description="Qualidade JPEG/WebP"),
+    progressivo: bool = Query(False, description="JPEG progressivo"),
+    largura_max: Optional[int] = Query(None, ge=64, le=2560, description="Reduz a imagem para no máximo esta largura"),
+    accept: Optional[str] = Header(None)
 ):
     """
     Obtém uma imagem de satélite do Google Maps via web scraping.
     
-    **⚠️ IMPORTANTE**: Este endpoint retorna uma imagem JPEG. 
+    **⚠️ IMPORTANTE**: Este endpoint retorna uma imagem (JPEG por padrão). 
     Para visualizar no navegador, copie a URL abaixo e abra em uma nova aba.
     
  
     **Nota**: Este endpoint faz scraping do Google Maps, o que pode demorar 6-10 segundos.
+    Imagens já codificadas com os mesmos parâmetros são servidas do cache.
     
     **Parâmetros**:
     - **lat**: Latitude do centro da área
     - **lon**: Longitude do centro da área  
     - **width**: Largura desejada (640-2560 pixels)
     - **height**: Altura desejada (640-2560 pixels)
+    - **formato**: jpeg, webp ou png; sem ele, WebP apenas se o Accept listar `image/webp` (com q > 0), senão JPEG
+    - **qualidade**, **progressivo**, **largura_max**: opções de codificação
     
-    **Retorna**: Imagem JPEG em alta qualidade
+    **Retorna**: Imagem no formato escolhido
     """
     try:
         logger.info(f"Requisição de imagem: lat={lat}, lon={lon}, size={width}x{height}")
         
-        bbox = {"center_lon": lon, "center_lat": lat}
-        
-        # Usar versão com retry para maior confiabilidade
-        pil_image = map_service.obter_imagem_satelite_com_retry(
-            bbox, 
-            width=width, 
-            height=height,
-            max_retries=2
-        )
-        
-        # Converter para JPEG de alta qualidade
-        buffer = io.BytesIO()
-        pil_image.save(buffer, format="JPEG", quality=95)
-        image_bytes = buffer.getvalue()
+        formato = image_encoder.escolher_formato(formato, accept)
+        chave = (round(lat, 6), round(lon, 6), width, height, formato, qualidade, progressivo, largura_max)
+        image_bytes = image_encoder.cache_codificadas.obter(chave)
+        
+        if image_bytes is None:
+            bbox = {"center_lon": lon, "center_lat": lat}
+            
+            # Usar versão com retry para maior confiabilidade
+            imagem = await map_service.obter_imagem_satelite_com_retry_async(
+                bbox, 
+                width=width, 
+                height=height,
+                max_retries=2
+            )
+            
+            # Codificar fora do event loop
+            image_bytes = await asyncio.to_thread(
+                image_encoder.codificar, imagem, formato, qualidade, progressivo, largura_max
+            )
+            image_encoder.cache_codificadas.salvar(chave, image_bytes)
         
-        logger.info(f"Imagem gerada: {len(image_bytes)} bytes")
+        logger.info(f"Imagem gerada: {len(image_bytes)} bytes ({formato})")
         
+        extensao = "jpg" if formato == "jpeg" else formato
         return Response(
             content=image_bytes, 
-            media_type="image/jpeg",
+            media_type=image_encoder.TIPOS_MIDIA[formato],
             headers={
-                "Content-Disposition": f"inline; filename=satellite_{lat}_{lon}.jpg",
-                "Cache-Control": "public, max-age=3600"
+                "Content-Disposition": f"inline; filename=satellite_{lat}_{lon}.{extensao}",
+                "Cache-Control": "public, max-age=3600",
+                "Vary": "Accept"
             }
         )
         
@@ -154,35 +178,45 @@ async def get_satellite_image(
         )
 
 
+@router.get("/metricas", summary="Métricas de cache")
+async def get_metricas():
+    """
+    Retorna contadores do cache em memória de tiles decodificados
+    (acertos, falhas, ocupação em bytes) e da coalescência de requisições
+    idênticas em andamento.
+    """
+    return {
+        "cache_tiles_memoria": tile_cache.cache_memoria.estatisticas(),
+        "cache_imagens_codificadas": image_encoder.cache_codificadas.estatisticas(),
+        "cache_resultados": cache_resultados.estatisticas(),
+        "pool_mosaicos": buffer_pool.pool_mosaicos.estatisticas(),
+        "inferencia": ai_service.estatisticas(),
+        "coalescencia": {
+            "imagens": map_service.coalescencia_imagens.estatisticas(),
+            "analises": analise_service.coalescencia_analises.estatisticas()
+        }
+    }
+
+
 @router.get("/test-scraping", summary="Testar Sistema de Scraping")
-async def test_scraping():
+def test_scraping():
     """
     Endpoint de teste para verificar se o sistema de scraping está funcionando.
     Retorna informações sobre a configuração do Selenium.
     """
     try:
         from selenium import webdriver
-        from selenium.webdriver.chrome.options import Options
-        from webdriver_manager.chrome import ChromeDriverManager
-        
-        options = Options()
-        options.add_argument('--headless')
-        options.add_argument('--no-sandbox')
-        
-        driver = webdriver.Chrome(
-            service=webdriver.chrome.service.Service(ChromeDriverManager().install()),
-            options=options
-        )
         
-        driver.get("https://www.google.com")
-        title = driver.title
-        driver.quit()
+        with map_service.pool_navegadores.adquirir() as driver:
+            driver.get("https://www.google.com")
+            title = driver.title
         
         return {
             "status": "ok",
             "message": "Sistema de scraping funcionando corretamente",
             "test_page_title": title,
-            "selenium_version": webdriver.__version__
+            "selenium_version": webdriver.__version__,
+            "pool_navegadores": map_service.pool_navegadores.estatisticas()
         }
         
     except Exception as e:
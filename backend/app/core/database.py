@@ -0,0 +1,21 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import DeclarativeBase, sessionmaker
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+def criar_engine(url):
+    """
+    Cria o engine SQLAlchemy. Para SQLite (testes/desenvolvimento local) a
+    conexão é liberada para uso a partir das threads do servidor.
+    """
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+    return create_engine(url, connect_args=connect_args, pool_pre_ping=True)
+
+
+def criar_sessao(engine):
+    return sessionmaker(bind=engine, expire_on_commit=False)
@@ -0,0 +1 @@
+from app.models.analise import Analise, Vaga
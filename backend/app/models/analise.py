@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy import String, Integer, Float, DateTime, ForeignKey, Index, Text
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from app.core.database import Base
+
+
+def _agora_utc():
+    return datetime.now(timezone.utc)
+
+
+class Analise(Base):
+    """
+    Uma análise de estacionamento: área (bbox e polígono), zoom, versão do
+    modelo e vagas detectadas.
+
+    `poligono` é a lista JSON de [lat, lon] do polígono analisado: as vagas
+    fora dele foram descartadas, então só áreas contidas nele podem reusar a
+    análise.
+    """
+
+    __tablename__ = "analises"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    criado_em: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_agora_utc, index=True)
+    versao_modelo: Mapped[str] = mapped_column(String(64))
+    zoom: Mapped[int] = mapped_column(Integer)
+    min_lat: Mapped[float] = mapped_column(Float)
+    max_lat: Mapped[float] = mapped_column(Float)
+    min_lon: Mapped[float] = mapped_column(Float)
+    max_lon: Mapped[float] = mapped_column(Float)
+    poligono: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    total_vagas: Mapped[int] = mapped_column(Integer, default=0)
+
+    vagas: Mapped[List["Vaga"]] = relationship(
+        back_populates="analise", cascade="all, delete-orphan", lazy="selectin"
+    )
+
+    __table_args__ = (
+        # Pré-filtro por faixa, não um índice espacial (R-tree/GiST): cada
+        # índice restringe um dos intervalos (min_lat ou min_lon) e os demais
+        # limites do bbox são verificados nas linhas que restam
+        Index("idx_analises_min_lat", "min_lat"),
+        Index("idx_analises_min_lon", "min_lon"),
+        Index("idx_analises_modelo_data", "versao_modelo", "criado_em"),
+    )
+
+
+class Vaga(Base):
+    """Vaga detectada em uma análise."""
+
+    __tablename__ = "vagas"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    analise_id: Mapped[int] = mapped_column(ForeignKey("analises.id", ondelete="CASCADE"), index=True)
+    tipo: Mapped[str] = mapped_column(String(64))
+    lat: Mapped[float] = mapped_column(Float)
+    lon: Mapped[float] = mapped_column(Float)
+
+    analise: Mapped[Analise] = relationship(back_populates="vagas")
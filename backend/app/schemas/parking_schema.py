@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import List
+from pydantic import BaseModel, Field, model_validator
+from typing import Annotated, List, Optional
+from app.api.config import settings
 
 class PontoGPS(BaseModel):
     lat: float = Field(..., example=-10.9472, description="Latitude do ponto")
@@ -8,3 +9,27 @@ class PontoGPS(BaseModel):
 class AnaliseRequest(BaseModel):
     pontos: List[PontoGPS] = Field(..., min_items=3, description="Pelo menos 3 pontos GPS para definir a área do estacionamento.")
 
+class AnaliseLoteRequest(BaseModel):
+    lotes: List[AnaliseRequest] = Field(..., min_length=1, max_length=settings.LOTE_MAX_AREAS, description="Áreas de estacionamento a analisar em conjunto.")
+
+
+class BBoxGPS(BaseModel):
+    min_lat: float = Field(..., description="Latitude mínima")
+    min_lon: float = Field(..., description="Longitude mínima")
+    max_lat: float = Field(..., description="Latitude máxima")
+    max_lon: float = Field(..., description="Longitude máxima")
+
+class AreaPrefetch(BaseModel):
+    pontos: Optional[List[PontoGPS]] = Field(None, min_length=3, description="Polígono do estacionamento.")
+    bbox: Optional[BBoxGPS] = Field(None, description="Retângulo, como alternativa ao polígono.")
+
+    @model_validator(mode="after")
+    def _exige_uma_forma(self):
+        if (self.pontos is None) == (self.bbox is None):
+            raise ValueError("Informe `pontos` ou `bbox` (apenas um)")
+        return self
+
+class PrefetchRequest(BaseModel):
+    areas: List[AreaPrefetch] = Field(..., min_length=1, description="Áreas cujos tiles serão pré-carregados.")
+    zooms: List[Annotated[int, Field(ge=0, le=22)]] = Field(default_factory=lambda: [settings.ZOOM_MAX], min_length=1, description="Níveis de zoom (0 a 22).")
+    validade_min: float = Field(0, ge=0, description="Rebaixa tiles que expiram em menos que este tempo (s).")
@@ -0,0 +1,505 @@
+import ast
+import time
+import queue
+import asyncio
+import threading
+import logging
+from concurrent.futures import Future, InvalidStateError
+import numpy as np
+from PIL import Image
+from app.api.config import settings
+from app.services import geo_service
+from app.services.deteccoes import Deteccoes
+
+logger = logging.getLogger(__name__)
+
+
+class BackendUltralytics:
+    """Detector YOLO (ultralytics/PyTorch) executado em CPU."""
+
+    def __init__(self, caminho_modelo):
+        import torch
+        from ultralytics import YOLO
+
+        torch.set_num_threads(settings.INFERENCIA_THREADS)
+        self.modelo = YOLO(caminho_modelo)
+        self.classes = self.modelo.names
+        self.categorias = tuple(self.classes[i] for i in sorted(self.classes))
+
+    def prever(self, imagens):
+        """
+        Executa um único forward pass para o lote inteiro.
+
+        Args:
+            imagens: Lista de arrays RGB (H, W, 3) uint8
+
+        Returns:
+            Lista de Deteccoes, uma por imagem
+        """
+        resultados = self.modelo.predict(
+            # ultralytics interpreta arrays NumPy como BGR
+            [np.ascontiguousarray(img[..., ::-1]) for img in imagens],
+            imgsz=settings.INFERENCIA_TAMANHO_ENTRADA,
+            conf=settings.INFERENCIA_CONFIANCA_MIN,
+            iou=settings.INFERENCIA_IOU_NMS,
+            device="cpu",
+            verbose=False,
+        )
+
+        return [
+            Deteccoes(
+                resultado.boxes.xyxy.cpu().numpy(),
+                resultado.boxes.conf.cpu().numpy(),
+                resultado.boxes.cls.cpu().numpy(),
+                self.categorias,
+            )
+            for resultado in resultados
+        ]
+
+
+def aplicar_nms(caixas, scores, classes, iou_limite):
+    """
+    Supressão de não-máximos por classe.
+
+    Args:
+        caixas: Array (N, 4) em xyxy
+        scores: Array (N,)
+        classes: Array (N,) de índices de classe
+        iou_limite: IoU acima do qual a caixa de menor score é descartada
+
+    Returns:
+        Índices das caixas mantidas, em ordem decrescente de score
+    """
+    if len(caixas) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Desloca cada classe para uma região distinta, evitando supressão entre classes
+    deslocadas = caixas + (classes.astype(np.float64) * (caixas.max() + 1))[:, None]
+    x1, y1, x2, y2 = deslocadas.T
+    areas = (x2 - x1) * (y2 - y1)
+    ordem = scores.argsort()[::-1]
+
+    manter = []
+    while ordem.size:
+        i = ordem[0]
+        manter.append(i)
+        resto = ordem[1:]
+        largura = np.clip(np.minimum(x2[i], x2[resto]) - np.maximum(x1[i], x1[resto]), 0, None)
+        altura = np.clip(np.minimum(y2[i], y2[resto]) - np.maximum(y1[i], y1[resto]), 0, None)
+        intersecao = largura * altura
+        iou = intersecao / (areas[i] + areas[resto] - intersecao + 1e-9)
+        ordem = resto[iou <= iou_limite]
+    return np.array(manter, dtype=np.int64)
+
+
+def _letterbox(imagem, tamanho):
+    """Redimensiona mantendo a proporção e completa com cinza até tamanho x tamanho."""
+    altura, largura = imagem.shape[:2]
+    escala = min(tamanho / altura, tamanho / largura)
+    nova_largura, nova_altura = round(largura * escala), round(altura * escala)
+    pad_x = (tamanho - nova_largura) // 2
+    pad_y = (tamanho - nova_altura) // 2
+
+    saida = np.full((tamanho, tamanho, 3), 114, dtype=np.uint8)
+    if (nova_largura, nova_altura) != (largura, altura):
+        imagem = np.asarray(Image.fromarray(imagem).resize((nova_largura, nova_altura), Image.BILINEAR))
+    saida[pad_y:pad_y + nova_altura, pad_x:pad_x + nova_largura] = imagem
+    return saida, escala, (pad_x, pad_y)
+
+
+def decodificar_saida_yolo(saida, escala, pad, conf_min, iou_limite):
+    """
+    Converte a saída bruta de um YOLOv8 exportado, (4 + classes, N), em
+    caixas xyxy nas coordenadas da imagem original.
+
+    Returns:
+        Tupla (caixas, scores, classes) já filtrada por confiança e NMS
+    """
+    predicoes = saida.T
+    pontuacoes = predicoes[:, 4:]
+    classes = pontuacoes.argmax(axis=1)
+    scores = pontuacoes[np.arange(len(classes)), classes]
+
+    selecionadas = scores >= conf_min
+    predicoes, scores, classes = predicoes[selecionadas], scores[selecionadas], classes[selecionadas]
+
+    cx, cy, w, h = predicoes[:, 0], predicoes[:, 1], predicoes[:, 2], predicoes[:, 3]
+    caixas = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    caixas -= np.array([pad[0], pad[1], pad[0], pad[1]], dtype=caixas.dtype)
+    caixas /= escala
+
+    manter = aplicar_nms(caixas, scores, classes, iou_limite)
+    return caixas[manter], scores[manter], classes[manter]
+
+
+class BackendOnnx:
+    """
+    Detector YOLO exportado para ONNX, executado com onnxruntime em CPU.
+
+    Usa todas as otimizações de grafo do onnxruntime e número configurável
+    de threads intra-op/inter-op. Aceita tanto o modelo float quanto a
+    variante quantizada em INT8.
+    """
+
+    def __init__(self, caminho_modelo, intra_op_threads=None, inter_op_threads=None):
+        import onnxruntime as ort
+
+        opcoes = ort.SessionOptions()
+        opcoes.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opcoes.intra_op_num_threads = intra_op_threads or settings.ONNX_INTRA_OP_THREADS
+        opcoes.inter_op_num_threads = inter_op_threads or settings.ONNX_INTER_OP_THREADS
+        opcoes.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+
+        self.sessao = ort.InferenceSession(caminho_modelo, opcoes, providers=["CPUExecutionProvider"])
+        entrada = self.sessao.get_inputs()[0]
+        self._nome_entrada = entrada.name
+        # Modelos exportados sem eixo dinâmico aceitam apenas lote 1
+        self._lote_fixo = isinstance(entrada.shape[0], int)
+        tamanho = entrada.shape[2]
+        self.tamanho_entrada = tamanho if isinstance(tamanho, int) else settings.INFERENCIA_TAMANHO_ENTRADA
+
+        # O export do ultralytics grava os nomes das classes nos metadados
+        metadados = self.sessao.get_modelmeta().custom_metadata_map
+        self.classes = ast.literal_eval(metadados["names"]) if "names" in metadados else {}
+
+    def _executar(self, tensor):
+        if not self._lote_fixo:
+            return self.sessao.run(None, {self._nome_entrada: tensor})[0]
+        return np.concatenate([
+            self.sessao.run(None, {self._nome_entrada: tensor[i:i + 1]})[0]
+            for i in range(len(tensor))
+        ])
+
+    def prever(self, imagens):
+        """Mesmo contrato de `BackendUltralytics.prever`."""
+        preparadas = [_letterbox(img, self.tamanho_entrada) for img in imagens]
+        tensor = np.stack([p[0] for p in preparadas]).transpose(0, 3, 1, 2)
+        tensor = np.ascontiguousarray(tensor, dtype=np.float32) / 255.0
+
+        saidas = self._executar(tensor)
+        categorias = tuple(self.classes.get(i, str(i)) for i in range(saidas.shape[1] - 4))
+
+        deteccoes = []
+        for saida, (_, escala, pad) in zip(saidas, preparadas):
+            caixas, scores, classes = decodificar_saida_yolo(
+                saida, escala, pad,
+                settings.INFERENCIA_CONFIANCA_MIN, settings.INFERENCIA_IOU_NMS,
+            )
+            deteccoes.append(Deteccoes(caixas, scores, classes, categorias))
+        return deteccoes
+
+
+def criar_backend(nome=None):
+    """
+    Cria o backend de inferência selecionado por INFERENCIA_BACKEND:
+    "torch" (ultralytics), "onnx" (float) ou "onnx-int8" (quantizado).
+    """
+    nome = nome or settings.INFERENCIA_BACKEND
+    if nome == "torch":
+        return BackendUltralytics(settings.MODEL_PATH)
+    if nome == "onnx":
+        return BackendOnnx(settings.ONNX_MODEL_PATH)
+    if nome == "onnx-int8":
+        return BackendOnnx(settings.ONNX_INT8_MODEL_PATH)
+    raise ValueError(f"Backend de inferência desconhecido: {nome}")
+
+
+def _entregar(definir, valor):
+    """Entrega o resultado de um pedido sem deixar um estado inválido derrubar a thread do motor."""
+    try:
+        definir(valor)
+    except InvalidStateError as e:
+        logger.warning(f"Resultado de inferência descartado: {e}")
+
+
+class MotorInferencia:
+    """
+    Mantém o detector residente e agrupa requisições concorrentes em lotes.
+
+    Uma thread dedicada retira pedidos da fila e espera até `max_espera_ms`
+    por outros pedidos (até `max_lote` imagens) antes de executar um único
+    forward pass para todos. Quem chamou recebe um Future com as detecções
+    da sua imagem.
+    """
+
+    def __init__(self, backend, max_lote=None, max_espera_ms=None):
+        self.backend = backend
+        self.max_lote = max_lote or settings.INFERENCIA_MAX_LOTE
+        self.max_espera = (max_espera_ms if max_espera_ms is not None else settings.INFERENCIA_MAX_ESPERA_MS) / 1000
+        self._fila = queue.Queue()
+        self._ativo = True
+        self.lotes = 0
+        self.imagens = 0
+        self._thread = threading.Thread(target=self._executar, name="inferencia", daemon=True)
+        self._thread.start()
+
+    def submeter(self, imagem):
+        """
+        Enfileira uma imagem (PIL ou array RGB) para detecção.
+
+        Returns:
+            concurrent.futures.Future com as Deteccoes da imagem
+        """
+        if not self._ativo:
+            raise RuntimeError("Motor de inferência encerrado")
+        if hasattr(imagem, "convert"):
+            imagem = np.asarray(imagem.convert("RGB"))
+        futuro = Future()
+        self._fila.put((imagem, futuro))
+        return futuro
+
+    def _coletar_lote(self):
+        primeiro = self._fila.get()
+        if primeiro is None:
+            return None
+        lote = [primeiro]
+        limite = time.monotonic() + self.max_espera
+        while len(lote) < self.max_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                item = self._fila.get(timeout=restante)
+            except queue.Empty:
+                break
+            if item is None:
+                self._fila.put(None)
+                break
+            lote.append(item)
+        return lote
+
+    def _executar(self):
+        while True:
+            lote = self._coletar_lote()
+            if lote is None:
+                return
+
+            # Pedidos cancelados enquanto esperavam na fila ficam fora do lote;
+            # os demais passam a "running" e não podem mais ser cancelados
+            lote = [(imagem, futuro) for imagem, futuro in lote if futuro.set_running_or_notify_cancel()]
+            if not lote:
+                continue
+            imagens = [imagem for imagem, _ in lote]
+            futuros = [futuro for _, futuro in lote]
+            try:
+                resultados = self.backend.prever(imagens)
+            except Exception as e:
+                logger.error(f"Erro na inferência de um lote com {len(lote)} imagens: {e}")
+                for futuro in futuros:
+                    _entregar(futuro.set_exception, e)
+                continue
+
+            self.lotes += 1
+            self.imagens += len(lote)
+            for futuro, deteccoes in zip(futuros, resultados):
+                _entregar(futuro.set_result, deteccoes)
+
+    def encerrar(self):
+        self._ativo = False
+        self._fila.put(None)
+        self._thread.join(timeout=10)
+
+    def estatisticas(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "lotes": self.lotes,
+            "imagens": self.imagens,
+            "media_imagens_por_lote": self.imagens / self.lotes if self.lotes else 0.0,
+            "fila": self._fila.qsize(),
+        }
+
+
+_motor = None
+_motor_lock = threading.Lock()
+
+
+def carregar_modelo():
+    """Carrega o detector e inicia o motor de inferência (uma vez por processo)."""
+    global _motor
+    with _motor_lock:
+        if _motor is None:
+            inicio = time.monotonic()
+            backend = criar_backend()
+            _motor = MotorInferencia(backend)
+            logger.info(
+                f"Backend de inferência '{settings.INFERENCIA_BACKEND}' carregado "
+                f"em {time.monotonic() - inicio:.1f}s"
+            )
+    return _motor
+
+
+def obter_motor():
+    return _motor or carregar_modelo()
+
+
+async def iniciar():
+    """Carrega o modelo no startup da aplicação, sem bloquear o event loop."""
+    try:
+        await asyncio.to_thread(carregar_modelo)
+    except Exception as e:
+        logger.error(f"Não foi possível carregar o modelo de detecção: {e}")
+
+
+def fechar():
+    global _motor
+    with _motor_lock:
+        if _motor is not None:
+            _motor.encerrar()
+            _motor = None
+
+
+def estatisticas():
+    return _motor.estatisticas() if _motor is not None else {"carregado": False}
+
+
+def analisar_imagem_com_ia(imagem):
+    """
+    Detecta vagas de estacionamento na imagem.
+
+    Returns:
+        Deteccoes (caixas x_min, y_min, x_max, y_max em pixels)
+    """
+    return obter_motor().submeter(imagem).result()
+
+
+async def _aguardar_pedidos(futuros):
+    """
+    Aguarda os pedidos submetidos ao motor. Se a espera for interrompida
+    (cancelamento ou erro em um dos pedidos), cancela os que ainda estão na
+    fila e só retorna depois que os já em inferência terminarem: as imagens
+    podem ser views de um buffer do pool, que o chamador devolve em seguida.
+    """
+    try:
+        return await asyncio.gather(*(asyncio.wrap_future(futuro) for futuro in futuros))
+    except BaseException:
+        for futuro in futuros:
+            futuro.cancel()
+        pendentes = [futuro for futuro in futuros if not futuro.done()]
+        if pendentes:
+            espera = asyncio.ensure_future(asyncio.wait([asyncio.wrap_future(futuro) for futuro in pendentes]))
+            while not espera.done():
+                try:
+                    await asyncio.shield(espera)
+                except asyncio.CancelledError:
+                    continue
+        raise
+
+
+async def analisar_imagem_com_ia_async(imagem):
+    """Versão assíncrona: aguarda o lote sem ocupar uma thread do servidor."""
+    motor = _motor or await asyncio.to_thread(carregar_modelo)
+    resultados = await _aguardar_pedidos([motor.submeter(imagem)])
+    return resultados[0]
+
+
+def gerar_janelas(largura, altura, tamanho, sobreposicao):
+    """
+    Divide a imagem em janelas quadradas sobrepostas que cobrem toda a área.
+    As últimas janelas de cada eixo são alinhadas à borda da imagem.
+
+    Returns:
+        Lista de (x_min, y_min, x_max, y_max)
+    """
+    passo = max(1, int(tamanho * (1 - sobreposicao)))
+
+    def inicios(extensao):
+        if extensao <= tamanho:
+            return [0]
+        posicoes = list(range(0, extensao - tamanho, passo))
+        posicoes.append(extensao - tamanho)
+        return posicoes
+
+    return [
+        (x, y, min(x + tamanho, largura), min(y + tamanho, altura))
+        for y in inicios(altura)
+        for x in inicios(largura)
+    ]
+
+
+def _corta_borda_interna(caixas, janela, largura, altura, margem=2):
+    """
+    Indica, para cada caixa (N, 4), se a detecção encosta em uma borda da
+    janela que não é borda da imagem: nesse caso a vaga provavelmente foi
+    cortada e aparece inteira na janela vizinha (graças à sobreposição).
+    """
+    jx0, jy0, jx1, jy1 = janela
+    return (
+        ((jx0 > 0) & (caixas[:, 0] <= jx0 + margem))
+        | ((jy0 > 0) & (caixas[:, 1] <= jy0 + margem))
+        | ((jx1 < largura) & (caixas[:, 2] >= jx1 - margem))
+        | ((jy1 < altura) & (caixas[:, 3] >= jy1 - margem))
+    )
+
+
+def _preparar_fatias(imagem, poligono_pixels, tamanho_janela, sobreposicao):
+    pixels = np.asarray(imagem.convert("RGB")) if hasattr(imagem, "convert") else imagem
+    altura, largura = pixels.shape[:2]
+    janelas = gerar_janelas(
+        largura, altura,
+        tamanho_janela or settings.INFERENCIA_JANELA,
+        settings.INFERENCIA_SOBREPOSICAO if sobreposicao is None else sobreposicao,
+    )
+    if poligono_pixels:
+        janelas = [j for j in janelas if geo_service.retangulo_intersecta_poligono(j, poligono_pixels)]
+    return pixels, janelas
+
+
+def _mesclar_fatias(janelas, resultados, largura, altura):
+    """Leva as detecções de cada janela para o referencial da imagem e aplica NMS global."""
+    partes = []
+    for janela, dets in zip(janelas, resultados):
+        dets = dets.deslocar(janela[0], janela[1])
+        partes.append(dets.filtrar(~_corta_borda_interna(dets.caixas, janela, largura, altura)))
+
+    deteccoes = Deteccoes.concatenar(partes)
+    if not len(deteccoes):
+        return deteccoes
+    return deteccoes.filtrar(
+        aplicar_nms(deteccoes.caixas, deteccoes.scores, deteccoes.codigos, settings.INFERENCIA_IOU_NMS)
+    )
+
+
+def analisar_imagem_fatiada(imagem, poligono_pixels=None, tamanho_janela=None, sobreposicao=None):
+    """
+    Inferência fatiada para imagens maiores que a entrada do modelo.
+
+    A imagem é dividida em janelas sobrepostas na resolução nativa (sem
+    reduzir a escala, preservando vagas pequenas). Se `poligono_pixels` for
+    informado, apenas janelas que intersectam o polígono são processadas.
+    As janelas são enviadas juntas ao motor, que as agrupa em lotes, e as
+    detecções são unificadas com NMS global.
+
+    Returns:
+        Deteccoes no referencial da imagem
+    """
+    pixels, janelas = _preparar_fatias(imagem, poligono_pixels, tamanho_janela, sobreposicao)
+    motor = obter_motor()
+    futuros = [motor.submeter(pixels[y0:y1, x0:x1]) for x0, y0, x1, y1 in janelas]
+    resultados = [futuro.result() for futuro in futuros]
+    return _mesclar_fatias(janelas, resultados, pixels.shape[1], pixels.shape[0])
+
+
+async def analisar_imagem_fatiada_async(imagem, poligono_pixels=None, tamanho_janela=None, sobreposicao=None):
+    """Versão assíncrona de `analisar_imagem_fatiada`."""
+    pixels, janelas = await asyncio.to_thread(
+        _preparar_fatias, imagem, poligono_pixels, tamanho_janela, sobreposicao
+    )
+    motor = _motor or await asyncio.to_thread(carregar_modelo)
+    resultados = await _aguardar_pedidos([motor.submeter(pixels[y0:y1, x0:x1]) for x0, y0, x1, y1 in janelas])
+    return await asyncio.to_thread(
+        _mesclar_fatias, janelas, resultados, pixels.shape[1], pixels.shape[0]
+    )
+
+
+async def detectar_async(imagem, poligono_pixels=None):
+    """
+    Ponto de entrada do pipeline: usa inferência fatiada quando a imagem
+    excede a janela do modelo ou quando há polígono para restringir a área.
+
+    Mesmo se cancelada, só retorna quando o motor não lê mais a imagem, que
+    pode então voltar ao pool.
+    """
+    altura, largura = imagem.shape[:2] if isinstance(imagem, np.ndarray) else imagem.size[::-1]
+    if max(largura, altura) > settings.INFERENCIA_JANELA or poligono_pixels:
+        return await analisar_imagem_fatiada_async(imagem, poligono_pixels)
+    return await analisar_imagem_com_ia_async(imagem)
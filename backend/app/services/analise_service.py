@@ -0,0 +1,329 @@
+import asyncio
+import logging
+from app.services import geo_service, map_service, ai_service, zoom_planner
+from app.services.result_cache import cache_resultados
+from app.services.storage_service import repositorio_analises, vagas_dentro_do_bbox
+from app.api.config import settings
+from app.services.coalescing import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Análises idênticas (mesmo polígono e zoom) em andamento são compartilhadas
+coalescencia_analises = SingleFlight("analises")
+
+
+async def analisar_area(pontos, ao_progredir=None):
+    """
+    Analisa a área definida pelos pontos GPS. Requisições concorrentes para
+    a mesma área aguardam uma única análise compartilhada.
+
+    `ao_progredir(etapa, fracao)`, se informado, recebe o progresso parcial
+    (fração de 0 a 1) da análise executada por esta chamada.
+
+    Returns:
+        Dicionário com `sumario` e `vagas` (compactas, ver `geo_service.vagas_compactas`)
+    """
+    logger.info(f"Iniciando análise com {len(pontos)} pontos")
+
+    # Calcular bounding box
+    bbox_gps = geo_service.calcular_bounding_box(pontos)
+    logger.info(f"Bounding box calculado: {bbox_gps}")
+
+    # Zoom adequado ao tamanho da área e ao tamanho mínimo de vaga do detector
+    plano = zoom_planner.planejar_zoom(pontos)
+
+    chave_cache = cache_resultados.chave(pontos, plano.zoom)
+    ao_progredir = ao_progredir or _sem_progresso
+    return await coalescencia_analises.executar(
+        chave_cache, lambda: _analisar_com_cache(chave_cache, pontos, bbox_gps, plano, ao_progredir)
+    )
+
+
+def _sem_progresso(etapa, fracao):
+    pass
+
+
+async def invalidar_cache(pontos=None):
+    """
+    Remove do cache o resultado da área informada, ou todos os resultados
+    se `pontos` não for informado. As análises armazenadas que se sobrepõem
+    à área (ou todas) também são removidas, senão a próxima requisição
+    seria respondida a partir delas.
+
+    Returns:
+        Número de resultados removidos (cache + armazenadas)
+    """
+    if pontos is None:
+        removidos = await cache_resultados.invalidar_tudo()
+        if repositorio_analises is not None:
+            removidos += await asyncio.to_thread(repositorio_analises.remover_todas)
+        return removidos
+    plano = zoom_planner.planejar_zoom(pontos)
+    removidos = await cache_resultados.invalidar(cache_resultados.chave(pontos, plano.zoom))
+    if repositorio_analises is not None:
+        bbox_gps = geo_service.calcular_bounding_box(pontos)
+        removidos += await asyncio.to_thread(repositorio_analises.remover_sobrepostas, bbox_gps)
+    return removidos
+
+
+async def _analisar_com_cache(chave_cache, pontos, bbox_gps, plano, ao_progredir):
+    resultado = await cache_resultados.obter(chave_cache)
+    if resultado is not None:
+        logger.info("Análise servida do cache de resultados")
+        return resultado
+
+    resultado = await _buscar_analise_armazenada(pontos, bbox_gps, plano)
+    if resultado is None:
+        resultado = await _executar_analise(pontos, bbox_gps, plano, ao_progredir)
+    await cache_resultados.salvar(chave_cache, resultado)
+    return resultado
+
+
+async def _buscar_analise_armazenada(pontos, bbox_gps, plano):
+    """
+    Responde a partir de uma análise recente (mesmo modelo e zoom) cujo
+    polígono contenha o polígono pedido, sem baixar imagens nem rodar
+    inferência.
+    """
+    if repositorio_analises is None:
+        return None
+    try:
+        analise = await asyncio.to_thread(
+            repositorio_analises.buscar_cobrindo,
+            bbox_gps,
+            plano.zoom,
+            versao_modelo=settings.MODEL_VERSION,
+            max_idade=settings.REUSO_ANALISE_MAX_IDADE,
+            poligono=[(p.lat, p.lon) for p in pontos],
+        )
+    except Exception as e:
+        logger.warning(f"Erro ao consultar análises armazenadas: {e}")
+        return None
+
+    if analise is None:
+        return None
+
+    logger.info(f"Análise respondida a partir da análise armazenada #{analise.id}")
+    vagas = vagas_dentro_do_bbox(analise, bbox_gps)
+    dentro = geo_service.pontos_no_poligono(vagas.lon, vagas.lat, [(p.lon, p.lat) for p in pontos])
+    return _montar_resultado(vagas.filtrar(dentro), plano)
+
+
+async def _persistir_analise(bbox_gps, pontos, vagas, zoom):
+    if repositorio_analises is None:
+        return
+    try:
+        await asyncio.to_thread(
+            repositorio_analises.salvar,
+            bbox_gps,
+            vagas,
+            zoom,
+            settings.MODEL_VERSION,
+            [(p.lat, p.lon) for p in pontos],
+        )
+    except Exception as e:
+        logger.warning(f"Erro ao persistir análise: {e}")
+
+
+async def _executar_analise(pontos, bbox_gps, plano, ao_progredir=_sem_progresso):
+    # Obter mosaico apenas com os tiles que intersectam o polígono (com retry)
+    logger.info("Obtendo imagem de satélite do Google Maps...")
+    ao_progredir("baixando_imagem", 0.0)
+    mosaico = await map_service.obter_mosaico_poligono_async(
+        pontos, zoom=plano.zoom, max_retries=2,
+        ao_progredir=lambda fracao: ao_progredir("baixando_imagem", 0.6 * fracao),
+    )
+    altura, largura = mosaico.imagem.shape[:2]
+    logger.info(f"Imagem obtida com sucesso ({largura}x{altura}, {mosaico.tiles} tiles)")
+
+    # Analisar imagem com IA (apenas as janelas dentro do polígono); as
+    # janelas são views do buffer do mosaico, devolvido ao pool em seguida
+    logger.info("Analisando imagem com IA...")
+    ao_progredir("detectando", 0.6)
+    try:
+        vagas = await ai_service.detectar_async(mosaico.imagem, mosaico.poligono_pixels)
+    finally:
+        mosaico.liberar()
+    logger.info(f"{len(vagas)} vagas detectadas")
+
+    ao_progredir("georreferenciando", 0.9)
+    return await _concluir_analise(mosaico, vagas, pontos, bbox_gps, plano)
+
+
+async def _concluir_analise(mosaico, vagas, pontos, bbox_gps, plano):
+    # Descartar vagas cujo centro caia fora do polígono e converter os
+    # centros de pixels para GPS (todas as caixas de uma vez)
+    centros_x, centros_y = vagas.centros()
+    vagas = vagas.filtrar(geo_service.pontos_no_poligono(centros_x, centros_y, mosaico.poligono_pixels))
+    vagas = vagas.com_gps(*mosaico.projecao.caixas_para_gps(vagas.caixas))
+
+    await _persistir_analise(bbox_gps, pontos, vagas, plano.zoom)
+
+    return _montar_resultado(vagas, plano)
+
+
+def _montar_resultado(vagas, plano):
+    """
+    Monta o resultado da análise (sumário + vagas compactas) a partir das
+    Deteccoes com GPS. As Features GeoJSON só são criadas na resposta, em
+    blocos (`serializacao.resultado_json_em_partes`).
+    """
+    # Calcular estatísticas (uma passada sobre os códigos de tipo)
+    total_vagas = len(vagas)
+    contagem_tipos = vagas.contagem_por_tipo()
+    tipos_vagas = list(contagem_tipos)
+
+    logger.info(f"Análise concluída: {total_vagas} vagas encontradas")
+
+    return {
+        "sumario": {
+            "total_de_vagas_identificadas": total_vagas,
+            "tipos_de_vagas": list(tipos_vagas),
+            "contagem_por_tipo": contagem_tipos,
+            "plano_zoom": plano.como_dict()
+        },
+        "vagas": geo_service.vagas_compactas(vagas)
+    }
+
+
+async def analisar_lote(lista_pontos):
+    """
+    Analisa vários estacionamentos de uma vez, gerando `(indice, resultado)`
+    na ordem em que cada área termina (`resultado` é a exceção, em caso de
+    erro).
+
+    Áreas já em cache ou cobertas por análises armazenadas são respondidas
+    primeiro. As demais são agrupadas por zoom; em cada grupo a união dos
+    tiles (sem repetir os compartilhados entre áreas vizinhas) é baixada uma
+    única vez, em blocos de até LOTE_MAX_TILES tiles para limitar a memória,
+    e as detecções de todas as áreas do bloco são submetidas juntas ao motor
+    de inferência, que as agrupa nos mesmos lotes.
+    """
+    resultados = asyncio.Queue()
+
+    async def produzir():
+        try:
+            await _processar_lote(lista_pontos, lambda indice, resultado: resultados.put_nowait((indice, resultado)))
+        except Exception as e:
+            resultados.put_nowait((None, e))
+
+    produtor = asyncio.create_task(produzir())
+    try:
+        for _ in range(len(lista_pontos)):
+            indice, resultado = await resultados.get()
+            if indice is None:
+                raise resultado
+            yield indice, resultado
+    finally:
+        produtor.cancel()
+
+
+async def _processar_lote(lista_pontos, publicar):
+    logger.info(f"Iniciando análise em lote de {len(lista_pontos)} áreas")
+
+    async def executar(indice, corrotina):
+        try:
+            resultado = await corrotina
+        except Exception as e:
+            logger.warning(f"Área {indice} do lote falhou: {e}")
+            resultado = e
+        publicar(indice, resultado)
+
+    def planejar(pontos):
+        """Bounding box e zoom de uma área (ou a exceção que impediu o planejamento)."""
+        try:
+            return geo_service.calcular_bounding_box(pontos), zoom_planner.planejar_zoom(pontos)
+        except Exception as e:
+            return e
+
+    async def preparar(indice, pontos, planejamento):
+        """Responde do cache/armazenamento ou devolve a área a analisar."""
+        try:
+            if isinstance(planejamento, Exception):
+                raise planejamento
+            bbox_gps, plano = planejamento
+            chave_cache = cache_resultados.chave(pontos, plano.zoom)
+            resultado = await cache_resultados.obter(chave_cache)
+            if resultado is None:
+                resultado = await _buscar_analise_armazenada(pontos, bbox_gps, plano)
+                if resultado is not None:
+                    await cache_resultados.salvar(chave_cache, resultado)
+            if resultado is None:
+                return {
+                    "indice": indice, "pontos": pontos, "bbox_gps": bbox_gps, "plano": plano,
+                    "chave_cache": chave_cache,
+                }
+        except Exception as e:
+            logger.warning(f"Área {indice} do lote falhou: {e}")
+            resultado = e
+        publicar(indice, resultado)
+        return None
+
+    def planejar_mosaico(area):
+        """Plano do mosaico da área (ou a exceção que impediu o planejamento)."""
+        try:
+            return map_service.planejar_mosaico_poligono(area["pontos"], area["plano"].zoom)
+        except Exception as e:
+            return e
+
+    # O planejamento (zoom e tiles do mosaico) é CPU pura: cada etapa roda
+    # para o lote inteiro em uma única chamada em thread, fora do event loop
+    planejamentos = await asyncio.to_thread(lambda: [planejar(pontos) for pontos in lista_pontos])
+    areas = await asyncio.gather(*(
+        preparar(indice, pontos, planejamento)
+        for indice, (pontos, planejamento) in enumerate(zip(lista_pontos, planejamentos))
+    ))
+    areas = [area for area in areas if area is not None]
+    mosaicos = await asyncio.to_thread(lambda: [planejar_mosaico(area) for area in areas])
+
+    por_zoom = {}
+    for area, mosaico in zip(areas, mosaicos):
+        if isinstance(mosaico, Exception):
+            logger.warning(f"Área {area['indice']} do lote falhou: {mosaico}")
+            publicar(area["indice"], mosaico)
+            continue
+        area["mosaico"] = mosaico
+        por_zoom.setdefault(area["plano"].zoom, []).append(area)
+
+    for zoom, areas_zoom in por_zoom.items():
+        for bloco in _blocos_por_tiles(areas_zoom, settings.LOTE_MAX_TILES):
+            uniao = set().union(*(area["mosaico"].tiles for area in bloco))
+            logger.info(
+                f"Bloco de {len(bloco)} áreas no zoom {zoom}: {len(uniao)} tiles únicos "
+                f"(de {sum(len(area['mosaico'].tiles) for area in bloco)} no total)"
+            )
+            tiles_baixados = await map_service.baixar_tiles_compartilhados_async(uniao, zoom)
+            await asyncio.gather(*(
+                executar(area["indice"], _analisar_area_do_lote(area, tiles_baixados))
+                for area in bloco
+            ))
+
+
+def _blocos_por_tiles(areas, max_tiles):
+    """Agrupa áreas em blocos cuja união de tiles não passe de `max_tiles`."""
+    bloco, uniao = [], set()
+    for area in areas:
+        tiles = set(area["mosaico"].tiles)
+        if bloco and len(uniao | tiles) > max_tiles:
+            yield bloco
+            bloco, uniao = [], set()
+        bloco.append(area)
+        uniao |= tiles
+    if bloco:
+        yield bloco
+
+
+async def _analisar_area_do_lote(area, tiles_baixados):
+    mosaico = await asyncio.to_thread(map_service.montar_mosaico_de_tiles, area["mosaico"], tiles_baixados)
+    if mosaico is None:
+        # Nenhum tile da área chegou: segue o fluxo individual (com Selenium)
+        return await analisar_area(area["pontos"])
+
+    try:
+        vagas = await ai_service.detectar_async(mosaico.imagem, mosaico.poligono_pixels)
+    finally:
+        mosaico.liberar()
+    resultado = await _concluir_analise(mosaico, vagas, area["pontos"], area["bbox_gps"], area["plano"])
+    await cache_resultados.salvar(area["chave_cache"], resultado)
+    return resultado
+
@@ -0,0 +1,371 @@
+"""
+Benchmarks do pipeline de `analisar_estacionamento`, etapa por etapa, e
+teste de carga da API, sem rede: os tiles vêm do servidor local de
+`tile_server` (ou de outro substituto indicado em --servidor-tiles).
+
+Cada etapa registra latência p50/p95/p99, vazão e pico de RSS do processo;
+o resultado é gravado em JSON para comparação entre versões.
+
+Uso:
+    python -m app.services.benchmark --saida bench.json
+    python -m app.services.benchmark --repeticoes 20 --carga-requisicoes 200 --carga-concorrencia 16
+    python -m app.services.benchmark --comparar base.json bench.json
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import inspect
+import platform
+import argparse
+import subprocess
+import logging
+from datetime import datetime, timezone
+import numpy as np
+from app.api.config import settings
+from app.schemas.parking_schema import PontoGPS
+from app.services import (
+    ai_service, analise_service, geo_service, image_encoder, map_service,
+    serializacao, tile_cache, tile_fetcher, zoom_planner,
+)
+from app.services.deteccoes import Deteccoes
+from app.services.tile_providers import ProvedorXYZ
+from app.services.tile_server import ServidorTiles
+
+logger = logging.getLogger(__name__)
+
+# Estacionamento de referência (~150 x 120 m em Aracaju)
+AREA_PADRAO = [(-10.9466, -37.0738), (-10.9466, -37.0724), (-10.9477, -37.0724), (-10.9477, -37.0738)]
+
+
+def pico_rss_mb():
+    """Pico de memória residente do processo até agora, em MB."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 2 ** 20
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 2 ** 20 if sys.platform == "darwin" else pico / 1024
+
+
+def resumir(latencias, duracao=None):
+    """
+    Estatísticas de uma série de latências (segundos). A vazão usa a duração
+    total (carga concorrente) ou a soma das latências (execução sequencial).
+    """
+    ms = np.asarray(latencias, dtype=np.float64) * 1000
+    if not len(ms):
+        return {"n": 0}
+    duracao = duracao if duracao is not None else ms.sum() / 1000
+    return {
+        "n": int(len(ms)),
+        "media_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "vazao_por_s": round(len(ms) / duracao, 3) if duracao else None,
+    }
+
+
+async def medir(funcao, repeticoes, aquecimento=1, preparar=None):
+    """
+    Executa `funcao` (síncrona ou corrotina) `repeticoes` vezes após o
+    aquecimento. `preparar`, se informado, roda antes de cada execução, fora
+    da medição (ex.: esvaziar caches).
+    """
+    async def executar():
+        resultado = funcao()
+        if inspect.isawaitable(resultado):
+            resultado = await resultado
+        return resultado
+
+    for _ in range(aquecimento):
+        if preparar is not None:
+            preparar()
+        await executar()
+
+    latencias = []
+    for _ in range(repeticoes):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        await executar()
+        latencias.append(time.perf_counter() - inicio)
+    return {**resumir(latencias), "pico_rss_mb": round(pico_rss_mb(), 1)}
+
+
+def _deteccoes_sinteticas(mosaico, vaga_pixels, quantidade):
+    """Vagas em grade sobre o mosaico, para medir as etapas após a inferência sem depender do modelo."""
+    altura, largura = mosaico.imagem.shape[:2]
+    lado = max(4.0, vaga_pixels)
+    colunas = max(1, int(np.ceil(np.sqrt(quantidade * largura / max(altura, 1)))))
+    indices = np.arange(quantidade)
+    xs = (indices % colunas + 0.5) * largura / colunas
+    ys = (indices // colunas + 0.5) * altura / max(1, int(np.ceil(quantidade / colunas)))
+    caixas = np.stack([xs - lado / 2, ys - lado, xs + lado / 2, ys + lado], axis=1)
+    return Deteccoes(caixas, np.full(quantidade, 0.9), indices % 2, ["comum", "idoso"])
+
+
+async def executar_etapas(pontos, repeticoes=10, vagas=500):
+    """
+    Mede cada etapa do pipeline de análise isoladamente.
+
+    Returns:
+        Dicionário {etapa: estatísticas}
+    """
+    etapas = {}
+    cliente = map_service.cliente_tiles
+
+    etapas["bbox"] = await medir(lambda: geo_service.calcular_bounding_box(pontos), repeticoes)
+    etapas["planejamento_zoom"] = await medir(lambda: zoom_planner.planejar_zoom(pontos), repeticoes)
+    plano = zoom_planner.planejar_zoom(pontos)
+    plano_mosaico = map_service.planejar_mosaico_poligono(pontos, plano.zoom)
+
+    tiles_baixados = {}
+
+    def guardar_tile(tx, ty, tile):
+        tiles_baixados[(tx, ty)] = tile
+
+    async def adquirir():
+        baixados, _ = await tile_fetcher.baixar_tiles_async(plano_mosaico.tiles, plano.zoom, guardar_tile, cliente)
+        if baixados == 0:
+            raise RuntimeError("Nenhum tile recebido do servidor de tiles")
+
+    etapas["aquisicao_tiles"] = await medir(adquirir, repeticoes, preparar=tile_cache.cache_memoria.limpar)
+    etapas["aquisicao_tiles"]["tiles"] = len(plano_mosaico.tiles)
+    etapas["aquisicao_tiles_cache_memoria"] = await medir(adquirir, repeticoes)
+
+    def montar():
+        map_service.montar_mosaico_de_tiles(plano_mosaico, tiles_baixados).liberar()
+
+    etapas["montagem_mosaico"] = await medir(montar, repeticoes)
+    mosaico = map_service.montar_mosaico_de_tiles(plano_mosaico, tiles_baixados)
+    etapas["montagem_mosaico"]["pixels"] = [plano_mosaico.largura, plano_mosaico.altura]
+
+    try:
+        await asyncio.to_thread(ai_service.carregar_modelo)
+    except Exception as e:
+        etapas["inferencia"] = {"ignorada": f"modelo indisponível: {e}"}
+    else:
+        etapas["inferencia"] = await medir(
+            lambda: ai_service.detectar_async(mosaico.imagem, mosaico.poligono_pixels), repeticoes
+        )
+        etapas["inferencia"]["backend"] = settings.INFERENCIA_BACKEND
+
+    deteccoes = _deteccoes_sinteticas(mosaico, plano.vaga_pixels, vagas)
+
+    def projetar():
+        centros_x, centros_y = deteccoes.centros()
+        dentro = deteccoes.filtrar(geo_service.pontos_no_poligono(centros_x, centros_y, mosaico.poligono_pixels))
+        return dentro.com_gps(*mosaico.projecao.caixas_para_gps(dentro.caixas))
+
+    etapas["projecao"] = await medir(projetar, repeticoes)
+    etapas["projecao"]["vagas"] = vagas
+    com_gps = projetar()
+    mosaico.liberar()
+
+    def serializar():
+        resultado = analise_service._montar_resultado(com_gps, plano)
+        return b"".join(serializacao.resultado_json_em_partes(resultado))
+
+    etapas["serializacao_geojson"] = await medir(serializar, repeticoes)
+    etapas["serializacao_geojson"]["bytes"] = len(serializar())
+
+    bbox = geo_service.calcular_bounding_box(pontos)
+    imagem = await map_service.obter_imagem_satelite_tiles_async(bbox, 1280, 1280)
+    etapas["codificacao_jpeg"] = await medir(
+        lambda: image_encoder.codificar(imagem, "jpeg", settings.IMAGEM_QUALIDADE_PADRAO), repeticoes
+    )
+    etapas["codificacao_jpeg"]["pixels"] = [1280, 1280]
+    return etapas
+
+
+def _deslocar(pontos, indice):
+    """
+    Cópia da área deslocada de até ±0,02° (cerca de ±2,2 km) em latitude e
+    longitude, com semente no índice, para que cada requisição seja uma área
+    distinta.
+    """
+    gerador = random.Random(indice)
+    dlat, dlon = gerador.uniform(-0.02, 0.02), gerador.uniform(-0.02, 0.02)
+    return [{"lat": p.lat + dlat, "lon": p.lon + dlon} for p in pontos]
+
+
+async def executar_carga(pontos, requisicoes=100, concorrencia=8, endpoint="imagem", url=None):
+    """
+    Dispara `requisicoes` contra a API com até `concorrencia` simultâneas.
+    Sem `url`, a aplicação roda no próprio processo (transporte ASGI).
+
+    `endpoint`: "imagem" (/satellite-image/) ou "analise"
+    (/analisar-estacionamento, exige o modelo carregado). Cada requisição
+    usa uma área distinta, para não medir apenas os caches de resultado.
+    """
+    import httpx
+
+    app = None
+    if url is None:
+        import main
+        app = main.app
+        await main.startup_event()
+        transporte, base = httpx.ASGITransport(app=app), "http://benchmark"
+    else:
+        transporte, base = None, url.rstrip("/")
+
+    semaforo = asyncio.Semaphore(concorrencia)
+    latencias, status = [], {}
+
+    async def requisitar(cliente, indice):
+        area = _deslocar(pontos, indice)
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                if endpoint == "analise":
+                    resposta = await cliente.post("/api/v1/parking/analisar-estacionamento", json={"pontos": area})
+                else:
+                    resposta = await cliente.get("/api/v1/parking/satellite-image/", params={
+                        "lat": area[0]["lat"], "lon": area[0]["lon"], "width": 1280, "height": 1280,
+                    })
+                codigo = str(resposta.status_code)
+            except Exception as e:
+                codigo = type(e).__name__
+            latencias.append(time.perf_counter() - inicio)
+        status[codigo] = status.get(codigo, 0) + 1
+
+    try:
+        async with httpx.AsyncClient(transport=transporte, base_url=base, timeout=120) as cliente:
+            inicio = time.perf_counter()
+            await asyncio.gather(*(requisitar(cliente, i) for i in range(requisicoes)))
+            duracao = time.perf_counter() - inicio
+    finally:
+        if app is not None:
+            await main.shutdown_event()
+
+    return {
+        "endpoint": endpoint,
+        "concorrencia": concorrencia,
+        "duracao_s": round(duracao, 3),
+        "status": status,
+        **resumir(latencias, duracao),
+        "pico_rss_mb": round(pico_rss_mb(), 1),
+    }
+
+
+def comparar(base, atual, tolerancia=0.10):
+    """
+    Etapas cujo p95 piorou mais que `tolerancia` (fração) entre dois
+    resultados do benchmark.
+
+    Returns:
+        Lista de {etapa, p95_base_ms, p95_atual_ms, variacao}
+    """
+    series_base = {**base.get("etapas", {}), **({"carga": base["carga"]} if base.get("carga") else {})}
+    series_atual = {**atual.get("etapas", {}), **({"carga": atual["carga"]} if atual.get("carga") else {})}
+    regressoes = []
+    for etapa, estatisticas in series_atual.items():
+        anterior = series_base.get(etapa, {})
+        if "p95_ms" not in estatisticas or not anterior.get("p95_ms"):
+            continue
+        variacao = estatisticas["p95_ms"] / anterior["p95_ms"] - 1
+        if variacao > tolerancia:
+            regressoes.append({
+                "etapa": etapa,
+                "p95_base_ms": anterior["p95_ms"],
+                "p95_atual_ms": estatisticas["p95_ms"],
+                "variacao": round(variacao, 3),
+            })
+    return regressoes
+
+
+def _versao():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def executar(args):
+    pontos = [PontoGPS(lat=lat, lon=lon) for lat, lon in AREA_PADRAO]
+
+    relatorio = {
+        "versao": _versao(),
+        "criado_em": datetime.now(timezone.utc).isoformat(),
+        "ambiente": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "processador": platform.processor() or platform.machine(),
+            "backend_inferencia": settings.INFERENCIA_BACKEND,
+        },
+        "parametros": {k: v for k, v in vars(args).items() if k not in ("saida", "comparar")},
+    }
+
+    # Sem cache em disco: a aquisição mede o caminho até o servidor de tiles.
+    # A configuração e o provedor originais são restaurados ao final
+    cache_habilitado, provedor = settings.TILE_CACHE_HABILITADO, tile_fetcher.provedor
+    settings.TILE_CACHE_HABILITADO = False
+    servidor = None
+    try:
+        if args.servidor_tiles:
+            tile_fetcher.provedor = ProvedorXYZ(args.servidor_tiles)
+        else:
+            servidor = ServidorTiles(
+                latencia_ms=args.latencia_ms, jitter_ms=args.jitter_ms, taxa_erro=args.taxa_erro, semente=42,
+            ).iniciar()
+            tile_fetcher.provedor = ProvedorXYZ(servidor.url_modelo)
+        relatorio["etapas"] = await executar_etapas(pontos, args.repeticoes, args.vagas)
+        if args.carga_requisicoes:
+            relatorio["carga"] = await executar_carga(
+                pontos, args.carga_requisicoes, args.carga_concorrencia, args.carga_endpoint, args.carga_url,
+            )
+    finally:
+        if servidor is not None:
+            relatorio["servidor_tiles"] = servidor.estatisticas()
+            servidor.encerrar()
+        await map_service.cliente_tiles.fechar_async()
+        settings.TILE_CACHE_HABILITADO, tile_fetcher.provedor = cache_habilitado, provedor
+    relatorio["pico_rss_mb"] = round(pico_rss_mb(), 1)
+    return relatorio
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline de análise e teste de carga da API")
+    parser.add_argument("--saida", help="Arquivo JSON de resultado (padrão: stdout)")
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--vagas", type=int, default=500, help="Detecções sintéticas para projeção e serialização")
+    parser.add_argument("--servidor-tiles", help="Modelo de URL de um servidor de tiles externo")
+    parser.add_argument("--latencia-ms", type=float, default=20.0, help="Latência do servidor de tiles local")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    parser.add_argument("--carga-requisicoes", type=int, default=50, help="0 desativa o teste de carga")
+    parser.add_argument("--carga-concorrencia", type=int, default=8)
+    parser.add_argument("--carga-endpoint", choices=("imagem", "analise"), default="imagem")
+    parser.add_argument("--carga-url", help="URL base de uma API em execução (padrão: aplicação no processo)")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "ATUAL"), help="Compara dois resultados e sai com 1 se houver regressão")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="Piora de p95 tolerada na comparação")
+    args = parser.parse_args()
+
+    if args.comparar:
+        with open(args.comparar[0], encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.comparar[1], encoding="utf-8") as f:
+            atual = json.load(f)
+        regressoes = comparar(base, atual, args.tolerancia)
+        print(json.dumps(regressoes, indent=2, ensure_ascii=False))
+        sys.exit(1 if regressoes else 0)
+
+    relatorio = asyncio.run(executar(args))
+    saida = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(saida)
+    else:
+        print(saida)
+
+
+if __name__ == "__main__":
+    main()
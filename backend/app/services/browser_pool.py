@@ -0,0 +1,233 @@
+import os
+import time
+import threading
+import functools
+import logging
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+from webdriver_manager.chrome import ChromeDriverManager
+from app.api.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def caminho_chromedriver():
+    """Resolve (e baixa, se necessário) o ChromeDriver uma única vez por processo."""
+    return ChromeDriverManager().install()
+
+
+def _opcoes_chrome():
+    chrome_options = Options()
+    chrome_options.add_argument('--headless=new')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--log-level=3')
+    chrome_options.add_argument('--silent')
+    chrome_options.add_experimental_option('excludeSwitches', ['enable-automation', 'enable-logging'])
+    return chrome_options
+
+
+class _Navegador:
+    def __init__(self, driver):
+        self.driver = driver
+        self.usos = 0
+
+
+class PoolNavegadores:
+    """
+    Pool de navegadores Chrome headless pré-iniciados.
+
+    Navegadores são reaproveitados entre requisições, verificados antes de
+    cada uso e reciclados após `max_usos` usos (ou ao falharem), evitando o
+    custo de iniciar um Chrome novo a cada fallback.
+    """
+
+    def __init__(self, max_navegadores=None, max_usos=None):
+        self.max_navegadores = max_navegadores or settings.CHROME_POOL_MAX
+        self.max_usos = max_usos or settings.CHROME_POOL_MAX_USOS
+        self._livres = []
+        self._total = 0
+        self._condicao = threading.Condition()
+
+    def _criar(self):
+        service = Service(
+            caminho_chromedriver(),
+            log_path='NUL' if os.name == 'nt' else '/dev/null'
+        )
+        driver = webdriver.Chrome(service=service, options=_opcoes_chrome())
+        logger.info("Navegador headless iniciado para o pool")
+        return _Navegador(driver)
+
+    @staticmethod
+    def _saudavel(navegador):
+        try:
+            navegador.driver.execute_script("return document.readyState")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _encerrar(navegador):
+        try:
+            navegador.driver.quit()
+        except Exception as e:
+            logger.warning(f"Erro ao encerrar navegador: {e}")
+
+    def _retirar(self, timeout):
+        limite = time.monotonic() + timeout
+        with self._condicao:
+            while True:
+                if self._livres:
+                    return self._livres.pop()
+                if self._total < self.max_navegadores:
+                    self._total += 1
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise TimeoutError("Nenhum navegador disponível no pool")
+                self._condicao.wait(restante)
+
+        try:
+            return self._criar()
+        except Exception:
+            with self._condicao:
+                self._total -= 1
+                self._condicao.notify()
+            raise
+
+    def _descartar(self, navegador):
+        self._encerrar(navegador)
+        with self._condicao:
+            self._total -= 1
+            self._condicao.notify()
+
+    def _devolver(self, navegador):
+        with self._condicao:
+            self._livres.append(navegador)
+            self._condicao.notify()
+
+    @contextmanager
+    def adquirir(self, timeout=None):
+        """
+        Empresta um navegador saudável do pool.
+
+        O navegador volta ao pool ao final do bloco; se o bloco falhar ou o
+        limite de usos for atingido, ele é encerrado e substituído depois.
+        """
+        timeout = timeout or settings.CHROME_POOL_TIMEOUT_AQUISICAO
+        navegador = self._retirar(timeout)
+        while not self._saudavel(navegador):
+            logger.warning("Navegador do pool não respondeu; reciclando")
+            self._descartar(navegador)
+            navegador = self._retirar(timeout)
+
+        navegador.usos += 1
+        try:
+            yield navegador.driver
+        except BaseException:
+            self._descartar(navegador)
+            raise
+
+        if navegador.usos >= self.max_usos:
+            logger.info(f"Navegador reciclado após {navegador.usos} usos")
+            self._descartar(navegador)
+        else:
+            self._devolver(navegador)
+
+    def aquecer(self, quantidade=None):
+        """Inicia navegadores antecipadamente até `quantidade` (padrão: tamanho máximo)."""
+        quantidade = min(quantidade or self.max_navegadores, self.max_navegadores)
+        while True:
+            with self._condicao:
+                if self._total >= quantidade:
+                    return
+                self._total += 1
+            try:
+                navegador = self._criar()
+            except Exception:
+                with self._condicao:
+                    self._total -= 1
+                raise
+            self._devolver(navegador)
+
+    def fechar(self):
+        with self._condicao:
+            livres, self._livres = self._livres, []
+            self._total -= len(livres)
+        for navegador in livres:
+            self._encerrar(navegador)
+
+    def estatisticas(self):
+        with self._condicao:
+            return {
+                "total": self._total,
+                "livres": len(self._livres),
+                "max_navegadores": self.max_navegadores,
+            }
+
+
+# Conta recursos já baixados e imagens ainda carregando na página
+# O buffer de Resource Timing do Chrome guarda só 250 entradas: numa página do
+# Maps ele enche e a contagem para de crescer com tiles ainda chegando. Na
+# primeira consulta após a navegação, o script amplia o buffer e instala um
+# PerformanceObserver, que recebe todas as entradas (inclusive os tiles
+# baixados para o canvas, que não aparecem em `document.images`) e as conta
+# independentemente do buffer.
+_SCRIPT_ESTADO_CARREGAMENTO = """
+    if (!window.__sipRecursos) {
+        window.__sipRecursos = {total: performance.getEntriesByType('resource').length};
+        performance.setResourceTimingBufferSize(100000);
+        performance.addEventListener('resourcetimingbufferfull', () => performance.clearResourceTimings());
+        new PerformanceObserver(lista => { window.__sipRecursos.total += lista.getEntries().length; })
+            .observe({type: 'resource'});
+    }
+    const pendentes = Array.from(document.images).filter(img => !img.complete).length;
+    return [window.__sipRecursos.total, pendentes];
+"""
+
+
+class _RedeOcioso:
+    """
+    Condição do WebDriverWait: nenhum recurso novo (contados desde a
+    primeira consulta na página) nem imagem pendente por `janela` segundos.
+    """
+
+    def __init__(self, janela):
+        self.janela = janela
+        self._ultimo_estado = None
+        self._desde = None
+
+    def __call__(self, driver):
+        recursos, pendentes = driver.execute_script(_SCRIPT_ESTADO_CARREGAMENTO)
+        agora = time.monotonic()
+        if pendentes or (recursos, pendentes) != self._ultimo_estado:
+            self._ultimo_estado = (recursos, pendentes)
+            self._desde = agora
+            return False
+        return agora - self._desde >= self.janela
+
+
+def aguardar_tiles_carregados(driver, timeout=None, janela_estavel=None):
+    """
+    Aguarda até a página parar de baixar recursos (rede ociosa) em vez de
+    usar uma espera fixa. Se o prazo acabar, segue com o que já carregou.
+
+    Returns:
+        True se a rede ficou ociosa dentro do prazo
+    """
+    timeout = timeout or settings.CHROME_PRONTIDAO_TIMEOUT
+    janela_estavel = janela_estavel or settings.CHROME_PRONTIDAO_JANELA_ESTAVEL
+    inicio = time.monotonic()
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.25).until(_RedeOcioso(janela_estavel))
+        logger.info(f"Tiles carregados em {time.monotonic() - inicio:.1f}s")
+        return True
+    except TimeoutException:
+        logger.warning(f"Rede não ficou ociosa em {timeout}s; capturando mesmo assim")
+        return False
@@ -0,0 +1,75 @@
+import threading
+import numpy as np
+from app.api.config import settings
+
+
+class PoolBuffers:
+    """
+    Pool limitado de buffers uint8 reaproveitados na montagem dos mosaicos de
+    polígono, cujo dono é um único chamador que sabe quando liberá-los. As
+    imagens de /satellite-image/ não passam por aqui: são compartilhadas
+    entre requisições coalescidas (ver `map_service.obter_imagem_satelite_tiles`).
+
+    `adquirir` devolve um array (altura, largura, canais) zerado que é uma
+    view sobre o menor buffer livre capaz de comportá-lo, ou sobre um buffer
+    novo se nenhum servir. `liberar` devolve o buffer ao pool; os buffers
+    ociosos somam no máximo `max_bytes` e, acima disso, os menores são
+    descartados (ficam para o coletor de lixo).
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._livres = []
+        self._bytes_livres = 0
+        self._lock = threading.Lock()
+        self.reaproveitados = 0
+        self.alocados = 0
+        self.em_uso = 0
+
+    def adquirir(self, altura, largura, canais=3):
+        tamanho = altura * largura * canais
+        with self._lock:
+            servem = [i for i, b in enumerate(self._livres) if b.nbytes >= tamanho]
+            buffer = None
+            if servem:
+                buffer = self._livres.pop(min(servem, key=lambda i: self._livres[i].nbytes))
+                self._bytes_livres -= buffer.nbytes
+                self.reaproveitados += 1
+            else:
+                self.alocados += 1
+            self.em_uso += 1
+
+        if buffer is None:
+            return np.zeros((altura, largura, canais), dtype=np.uint8)
+        imagem = buffer[:tamanho].reshape(altura, largura, canais)
+        imagem.fill(0)
+        return imagem
+
+    def liberar(self, imagem):
+        """Devolve ao pool o buffer de um array obtido com `adquirir`."""
+        raiz = imagem if imagem.base is None else imagem.base
+        buffer = raiz.reshape(-1)
+        with self._lock:
+            self.em_uso -= 1
+            if buffer.nbytes > self.max_bytes:
+                return
+            self._livres.append(buffer)
+            self._bytes_livres += buffer.nbytes
+            while self._bytes_livres > self.max_bytes:
+                menor = min(range(len(self._livres)), key=lambda i: self._livres[i].nbytes)
+                self._bytes_livres -= self._livres.pop(menor).nbytes
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "livres": len(self._livres),
+                "bytes_livres": self._bytes_livres,
+                "max_bytes": self.max_bytes,
+                "em_uso": self.em_uso,
+                "reaproveitados": self.reaproveitados,
+                "alocados": self.alocados,
+            }
+
+
+# Buffers dos mosaicos de polígono (análise individual e em lote)
+pool_mosaicos = PoolBuffers(settings.MOSAICO_POOL_MAX_BYTES)
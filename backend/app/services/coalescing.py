@@ -0,0 +1,52 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Deduplica computações assíncronas idênticas em andamento.
+
+    Chamadas concorrentes com a mesma chave aguardam uma única execução
+    compartilhada em vez de repeti-la. O resultado não é guardado: assim que
+    a execução termina, a próxima chamada com a mesma chave executa de novo.
+    """
+
+    def __init__(self, nome):
+        self.nome = nome
+        self._em_andamento = {}
+        self.execucoes = 0
+        self.coalescidas = 0
+
+    async def executar(self, chave, funcao):
+        """
+        Executa `funcao()` (uma corrotina) ou aguarda a execução já em
+        andamento para `chave`. O cancelamento de um chamador não cancela a
+        computação compartilhada pelos demais.
+        """
+        tarefa = self._em_andamento.get(chave)
+        if tarefa is not None:
+            self.coalescidas += 1
+            logger.info(f"[{self.nome}] Requisição coalescida com execução em andamento")
+        else:
+            tarefa = asyncio.ensure_future(funcao())
+            self._em_andamento[chave] = tarefa
+            tarefa.add_done_callback(lambda t: self._finalizar(chave, t))
+            self.execucoes += 1
+
+        return await asyncio.shield(tarefa)
+
+    def _finalizar(self, chave, tarefa):
+        if self._em_andamento.get(chave) is tarefa:
+            del self._em_andamento[chave]
+        # Marca a exceção como consumida caso todos os chamadores tenham desistido
+        if not tarefa.cancelled():
+            tarefa.exception()
+
+    def estatisticas(self):
+        return {
+            "em_andamento": len(self._em_andamento),
+            "execucoes": self.execucoes,
+            "coalescidas": self.coalescidas,
+        }
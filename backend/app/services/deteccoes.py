@@ -0,0 +1,114 @@
+import numpy as np
+
+
+class Deteccoes:
+    """
+    Detecções de vagas em colunas (struct-of-arrays).
+
+    Caixas, scores, códigos de tipo e coordenadas GPS ficam em arrays NumPy
+    paralelos; `categorias` é a tabela código -> nome do tipo. As etapas do
+    pipeline (inferência, fatiamento, projeção, filtro pelo polígono,
+    estatísticas) operam sobre os arrays inteiros, e a conversão para
+    dicionários acontece só na serialização.
+
+    Atributos:
+        caixas: (N, 4) float64, x_min, y_min, x_max, y_max em pixels
+        scores: (N,) float32
+        codigos: (N,) int32, índices em `categorias`
+        lat, lon: (N,) float64, preenchidos após a projeção (ou None)
+    """
+
+    __slots__ = ("caixas", "scores", "codigos", "categorias", "lat", "lon")
+
+    def __init__(self, caixas, scores, codigos, categorias, lat=None, lon=None):
+        self.caixas = np.asarray(caixas, dtype=np.float64).reshape(-1, 4)
+        self.scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        self.codigos = np.asarray(codigos, dtype=np.int32).reshape(-1)
+        self.categorias = tuple(categorias)
+        self.lat = None if lat is None else np.asarray(lat, dtype=np.float64).reshape(-1)
+        self.lon = None if lon is None else np.asarray(lon, dtype=np.float64).reshape(-1)
+
+    @classmethod
+    def vazio(cls, categorias=()):
+        return cls(np.empty((0, 4)), np.empty(0), np.empty(0), categorias)
+
+    @classmethod
+    def de_gps(cls, tipos, lat, lon):
+        """Detecções conhecidas apenas por tipo e posição (ex.: análises armazenadas)."""
+        categorias = tuple(dict.fromkeys(tipos))
+        indice = {nome: i for i, nome in enumerate(categorias)}
+        n = len(tipos)
+        return cls(
+            np.full((n, 4), np.nan), np.full(n, np.nan),
+            [indice[t] for t in tipos], categorias, lat, lon,
+        )
+
+    @classmethod
+    def concatenar(cls, partes):
+        """Une várias detecções, reconciliando as tabelas de categorias."""
+        partes = list(partes)
+        if not partes:
+            return cls.vazio()
+        categorias = tuple(dict.fromkeys(nome for p in partes for nome in p.categorias))
+        indice = {nome: i for i, nome in enumerate(categorias)}
+        codigos = []
+        for p in partes:
+            mapa = np.array([indice[nome] for nome in p.categorias], dtype=np.int32)
+            codigos.append(mapa[p.codigos] if len(p) else p.codigos)
+        com_gps = all(p.lat is not None for p in partes)
+        return cls(
+            np.concatenate([p.caixas for p in partes]),
+            np.concatenate([p.scores for p in partes]),
+            np.concatenate(codigos),
+            categorias,
+            np.concatenate([p.lat for p in partes]) if com_gps else None,
+            np.concatenate([p.lon for p in partes]) if com_gps else None,
+        )
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def filtrar(self, selecao):
+        """Subconjunto por máscara booleana ou array de índices."""
+        return Deteccoes(
+            self.caixas[selecao], self.scores[selecao], self.codigos[selecao], self.categorias,
+            None if self.lat is None else self.lat[selecao],
+            None if self.lon is None else self.lon[selecao],
+        )
+
+    def deslocar(self, dx, dy):
+        """Translada as caixas (ex.: do referencial da janela para o da imagem)."""
+        return Deteccoes(
+            self.caixas + np.array([dx, dy, dx, dy], dtype=np.float64),
+            self.scores, self.codigos, self.categorias, self.lat, self.lon,
+        )
+
+    def com_gps(self, lat, lon):
+        return Deteccoes(self.caixas, self.scores, self.codigos, self.categorias, lat, lon)
+
+    def centros(self):
+        return (self.caixas[:, 0] + self.caixas[:, 2]) / 2, (self.caixas[:, 1] + self.caixas[:, 3]) / 2
+
+    def tipos(self):
+        """Nomes dos tipos, um por detecção."""
+        return np.array(self.categorias, dtype=object)[self.codigos] if len(self) else np.empty(0, dtype=object)
+
+    def contagem_por_tipo(self):
+        """Contagem por tipo em uma única passada (bincount)."""
+        contagens = np.bincount(self.codigos, minlength=len(self.categorias))
+        return {nome: int(c) for nome, c in zip(self.categorias, contagens) if c}
+
+    def como_dicts(self):
+        """Lista de {'tipo', 'box_pixels', 'confianca'[, 'coords_gps']} (borda de serialização)."""
+        tipos = self.tipos().tolist()
+        caixas = self.caixas.tolist()
+        scores = self.scores.tolist()
+        if self.lat is None:
+            return [
+                {"tipo": t, "box_pixels": c, "confianca": s}
+                for t, c, s in zip(tipos, caixas, scores)
+            ]
+        return [
+            {"tipo": t, "box_pixels": c, "confianca": s, "coords_gps": {"lat": la, "lon": lo}}
+            for t, c, s, la, lo in zip(tipos, caixas, scores, self.lat.tolist(), self.lon.tolist())
+        ]
@@ -1,3 +1,4 @@
+import numpy as np
 from typing import List
 from app.schemas.parking_schema import PontoGPS
 
@@ -16,33 +17,174 @@ def calcular_bounding_box(pontos: List[PontoGPS]):
         "center_lat": center_lat, "center_lon": center_lon
     }
 
-def pixel_para_gps(box_pixels, bbox_gps, img_width, img_height):
-    x_min, y_min, x_max, y_max = box_pixels
-    centro_x_pixel = (x_min + x_max) / 2
-    centro_y_pixel = (y_min + y_max) / 2
-    
-    lon_percent = centro_x_pixel / img_width
-    lat_percent = centro_y_pixel / img_height
-    
-    lon_final = bbox_gps['min_lon'] + (bbox_gps['max_lon'] - bbox_gps['min_lon']) * lon_percent
-    lat_final = bbox_gps['max_lat'] - (bbox_gps['max_lat'] - bbox_gps['min_lat']) * lat_percent
-    
-    return {"lat": lat_final, "lon": lon_final}
+def vagas_compactas(vagas):
+    """
+    Forma compacta (colunar) das vagas de um resultado, a partir de
+    Deteccoes com lat/lon: guardada no cache e expandida em Features GeoJSON
+    só na borda da resposta (`features_geojson`).
+    """
+    sem_gps = vagas.lat is None
+    return {
+        "categorias": list(vagas.categorias),
+        "codigos": vagas.codigos.tolist(),
+        "lat": [] if sem_gps else vagas.lat.tolist(),
+        "lon": [] if sem_gps else vagas.lon.tolist(),
+    }
+
 
-def criar_geojson(vagas_com_gps):
-    features = []
-    for i, vaga in enumerate(vagas_com_gps):
-        feature = {
+def features_geojson(vagas, inicio=0, fim=None):
+    """Features GeoJSON (pontos) das vagas compactas no intervalo [inicio, fim)."""
+    categorias = vagas["categorias"]
+    fim = len(vagas["codigos"]) if fim is None else fim
+    return [
+        {
             "type": "Feature",
             "geometry": {
                 "type": "Point",
-                "coordinates": [vaga['coords_gps']['lon'], vaga['coords_gps']['lat']]
+                "coordinates": [lon, lat]
             },
             "properties": {
                 "id": i,
-                "tipo_vaga": vaga['tipo']
+                "tipo_vaga": categorias[codigo]
             }
         }
-        features.append(feature)
-        
-    return {"type": "FeatureCollection", "features": features}
\ No newline at end of file
+        for i, codigo, lat, lon in zip(
+            range(inicio, fim), vagas["codigos"][inicio:fim], vagas["lat"][inicio:fim], vagas["lon"][inicio:fim]
+        )
+    ]
+
+def ponto_no_poligono(x, y, poligono):
+    """Teste de ponto em polígono (ray casting). `poligono` é uma lista de (x, y)."""
+    dentro = False
+    n = len(poligono)
+    for i in range(n):
+        x1, y1 = poligono[i]
+        x2, y2 = poligono[(i + 1) % n]
+        if (y1 > y) != (y2 > y):
+            x_cruzamento = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+            if x < x_cruzamento:
+                dentro = not dentro
+    return dentro
+
+
+def pontos_no_poligono(xs, ys, poligono):
+    """
+    Versão vetorizada de `ponto_no_poligono`.
+
+    Returns:
+        Array booleano com a mesma forma de `xs`
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    dentro = np.zeros(xs.shape, dtype=bool)
+    n = len(poligono)
+    for i in range(n):
+        xi, yi = poligono[i]
+        xj, yj = poligono[i - 1]
+        if yi == yj:
+            continue
+        cruza = ((yi > ys) != (yj > ys)) & (xs < (xj - xi) * (ys - yi) / (yj - yi) + xi)
+        dentro ^= cruza
+    return dentro
+
+
+def _orientacao(a, b, c):
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+
+def _segmentos_se_cruzam(p1, p2, q1, q2):
+    orientacao = _orientacao
+
+    def no_segmento(a, b, c):
+        return min(a[0], b[0]) <= c[0] <= max(a[0], b[0]) and min(a[1], b[1]) <= c[1] <= max(a[1], b[1])
+
+    d1 = orientacao(q1, q2, p1)
+    d2 = orientacao(q1, q2, p2)
+    d3 = orientacao(p1, p2, q1)
+    d4 = orientacao(p1, p2, q2)
+    if ((d1 > 0) != (d2 > 0) and d1 != 0 and d2 != 0) and ((d3 > 0) != (d4 > 0) and d3 != 0 and d4 != 0):
+        return True
+
+    # Casos colineares / extremidade sobre o outro segmento
+    return (
+        (d1 == 0 and no_segmento(q1, q2, p1))
+        or (d2 == 0 and no_segmento(q1, q2, p2))
+        or (d3 == 0 and no_segmento(p1, p2, q1))
+        or (d4 == 0 and no_segmento(p1, p2, q2))
+    )
+
+
+def retangulo_intersecta_poligono(retangulo, poligono):
+    """
+    Verifica se o retângulo (x_min, y_min, x_max, y_max) e o polígono
+    (lista de (x, y)) têm alguma área em comum.
+    """
+    x_min, y_min, x_max, y_max = retangulo
+
+    # Algum vértice do polígono dentro do retângulo
+    if any(x_min <= x <= x_max and y_min <= y <= y_max for x, y in poligono):
+        return True
+
+    cantos = [(x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)]
+
+    # Retângulo inteiramente dentro do polígono
+    if ponto_no_poligono(cantos[0][0], cantos[0][1], poligono):
+        return True
+
+    # Alguma aresta do polígono cruza uma aresta do retângulo
+    n = len(poligono)
+    for i in range(n):
+        p1, p2 = poligono[i], poligono[(i + 1) % n]
+        for j in range(4):
+            if _segmentos_se_cruzam(p1, p2, cantos[j], cantos[(j + 1) % 4]):
+                return True
+    return False
+
+
+def _no_contorno(ponto, poligono, tolerancia=1e-9):
+    """Verifica se o ponto está sobre alguma aresta do polígono (com tolerância relativa)."""
+    n = len(poligono)
+    for i in range(n):
+        a, b = poligono[i], poligono[(i + 1) % n]
+        escala = np.hypot(b[0] - a[0], b[1] - a[1]) * np.hypot(ponto[0] - a[0], ponto[1] - a[1])
+        if (
+            abs(_orientacao(a, b, ponto)) <= tolerancia * escala
+            and min(a[0], b[0]) <= ponto[0] <= max(a[0], b[0])
+            and min(a[1], b[1]) <= ponto[1] <= max(a[1], b[1])
+        ):
+            return True
+    return False
+
+
+def poligono_contem(externo, interno):
+    """
+    Verifica se o polígono `externo` contém inteiramente o polígono `interno`
+    (listas de (x, y)); os contornos podem se tocar, e polígonos idênticos
+    contêm um ao outro.
+    """
+    def dentro_ou_no_contorno(ponto, poligono):
+        return _no_contorno(ponto, poligono) or ponto_no_poligono(ponto[0], ponto[1], poligono)
+
+    # Vértices e pontos médios das arestas do interno dentro do externo
+    n = len(interno)
+    for i in range(n):
+        p1, p2 = interno[i], interno[(i + 1) % n]
+        medio = ((p1[0] + p2[0]) / 2, (p1[1] + p2[1]) / 2)
+        if not dentro_ou_no_contorno(p1, externo) or not dentro_ou_no_contorno(medio, externo):
+            return False
+
+    # Nenhuma aresta do interno atravessa o contorno do externo
+    m = len(externo)
+    for i in range(n):
+        p1, p2 = interno[i], interno[(i + 1) % n]
+        for j in range(m):
+            q1, q2 = externo[j], externo[(j + 1) % m]
+            d1, d2 = _orientacao(q1, q2, p1), _orientacao(q1, q2, p2)
+            d3, d4 = _orientacao(p1, p2, q1), _orientacao(p1, p2, q2)
+            if d1 * d2 < 0 and d3 * d4 < 0:
+                return False
+
+    # Nenhum vértice (reentrância) do externo dentro do interno
+    return not any(
+        not _no_contorno(v, interno) and ponto_no_poligono(v[0], v[1], interno) for v in externo
+    )
@@ -0,0 +1,181 @@
+import time
+import asyncio
+import random
+import threading
+import importlib.util
+import logging
+import httpx
+from app.api.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Status considerados transitórios (vale a pena tentar novamente)
+STATUS_TRANSITORIOS = {429, 500, 502, 503, 504}
+
+
+def http2_disponivel():
+    """HTTP/2 no httpx depende do pacote opcional `h2`."""
+    return importlib.util.find_spec("h2") is not None
+
+
+class ClienteHttp:
+    """
+    Cliente HTTP de longa duração com pool de conexões e keep-alive.
+
+    Reaproveita conexões TCP/TLS entre requisições, usa HTTP/2 quando o pacote
+    `h2` está instalado, limita o número de conexões simultâneas por host e
+    repete requisições com backoff exponencial em falhas transitórias.
+    Deve ser criado uma vez e compartilhado durante toda a vida do processo.
+    """
+
+    def __init__(
+        self,
+        timeout=None,
+        max_conexoes=None,
+        max_por_host=None,
+        max_tentativas=None,
+        backoff_base=None,
+    ):
+        self.timeout = timeout or settings.TILE_TIMEOUT
+        self.max_conexoes = max_conexoes or settings.HTTP_MAX_CONEXOES
+        self.max_por_host = max_por_host or settings.HTTP_MAX_CONEXOES_POR_HOST
+        self.max_tentativas = max_tentativas or settings.HTTP_MAX_TENTATIVAS
+        self.backoff_base = backoff_base if backoff_base is not None else settings.HTTP_BACKOFF_BASE
+        self.http2 = http2_disponivel()
+
+        self._cliente = None
+        self._semaforos = {}
+        self._lock = threading.Lock()
+
+        # Cliente assíncrono e semáforos ficam presos ao event loop que os
+        # criou: um par por loop, fechado em `fechar_async`
+        self._clientes_async = {}
+
+    def _limites(self):
+        return httpx.Limits(
+            max_connections=self.max_conexoes,
+            max_keepalive_connections=self.max_conexoes,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+
+    def _obter_cliente(self):
+        if self._cliente is None:
+            with self._lock:
+                if self._cliente is None:
+                    self._cliente = httpx.Client(
+                        http2=self.http2,
+                        limits=self._limites(),
+                        timeout=self.timeout,
+                        follow_redirects=True,
+                    )
+                    logger.info(f"Cliente HTTP criado (http2={self.http2}, max_conexoes={self.max_conexoes})")
+        return self._cliente
+
+    def _semaforo_host(self, host):
+        with self._lock:
+            semaforo = self._semaforos.get(host)
+            if semaforo is None:
+                semaforo = threading.BoundedSemaphore(self.max_por_host)
+                self._semaforos[host] = semaforo
+            return semaforo
+
+    def _espera_backoff(self, tentativa):
+        """Backoff exponencial com jitter: base * 2^tentativa * [0.5, 1.5)."""
+        return self.backoff_base * (2 ** tentativa) * (0.5 + random.random())
+
+    def get(self, url):
+        """
+        Faz um GET reaproveitando o pool de conexões.
+
+        Repete em erros de transporte e status transitórios (429/5xx). Após a
+        última tentativa, devolve a última resposta recebida ou relança o erro.
+
+        Returns:
+            httpx.Response
+        """
+        cliente = self._obter_cliente()
+        semaforo = self._semaforo_host(httpx.URL(url).host)
+
+        for tentativa in range(self.max_tentativas):
+            ultima = tentativa == self.max_tentativas - 1
+            try:
+                with semaforo:
+                    response = cliente.get(url)
+            except httpx.TransportError as e:
+                if ultima:
+                    raise
+                logger.debug(f"Erro de transporte em {url}: {e}; nova tentativa")
+            else:
+                if response.status_code not in STATUS_TRANSITORIOS or ultima:
+                    return response
+                logger.debug(f"{url} retornou {response.status_code}; nova tentativa")
+
+            time.sleep(self._espera_backoff(tentativa))
+
+    def _obter_cliente_async(self):
+        """Cliente e semáforos por host do event loop em execução."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            par = self._clientes_async.get(loop)
+            if par is None:
+                # Loops já fechados não têm mais como encerrar seus clientes
+                for antigo in [l for l in self._clientes_async if l.is_closed()]:
+                    del self._clientes_async[antigo]
+                cliente = httpx.AsyncClient(
+                    http2=self.http2,
+                    limits=self._limites(),
+                    timeout=self.timeout,
+                    follow_redirects=True,
+                )
+                par = self._clientes_async[loop] = (cliente, {})
+                logger.info(f"Cliente HTTP assíncrono criado (http2={self.http2}, max_conexoes={self.max_conexoes})")
+        return par
+
+    def _semaforo_host_async(self, semaforos, host):
+        semaforo = semaforos.get(host)
+        if semaforo is None:
+            semaforo = asyncio.Semaphore(self.max_por_host)
+            semaforos[host] = semaforo
+        return semaforo
+
+    async def get_async(self, url):
+        """Versão assíncrona de `get`, com o mesmo pool, limites e política de retry."""
+        cliente, semaforos = self._obter_cliente_async()
+        semaforo = self._semaforo_host_async(semaforos, httpx.URL(url).host)
+
+        for tentativa in range(self.max_tentativas):
+            ultima = tentativa == self.max_tentativas - 1
+            try:
+                async with semaforo:
+                    response = await cliente.get(url)
+            except httpx.TransportError as e:
+                if ultima:
+                    raise
+                logger.debug(f"Erro de transporte em {url}: {e}; nova tentativa")
+            else:
+                if response.status_code not in STATUS_TRANSITORIOS or ultima:
+                    return response
+                logger.debug(f"{url} retornou {response.status_code}; nova tentativa")
+
+            await asyncio.sleep(self._espera_backoff(tentativa))
+
+    def fechar(self):
+        with self._lock:
+            if self._cliente is not None:
+                self._cliente.close()
+                self._cliente = None
+
+    async def fechar_async(self):
+        """
+        Fecha o cliente síncrono e os assíncronos: o do loop atual é fechado
+        aqui; os de outros loops ainda ativos são fechados no próprio loop.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clientes, self._clientes_async = self._clientes_async, {}
+        for dono, (cliente, _) in clientes.items():
+            if dono is loop:
+                await cliente.aclose()
+            elif dono.is_running():
+                asyncio.run_coroutine_threadsafe(cliente.aclose(), dono)
+        self.fechar()
@@ -0,0 +1,97 @@
+import io
+import logging
+import numpy as np
+from PIL import Image
+from app.api.config import settings
+from app.services.tile_cache import CacheLRUMemoria
+
+logger = logging.getLogger(__name__)
+
+TIPOS_MIDIA = {
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "png": "image/png",
+}
+
+# Imagens já codificadas, por chave de requisição (centro, tamanho e opções)
+cache_codificadas = CacheLRUMemoria(settings.IMAGEM_CACHE_MAX_BYTES, len)
+
+
+def escolher_formato(formato=None, accept=None):
+    """
+    Formato de saída: o parâmetro explícito tem prioridade; sem ele, usa
+    WebP só se o cliente o listar explicitamente no `Accept` com q > 0 e
+    com peso não menor que o do JPEG; caso contrário, JPEG.
+    """
+    if formato:
+        return formato
+    pesos = _pesos_accept(accept)
+    peso_webp = pesos.get("image/webp", 0.0)
+    peso_jpeg = pesos.get("image/jpeg", pesos.get("image/*", pesos.get("*/*", 1.0)))
+    if peso_webp > 0 and peso_webp >= peso_jpeg:
+        return "webp"
+    return "jpeg"
+
+
+def _pesos_accept(accept):
+    """Tipos de mídia do cabeçalho Accept e seus pesos q (1.0 se omitido)."""
+    pesos = {}
+    for item in (accept or "").split(","):
+        tipo, *parametros = [parte.strip() for parte in item.split(";")]
+        if not tipo:
+            continue
+        peso = 1.0
+        for parametro in parametros:
+            nome, _, valor = parametro.partition("=")
+            if nome.strip().lower() == "q":
+                try:
+                    peso = float(valor)
+                except ValueError:
+                    peso = 0.0
+        pesos[tipo.lower()] = peso
+    return pesos
+
+
+def redimensionar(imagem, largura_max):
+    """Reduz a imagem para no máximo `largura_max` de largura, mantendo a proporção."""
+    if not largura_max or imagem.width <= largura_max:
+        return imagem
+    fator = imagem.width / largura_max
+    if fator.is_integer():
+        # Redução por fator inteiro: média de blocos, bem mais rápida que um filtro
+        return imagem.reduce(int(fator))
+    altura = max(1, round(imagem.height / fator))
+    return imagem.resize((largura_max, altura), Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+
+def codificar(imagem, formato="jpeg", qualidade=None, progressivo=False, largura_max=None):
+    """
+    Codifica a imagem (PIL ou array RGB do mosaico) no formato pedido.
+
+    Args:
+        formato: "jpeg", "webp" ou "png"
+        qualidade: 1-100 (JPEG/WebP)
+        progressivo: JPEG progressivo
+        largura_max: Reduz a imagem antes de codificar
+
+    Returns:
+        bytes
+    """
+    qualidade = qualidade or settings.IMAGEM_QUALIDADE_PADRAO
+    if isinstance(imagem, np.ndarray):
+        # Única cópia antes do encoder: o PIL não compartilha memória com arrays RGB
+        imagem = Image.fromarray(imagem)
+    imagem = redimensionar(imagem, largura_max)
+    if imagem.mode != "RGB":
+        imagem = imagem.convert("RGB")
+
+    buffer = io.BytesIO()
+    if formato == "jpeg":
+        imagem.save(buffer, format="JPEG", quality=qualidade, progressive=progressivo)
+    elif formato == "webp":
+        imagem.save(buffer, format="WEBP", quality=qualidade, method=settings.IMAGEM_WEBP_METODO)
+    elif formato == "png":
+        imagem.save(buffer, format="PNG", compress_level=1)
+    else:
+        raise ValueError(f"Formato de imagem não suportado: {formato}")
+    return buffer.getvalue()
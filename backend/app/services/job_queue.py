@@ -0,0 +1,359 @@
+import time
+import uuid
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+import redis.asyncio as redis_async
+from app.api.config import settings
+from app.schemas.parking_schema import PontoGPS
+from app.services import serializacao, analise_service
+
+logger = logging.getLogger(__name__)
+
+PREFIXO = "sip:job"
+FILA = f"{PREFIXO}s:fila"
+EM_PROCESSAMENTO = f"{PREFIXO}s:processando"
+
+PENDENTE = "pendente"
+PROCESSANDO = "processando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+ESTADOS_FINAIS = (CONCLUIDO, ERRO)
+
+
+class BackendFilaMemoria:
+    """Fila e estado dos jobs no próprio processo, para testes e desenvolvimento local."""
+
+    def __init__(self):
+        self._fila = asyncio.Queue()
+        self._jobs = {}
+        self._assinantes = {}
+
+    async def enfileirar(self, job_id):
+        await self._fila.put(job_id)
+
+    async def proximo(self, timeout):
+        try:
+            return await asyncio.wait_for(self._fila.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def concluir(self, job_id):
+        pass
+
+    async def recuperar(self, prazo):
+        # A fila vive no processo: não sobra job de um worker que caiu
+        return 0
+
+    async def salvar(self, job, ttl):
+        # Cópia: o worker continua alterando o dicionário do job
+        job = dict(job)
+        self._jobs[job["id"]] = (job, time.time() + ttl)
+        for fila in self._assinantes.get(job["id"], ()):
+            fila.put_nowait(job)
+
+    async def obter(self, job_id):
+        item = self._jobs.get(job_id)
+        if item is None:
+            return None
+        job, expira_em = item
+        if expira_em < time.time():
+            del self._jobs[job_id]
+            return None
+        return job
+
+    @asynccontextmanager
+    async def assinar(self, job_id):
+        fila = asyncio.Queue()
+        self._assinantes.setdefault(job_id, set()).add(fila)
+
+        async def eventos():
+            while True:
+                yield await fila.get()
+
+        try:
+            yield eventos()
+        finally:
+            assinantes = self._assinantes.get(job_id, set())
+            assinantes.discard(fila)
+            if not assinantes:
+                self._assinantes.pop(job_id, None)
+
+    def pendentes(self):
+        return self._fila.qsize()
+
+    async def fechar(self):
+        pass
+
+
+class BackendFilaRedis:
+    """
+    Fila Redis compartilhada entre réplicas da API; o estado de cada job
+    fica em uma chave com TTL e cada atualização é publicada em um canal
+    pub/sub para os assinantes (WebSocket).
+
+    `proximo` move o id da fila para a lista de processamento (BLMOVE), de
+    onde só sai em `concluir`, depois que o job chega a um estado final. Se
+    a réplica cair no meio, `recuperar` devolve o job à fila.
+    """
+
+    def __init__(self, url):
+        self._cliente = redis_async.from_url(url)
+
+    async def enfileirar(self, job_id):
+        await self._cliente.lpush(FILA, job_id)
+
+    async def proximo(self, timeout):
+        item = await self._cliente.blmove(FILA, EM_PROCESSAMENTO, max(1, int(timeout)), "RIGHT", "LEFT")
+        return item.decode() if item else None
+
+    async def concluir(self, job_id):
+        await self._cliente.lrem(EM_PROCESSAMENTO, 1, job_id)
+
+    async def recuperar(self, prazo):
+        """
+        Devolve à fila os jobs em processamento sem atualização há mais de
+        `prazo` segundos (worker que caiu) e descarta os já finalizados ou
+        expirados.
+
+        Returns:
+            Número de jobs devolvidos à fila
+        """
+        recuperados = 0
+        for item in await self._cliente.lrange(EM_PROCESSAMENTO, 0, -1):
+            job_id = item.decode()
+            job = await self.obter(job_id)
+            ativo = job is not None and job["status"] not in ESTADOS_FINAIS
+            if ativo and time.time() - job["atualizado_em"] < prazo:
+                continue
+            # Só quem remove o item o devolve: réplicas podem recuperar ao mesmo tempo
+            if await self._cliente.lrem(EM_PROCESSAMENTO, 1, job_id) and ativo:
+                await self.enfileirar(job_id)
+                recuperados += 1
+        return recuperados
+
+    async def salvar(self, job, ttl):
+        dados = serializacao.dumps(job)
+        await self._cliente.set(f"{PREFIXO}:{job['id']}", dados, ex=int(ttl))
+        await self._cliente.publish(f"{PREFIXO}:{job['id']}:eventos", dados)
+
+    async def obter(self, job_id):
+        dados = await self._cliente.get(f"{PREFIXO}:{job_id}")
+        return serializacao.loads(dados) if dados is not None else None
+
+    @asynccontextmanager
+    async def assinar(self, job_id):
+        canal = f"{PREFIXO}:{job_id}:eventos"
+        pubsub = self._cliente.pubsub()
+        await pubsub.subscribe(canal)
+
+        async def eventos():
+            async for mensagem in pubsub.listen():
+                if mensagem["type"] == "message":
+                    yield serializacao.loads(mensagem["data"])
+
+        try:
+            yield eventos()
+        finally:
+            await pubsub.unsubscribe(canal)
+            await pubsub.aclose()
+
+    def pendentes(self):
+        return None
+
+    async def fechar(self):
+        await self._cliente.aclose()
+
+
+class _Progresso:
+    """
+    Callback de progresso `(etapa, fracao)` que pode ser chamado de qualquer
+    thread; o worker grava o último valor no estado do job, com intervalo
+    mínimo entre gravações.
+    """
+
+    def __init__(self, loop):
+        self._loop = loop
+        self.evento = asyncio.Event()
+        self.etapa = None
+        self.fracao = 0.0
+
+    def __call__(self, etapa, fracao):
+        self.etapa, self.fracao = etapa, fracao
+        self._loop.call_soon_threadsafe(self.evento.set)
+
+
+class FilaAnalises:
+    """
+    Jobs de análise assíncronos: `submeter` devolve um id imediatamente e
+    `workers` tarefas consomem a fila, executando `funcao(pontos,
+    ao_progredir)`. Clientes consultam o estado (`obter`) ou acompanham as
+    atualizações (`acompanhar`), incluindo o progresso parcial.
+    """
+
+    def __init__(self, backend, funcao, workers=None, ttl=None, intervalo_progresso=None, prazo_processamento=None):
+        self.backend = backend
+        self.funcao = funcao
+        self.workers = workers or settings.JOBS_WORKERS
+        self.ttl = ttl or settings.JOBS_TTL
+        self.intervalo_progresso = (
+            settings.JOBS_INTERVALO_PROGRESSO if intervalo_progresso is None else intervalo_progresso
+        )
+        self.prazo_processamento = prazo_processamento or settings.JOBS_PRAZO_PROCESSAMENTO
+        self._tarefas = []
+        self.processados = 0
+        self.falhas = 0
+
+    async def submeter(self, pontos):
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": PENDENTE,
+            "etapa": None,
+            "progresso": 0.0,
+            "criado_em": time.time(),
+            "atualizado_em": time.time(),
+            "pontos": [{"lat": p.lat, "lon": p.lon} for p in pontos],
+        }
+        await self.backend.salvar(job, self.ttl)
+        await self.backend.enfileirar(job["id"])
+        logger.info(f"Job {job['id']} enfileirado ({len(pontos)} pontos)")
+        return job
+
+    async def obter(self, job_id):
+        return await self.backend.obter(job_id)
+
+    async def acompanhar(self, job_id):
+        """Gera o estado atual do job e cada atualização até um estado final."""
+        async with self.backend.assinar(job_id) as eventos:
+            job = await self.backend.obter(job_id)
+            if job is None:
+                return
+            yield job
+            if job["status"] in ESTADOS_FINAIS:
+                return
+            async for job in eventos:
+                yield job
+                if job["status"] in ESTADOS_FINAIS:
+                    return
+
+    async def iniciar(self):
+        if not self._tarefas:
+            self._tarefas = [
+                asyncio.create_task(self._worker(i), name=f"job-worker-{i}")
+                for i in range(self.workers)
+            ]
+            self._tarefas.append(asyncio.create_task(self._recuperar_periodicamente(), name="job-recuperacao"))
+            logger.info(f"Fila de análises iniciada com {self.workers} workers ({type(self.backend).__name__})")
+
+    async def fechar(self):
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+        await self.backend.fechar()
+
+    async def _atualizar(self, job, **campos):
+        job.update(campos, atualizado_em=time.time())
+        await self.backend.salvar(job, self.ttl)
+
+    async def _worker(self, indice):
+        while True:
+            try:
+                job_id = await self.backend.proximo(timeout=5)
+            except Exception as e:
+                logger.warning(f"[worker {indice}] Erro ao ler a fila de jobs: {e}")
+                await asyncio.sleep(1)
+                continue
+            if job_id is None:
+                continue
+            # Uma falha do backend (ex.: Redis indisponível) não encerra o
+            # worker: o job é marcado com erro ou, se nem isso for possível,
+            # fica na lista de processamento até `recuperar` devolvê-lo à fila
+            job = None
+            try:
+                job = await self.backend.obter(job_id)
+                if job is None:
+                    logger.warning(f"[worker {indice}] Job {job_id} expirado antes de ser processado")
+                else:
+                    await self._processar(job)
+                finalizado = True
+            except Exception as e:
+                self.falhas += 1
+                logger.error(f"[worker {indice}] Erro ao processar o job {job_id}: {e}")
+                finalizado = job is not None and await self._registrar_erro(job, f"Erro interno: {e}")
+            if finalizado:
+                try:
+                    await self.backend.concluir(job_id)
+                except Exception as e:
+                    logger.warning(f"[worker {indice}] Erro ao retirar o job {job_id} do processamento: {e}")
+
+    async def _registrar_erro(self, job, erro):
+        """Grava o estado de erro do job. Returns: True se a gravação funcionou"""
+        try:
+            await self._atualizar(job, status=ERRO, erro=erro)
+            return True
+        except Exception as e:
+            logger.error(f"Não foi possível registrar o erro do job {job['id']}: {e}")
+            return False
+
+    async def _recuperar_periodicamente(self):
+        while True:
+            try:
+                recuperados = await self.backend.recuperar(self.prazo_processamento)
+                if recuperados:
+                    logger.warning(f"{recuperados} jobs interrompidos devolvidos à fila")
+            except Exception as e:
+                logger.warning(f"Erro ao recuperar jobs interrompidos: {e}")
+            await asyncio.sleep(self.prazo_processamento / 2)
+
+    async def _processar(self, job):
+        await self._atualizar(job, status=PROCESSANDO)
+        progresso = _Progresso(asyncio.get_running_loop())
+        relator = asyncio.create_task(self._relatar_progresso(job, progresso))
+        try:
+            pontos = [PontoGPS(**p) for p in job["pontos"]]
+            resultado = await self.funcao(pontos, progresso)
+        except Exception as e:
+            await self._parar(relator)
+            self.falhas += 1
+            logger.error(f"Job {job['id']} falhou: {e}")
+            await self._atualizar(job, status=ERRO, erro=getattr(e, "detail", None) or str(e))
+            return
+        await self._parar(relator)
+        self.processados += 1
+        await self._atualizar(job, status=CONCLUIDO, etapa=None, progresso=1.0, resultado=resultado)
+
+    @staticmethod
+    async def _parar(tarefa):
+        tarefa.cancel()
+        await asyncio.gather(tarefa, return_exceptions=True)
+
+    async def _relatar_progresso(self, job, progresso):
+        while True:
+            await progresso.evento.wait()
+            progresso.evento.clear()
+            try:
+                await self._atualizar(job, etapa=progresso.etapa, progresso=round(progresso.fracao, 3))
+            except Exception as e:
+                logger.warning(f"Erro ao registrar o progresso do job {job['id']}: {e}")
+            await asyncio.sleep(self.intervalo_progresso)
+
+    def estatisticas(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "workers": self.workers if self._tarefas else 0,
+            "pendentes": self.backend.pendentes(),
+            "processados": self.processados,
+            "falhas": self.falhas,
+        }
+
+
+def criar_backend():
+    """Redis quando REDIS_URL está configurado; caso contrário, fila em memória."""
+    if settings.REDIS_URL:
+        return BackendFilaRedis(settings.REDIS_URL)
+    logger.info("REDIS_URL não configurado; usando fila de jobs em memória")
+    return BackendFilaMemoria()
+
+
+fila_analises = FilaAnalises(criar_backend(), analise_service.analisar_area)
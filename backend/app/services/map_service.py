@@ -1,19 +1,22 @@
 import time
 import io
+import asyncio
 import os
 import math
-import requests
-from PIL import Image
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+import numpy as np
+from PIL import Image, ImageDraw
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.action_chains import ActionChains
-from webdriver_manager.chrome import ChromeDriverManager
 from fastapi import HTTPException
 import logging
+from app.services import tile_fetcher, browser_pool, geo_service, projecao
+from app.services.buffer_pool import PoolBuffers, pool_mosaicos
+from app.services.http_client import ClienteHttp
+from app.services.coalescing import SingleFlight
+from app.api.config import settings
 
 # Configurar logger para o módulo
 logger = logging.getLogger(__name__)
@@ -27,106 +30,165 @@ logging.getLogger('WDM').setLevel(logging.WARNING)
 os.environ['WDM_LOG_LEVEL'] = '0'
 os.environ['WDM_PRINT_FIRST_LINE'] = 'False'
 
+TILE_SIZE = 256  # Tamanho padrão dos tiles do Google Maps
+ZOOM_PADRAO = 20  # Zoom máximo
 
-def obter_imagem_satelite_tiles(bbox, width=1280, height=1280):
+# Cliente HTTP compartilhado por todos os downloads de tiles do processo
+cliente_tiles = ClienteHttp()
+
+# Aquisições idênticas em andamento (mesmo centro, zoom e tamanho) são compartilhadas
+coalescencia_imagens = SingleFlight("imagens")
+
+# Navegadores headless reaproveitados pelo fallback via Selenium
+pool_navegadores = browser_pool.PoolNavegadores()
+
+
+async def iniciar():
+    """Prepara recursos do serviço (chamado no startup da aplicação)."""
+    if settings.CHROME_POOL_AQUECER:
+        try:
+            await asyncio.to_thread(pool_navegadores.aquecer)
+        except Exception as e:
+            logger.warning(f"Não foi possível pré-iniciar navegadores: {e}")
+
+
+async def fechar():
+    """Libera os recursos do serviço (chamado no shutdown da aplicação)."""
+    await cliente_tiles.fechar_async()
+    await asyncio.to_thread(pool_navegadores.fechar)
 
+
+def lat_lon_to_tile(lat, lon, zoom):
+    """Converte coordenadas lat/lon para tile x/y"""
+    lat_rad = math.radians(lat)
+    n = 2.0 ** zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return x, y
+
+
+def _planejar_mosaico(bbox, width, height):
+    """
+    Define o bloco de tiles (centralizado no centro do bbox) necessário para
+    cobrir uma imagem width x height.
+
+    Returns:
+        Tupla (zoom, start_x, start_y, tiles_x, tiles_y)
+    """
     center_lat = bbox['center_lat']
     center_lon = bbox['center_lon']
-    zoom = 20  # Zoom máximo
-    
-    def lat_lon_to_tile(lat, lon, zoom):
-        """Converte coordenadas lat/lon para tile x/y"""
-        lat_rad = math.radians(lat)
-        n = 2.0 ** zoom
-        x = int((lon + 180.0) / 360.0 * n)
-        y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
-        return x, y
+    zoom = ZOOM_PADRAO
     
     # Calcular tile central
     tile_x, tile_y = lat_lon_to_tile(center_lat, center_lon, zoom)
     
     # Calcular quantos tiles precisamos
-    tile_size = 256  # Tamanho padrão dos tiles do Google Maps
-    tiles_x = math.ceil(width / tile_size) + 2  # +2 para margem
-    tiles_y = math.ceil(height / tile_size) + 2
-    
-    # Criar imagem grande
-    full_width = tiles_x * tile_size
-    full_height = tiles_y * tile_size
-    full_image = Image.new('RGB', (full_width, full_height))
-    
-    logger.info(f"Montando imagem com {tiles_x}x{tiles_y} tiles")
+    tiles_x = math.ceil(width / TILE_SIZE) + 2  # +2 para margem
+    tiles_y = math.ceil(height / TILE_SIZE) + 2
     
     # Calcular tile inicial (canto superior esquerdo)
     start_x = tile_x - tiles_x // 2
     start_y = tile_y - tiles_y // 2
     
-    # Baixar e montar tiles
-    tiles_downloaded = 0
-    for dx in range(tiles_x):
-        for dy in range(tiles_y):
-            tx = start_x + dx
-            ty = start_y + dy
-            
-            # URL do tile - Google Maps satellite imagery
-            # lyrs=s significa satélite
-            tile_url = f"https://mt1.google.com/vt/lyrs=s&x={tx}&y={ty}&z={zoom}"
-            
-            try:
-                response = requests.get(tile_url, timeout=10)
-                if response.status_code == 200:
-                    tile_image = Image.open(io.BytesIO(response.content))
-                    full_image.paste(tile_image, (dx * tile_size, dy * tile_size))
-                    tiles_downloaded += 1
-                else:
-                    logger.warning(f"Tile ({tx},{ty}) retornou status {response.status_code}")
-            except Exception as e:
-                logger.warning(f"Erro ao baixar tile ({tx},{ty}): {e}")
-    
-    logger.info(f"Tiles baixados: {tiles_downloaded}/{tiles_x * tiles_y}")
+    return zoom, start_x, start_y, tiles_x, tiles_y
+
+
+def _planejar_recorte(bbox, width, height):
+    """
+    Posiciona o recorte width x height no centro do bloco de tiles de
+    `_planejar_mosaico` e lista apenas os tiles que o intersectam.
+
+    Returns:
+        Tupla (zoom, origem_x, origem_y, tiles), com a origem em pixels globais
+    """
+    zoom, start_x, start_y, tiles_x, tiles_y = _planejar_mosaico(bbox, width, height)
+    origem_x = start_x * TILE_SIZE + (tiles_x * TILE_SIZE - width) // 2
+    origem_y = start_y * TILE_SIZE + (tiles_y * TILE_SIZE - height) // 2
+    tiles = [
+        (tx, ty)
+        for tx in range(origem_x // TILE_SIZE, (origem_x + width - 1) // TILE_SIZE + 1)
+        for ty in range(origem_y // TILE_SIZE, (origem_y + height - 1) // TILE_SIZE + 1)
+    ]
+    return zoom, origem_x, origem_y, tiles
+
+
+def _colar_tile(destino, tile, x, y):
+    """Copia o tile para `destino` com o canto em (x, y), descartando o que ficar fora."""
+    altura, largura = destino.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + tile.shape[1], largura), min(y + tile.shape[0], altura)
+    if x0 < x1 and y0 < y1:
+        destino[y0:y1, x0:x1] = tile[y0 - y:y1 - y, x0 - x:x1 - x]
+
+
+def _validar_tiles(tiles_downloaded, total_tiles):
+    logger.info(f"Tiles baixados: {tiles_downloaded}/{total_tiles}")
     
     if tiles_downloaded == 0:
         raise HTTPException(
             status_code=503,
             detail="Não foi possível baixar nenhum tile do Google Maps"
         )
+
+
+def obter_imagem_satelite_tiles(bbox, width=1280, height=1280):
+    """
+    Monta a imagem width x height (array RGB) colando cada tile direto na
+    posição final: não há mosaico intermediário nem cópia de recorte.
+
+    Fora do `pool_mosaicos`: a imagem é alocada aqui e fica com o chamador.
+    No caminho assíncrono ela é compartilhada entre as requisições
+    coalescidas, e nenhuma delas sabe quando as outras terminaram; devolvê-la
+    ao pool exigiria copiá-la na saída da coalescência, o que custa tanto
+    quanto a alocação economizada.
+    """
+    zoom, origem_x, origem_y, tiles = _planejar_recorte(bbox, width, height)
+    imagem = np.zeros((height, width, 3), dtype=np.uint8)
+    
+    logger.info(f"Montando imagem {width}x{height} com {len(tiles)} tiles")
     
-    # Crop para tamanho exato desejado (centralizado)
-    left = (full_image.width - width) // 2
-    top = (full_image.height - height) // 2
-    final_image = full_image.crop((left, top, left + width, top + height))
+    def colar_tile(tx, ty, tile_image):
+        _colar_tile(imagem, tile_image, tx * TILE_SIZE - origem_x, ty * TILE_SIZE - origem_y)
     
-    logger.info(f"Imagem final: {final_image.size}")
+    # Baixar tiles em paralelo, colando cada um na imagem assim que chega
+    tiles_downloaded, _ = tile_fetcher.baixar_tiles(tiles, zoom, colar_tile, cliente_tiles)
     
-    return final_image
+    _validar_tiles(tiles_downloaded, len(tiles))
+    return imagem
 
 
-def obter_imagem_satelite(bbox, width=1280, height=1280):
+async def obter_imagem_satelite_tiles_async(bbox, width=1280, height=1280):
+    """
+    Versão assíncrona de `obter_imagem_satelite_tiles`: os downloads não
+    bloqueiam o event loop e cada tile é colado assim que chega. Também
+    aloca a própria imagem, fora do `pool_mosaicos`.
+    """
+    zoom, origem_x, origem_y, tiles = _planejar_recorte(bbox, width, height)
+    imagem = np.zeros((height, width, 3), dtype=np.uint8)
+    
+    logger.info(f"Montando imagem {width}x{height} com {len(tiles)} tiles")
+    
+    def colar_tile(tx, ty, tile_image):
+        _colar_tile(imagem, tile_image, tx * TILE_SIZE - origem_x, ty * TILE_SIZE - origem_y)
+    
+    tiles_downloaded, _ = await tile_fetcher.baixar_tiles_async(tiles, zoom, colar_tile, cliente_tiles)
+    
+    _validar_tiles(tiles_downloaded, len(tiles))
+    return imagem
+
+
+def obter_imagem_satelite(bbox, width=1280, height=1280, zoom=ZOOM_PADRAO):
     """
     MÉTODO ALTERNATIVO (Selenium): Usa web scraping do Google Maps.
-    Mais lento mas funciona como fallback.
+    Mais lento mas funciona como fallback. Retorna um array RGB, como o
+    método de tiles, na escala do `zoom` informado (a mesma usada para
+    georreferenciar a captura).
     """
     center_lon = bbox['center_lon']
     center_lat = bbox['center_lat']
-    zoom = 20
-    
-    chrome_options = Options()
-    chrome_options.add_argument('--headless=new')
-    chrome_options.add_argument('--no-sandbox')
-    chrome_options.add_argument('--disable-dev-shm-usage')
-    chrome_options.add_argument('--disable-gpu')
-    chrome_options.add_argument(f'--window-size={width + 100},{height + 100}')
-    chrome_options.add_argument('--log-level=3')
-    chrome_options.add_argument('--silent')
-    chrome_options.add_experimental_option('excludeSwitches', ['enable-automation', 'enable-logging'])
-    
-    driver = None
-    try:
-        service = Service(
-            ChromeDriverManager().install(),
-            log_path='NUL' if os.name == 'nt' else '/dev/null'
-        )
-        driver = webdriver.Chrome(service=service, options=chrome_options)
+    
+    with pool_navegadores.adquirir() as driver:
+        driver.set_window_size(width + 100, height + 100)
         
         url = f"https://www.google.com/maps/@{center_lat},{center_lon},{zoom}z/data=!3m1!1e3"
         logger.info(f"Acessando: {url}")
@@ -136,7 +198,7 @@ def obter_imagem_satelite(bbox, width=1280, height=1280):
         WebDriverWait(driver, 20).until(
             EC.presence_of_element_located((By.CSS_SELECTOR, "canvas"))
         )
-        time.sleep(15)  # Aguardar tiles
+        browser_pool.aguardar_tiles_carregados(driver)  # Aguardar tiles (rede ociosa)
         
         # Remover UI
         driver.execute_script("""
@@ -144,18 +206,15 @@ def obter_imagem_satelite(bbox, width=1280, height=1280):
         """)
         
         screenshot = driver.get_screenshot_as_png()
-        image = Image.open(io.BytesIO(screenshot))
-        
-        # Crop centralizado
-        left = (image.width - width) // 2
-        top = (image.height - height) // 2
-        image = image.crop((left, top, left + width, top + height))
-        
-        return image
-        
-    finally:
-        if driver:
-            driver.quit()
+    
+    image = Image.open(io.BytesIO(screenshot))
+    
+    # Crop centralizado
+    left = (image.width - width) // 2
+    top = (image.height - height) // 2
+    image = image.crop((left, top, left + width, top + height))
+    
+    return np.array(image.convert('RGB'))
 
 
 def obter_imagem_satelite_com_retry(bbox, width=1280, height=1280, max_retries=2):
@@ -185,4 +244,271 @@ def obter_imagem_satelite_com_retry(bbox, width=1280, height=1280, max_retries=2
     raise HTTPException(
         status_code=503,
         detail="Não foi possível obter imagem de satélite. Tente novamente."
-    )
\ No newline at end of file
+    )
+
+
+async def obter_imagem_satelite_com_retry_async(bbox, width=1280, height=1280, max_retries=2):
+    """
+    Versão assíncrona de `obter_imagem_satelite_com_retry`.
+    
+    Chamadas concorrentes para o mesmo centro e tamanho compartilham uma
+    única aquisição; a imagem retornada é compartilhada e não deve ser
+    modificada pelo chamador.
+    """
+    chave = (
+        round(bbox['center_lat'], 6), round(bbox['center_lon'], 6),
+        ZOOM_PADRAO, width, height
+    )
+    return await coalescencia_imagens.executar(
+        chave, lambda: _obter_imagem_satelite_com_retry_async(bbox, width, height, max_retries)
+    )
+
+
+async def _obter_imagem_satelite_com_retry_async(bbox, width, height, max_retries):
+    """
+    Os tiles são baixados com I/O não bloqueante; o fallback via Selenium
+    (síncrono por natureza) roda em uma thread e a espera entre tentativas
+    usa asyncio.sleep, de modo que o worker continua atendendo outras
+    requisições durante a aquisição.
+    """
+    
+    # MÉTODO 1: Tiles (preferido)
+    try:
+        logger.info("Usando método de tiles (rápido)")
+        return await obter_imagem_satelite_tiles_async(bbox, width, height)
+    except Exception as e:
+        logger.warning(f"Método de tiles falhou: {e}")
+    
+    # MÉTODO 2: Selenium (fallback)
+    return await _obter_via_selenium_async(bbox, width, height, max_retries)
+
+
+async def _obter_via_selenium_async(bbox, width, height, max_retries, zoom=ZOOM_PADRAO):
+    for attempt in range(max_retries):
+        try:
+            logger.info(f"Usando Selenium (tentativa {attempt + 1}/{max_retries})")
+            return await asyncio.to_thread(obter_imagem_satelite, bbox, width, height, zoom)
+        except Exception as e:
+            logger.warning(f"Selenium falhou: {e}")
+            if attempt < max_retries - 1:
+                await asyncio.sleep(3)
+    
+    # Se tudo falhar
+    raise HTTPException(
+        status_code=503,
+        detail="Não foi possível obter imagem de satélite. Tente novamente."
+    )
+
+
+@dataclass
+class Mosaico:
+    """
+    Imagem de satélite georreferenciada.
+
+    `origem_x`/`origem_y` são as coordenadas de pixel globais Web Mercator
+    (no `zoom` da imagem) do canto superior esquerdo, o que permite converter
+    qualquer pixel da imagem em lat/lon exatos.
+
+    `imagem` é um array RGB (altura, largura, 3). Quando vem de `pool`, o
+    buffer deve ser devolvido com `liberar()` assim que a inferência termina.
+    """
+    imagem: np.ndarray
+    zoom: int
+    origem_x: float
+    origem_y: float
+    poligono_pixels: List[Tuple[float, float]] = field(default_factory=list)
+    tiles: int = 0
+    pool: Optional[PoolBuffers] = field(default=None, repr=False)
+
+    @property
+    def projecao(self):
+        return projecao.ProjecaoImagem(self.zoom, self.origem_x, self.origem_y)
+
+    def liberar(self):
+        if self.pool is not None:
+            self.pool.liberar(self.imagem)
+            self.pool = None
+
+
+def tiles_do_poligono(poligono_global, zoom):
+    """
+    Conjunto exato de tiles que intersectam o polígono (em pixels globais).
+
+    Returns:
+        Lista de (tx, ty)
+    """
+    xs = [x for x, _ in poligono_global]
+    ys = [y for _, y in poligono_global]
+    tx_min, tx_max = int(min(xs) // TILE_SIZE), int(max(xs) // TILE_SIZE)
+    ty_min, ty_max = int(min(ys) // TILE_SIZE), int(max(ys) // TILE_SIZE)
+    return [
+        (tx, ty)
+        for ty in range(ty_min, ty_max + 1)
+        for tx in range(tx_min, tx_max + 1)
+        if geo_service.retangulo_intersecta_poligono(
+            (tx * TILE_SIZE, ty * TILE_SIZE, (tx + 1) * TILE_SIZE, (ty + 1) * TILE_SIZE),
+            poligono_global,
+        )
+    ]
+
+
+def _mascarar_fora_do_poligono(imagem, poligono_pixels):
+    """Zera (preto), no próprio array, os pixels fora do polígono, para que não entrem na inferência."""
+    altura, largura = imagem.shape[:2]
+    mascara = Image.new('L', (largura, altura), 0)
+    ImageDraw.Draw(mascara).polygon(poligono_pixels, fill=1)
+    imagem *= np.asarray(mascara)[..., None]
+    return imagem
+
+
+@dataclass
+class PlanoMosaico:
+    """Retângulo (pixels globais) e tiles necessários para o mosaico de um polígono."""
+    zoom: int
+    poligono_global: List[Tuple[float, float]]
+    origem_x: int
+    origem_y: int
+    largura: int
+    altura: int
+    tiles: List[Tuple[int, int]]
+
+
+def planejar_mosaico_poligono(pontos, zoom=ZOOM_PADRAO):
+    """
+    Projeta o polígono e calcula o retângulo envolvente e os tiles que o
+    intersectam.
+
+    Raises:
+        HTTPException 413 se a área exigir mais que MOSAICO_MAX_TILES tiles
+    """
+    xs, ys = projecao.gps_para_pixel([p.lat for p in pontos], [p.lon for p in pontos], zoom)
+    origem_x, origem_y = math.floor(xs.min()), math.floor(ys.min())
+    poligono_global = list(zip(xs.tolist(), ys.tolist()))
+    tiles = tiles_do_poligono(poligono_global, zoom)
+    if len(tiles) > settings.MOSAICO_MAX_TILES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Área muito grande: {len(tiles)} tiles (máximo {settings.MOSAICO_MAX_TILES})"
+        )
+    return PlanoMosaico(
+        zoom=zoom,
+        poligono_global=poligono_global,
+        origem_x=origem_x,
+        origem_y=origem_y,
+        largura=max(1, math.ceil(xs.max()) - origem_x),
+        altura=max(1, math.ceil(ys.max()) - origem_y),
+        tiles=tiles,
+    )
+
+
+def _finalizar_mosaico(imagem, plano, origem_x, origem_y, pool=None):
+    """Mascara os pixels fora do polígono e georreferencia a imagem."""
+    poligono_pixels = [(x - origem_x, y - origem_y) for x, y in plano.poligono_global]
+    return Mosaico(
+        imagem=_mascarar_fora_do_poligono(imagem, poligono_pixels),
+        zoom=plano.zoom,
+        origem_x=origem_x,
+        origem_y=origem_y,
+        poligono_pixels=poligono_pixels,
+        tiles=len(plano.tiles),
+        pool=pool,
+    )
+
+
+async def obter_mosaico_poligono_async(pontos, zoom=ZOOM_PADRAO, max_retries=2, ao_progredir=None):
+    """
+    Monta um mosaico recortado no retângulo envolvente do polígono, baixando
+    apenas os tiles que intersectam o polígono, e mascara os pixels fora dele.
+    Banda e processamento passam a escalar com a área real do estacionamento.
+    
+    Se nenhum tile puder ser baixado, usa o Selenium centralizado na área.
+    `ao_progredir(fracao)` recebe a fração de tiles já recebidos.
+    
+    Os tiles são colados em um buffer de `pool_mosaicos`; o chamador deve
+    chamar `liberar()` no mosaico quando não precisar mais da imagem.
+    
+    Returns:
+        Mosaico
+    """
+    plano = planejar_mosaico_poligono(pontos, zoom)
+    origem_x, origem_y = plano.origem_x, plano.origem_y
+    pool = pool_mosaicos
+    
+    try:
+        imagem = await _montar_mosaico_tiles_async(plano, ao_progredir)
+    except Exception as e:
+        logger.warning(f"Método de tiles falhou: {e}")
+        # Selenium: captura centralizada no centro do retângulo do polígono,
+        # no zoom do plano (a origem e o polígono em pixels estão nessa escala)
+        centro_x, centro_y = origem_x + plano.largura / 2, origem_y + plano.altura / 2
+        centro_lat, centro_lon = projecao.pixel_para_gps(centro_x, centro_y, plano.zoom)
+        w = min(max(plano.largura, 640), 2560)
+        h = min(max(plano.altura, 640), 2560)
+        imagem = await _obter_via_selenium_async(
+            {"center_lat": float(centro_lat), "center_lon": float(centro_lon)}, w, h, max_retries,
+            zoom=plano.zoom,
+        )
+        origem_x, origem_y = centro_x - w // 2, centro_y - h // 2
+        pool = None
+    
+    return await asyncio.to_thread(_finalizar_mosaico, imagem, plano, origem_x, origem_y, pool)
+
+
+async def _montar_mosaico_tiles_async(plano, ao_progredir=None):
+    imagem = pool_mosaicos.adquirir(plano.altura, plano.largura)
+    tiles = plano.tiles
+    
+    logger.info(f"Montando mosaico do polígono com {len(tiles)} tiles ({plano.largura}x{plano.altura} px)")
+    
+    recebidos = 0
+    
+    def colar_tile(tx, ty, tile_image):
+        nonlocal recebidos
+        _colar_tile(imagem, tile_image, tx * TILE_SIZE - plano.origem_x, ty * TILE_SIZE - plano.origem_y)
+        recebidos += 1
+        if ao_progredir is not None:
+            ao_progredir(recebidos / len(tiles))
+    
+    try:
+        tiles_downloaded, _ = await tile_fetcher.baixar_tiles_async(tiles, plano.zoom, colar_tile, cliente_tiles)
+        _validar_tiles(tiles_downloaded, len(tiles))
+    except BaseException:
+        pool_mosaicos.liberar(imagem)
+        raise
+    
+    return imagem
+
+
+async def baixar_tiles_compartilhados_async(tiles, zoom):
+    """
+    Baixa uma única vez a união dos tiles de vários polígonos.
+
+    Returns:
+        Dicionário {(tx, ty): array RGB} com os tiles recebidos
+    """
+    recebidos = {}
+    
+    def guardar_tile(tx, ty, tile_image):
+        recebidos[(tx, ty)] = tile_image
+    
+    baixados, falhas = await tile_fetcher.baixar_tiles_async(sorted(tiles), zoom, guardar_tile, cliente_tiles)
+    logger.info(f"Tiles compartilhados baixados: {baixados}/{len(tiles)} (falhas: {falhas})")
+    return recebidos
+
+
+def montar_mosaico_de_tiles(plano, tiles_baixados):
+    """
+    Monta o mosaico de um polígono a partir de tiles já baixados
+    (`baixar_tiles_compartilhados_async`).
+
+    Returns:
+        Mosaico (com buffer de `pool_mosaicos`; chame `liberar()` ao terminar),
+        ou None se nenhum tile do polígono estiver disponível
+    """
+    disponiveis = [(tx, ty) for tx, ty in plano.tiles if (tx, ty) in tiles_baixados]
+    if not disponiveis:
+        return None
+    imagem = pool_mosaicos.adquirir(plano.altura, plano.largura)
+    for tx, ty in disponiveis:
+        _colar_tile(imagem, tiles_baixados[(tx, ty)], tx * TILE_SIZE - plano.origem_x, ty * TILE_SIZE - plano.origem_y)
+    return _finalizar_mosaico(imagem, plano, plano.origem_x, plano.origem_y, pool_mosaicos)
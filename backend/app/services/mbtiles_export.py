@@ -0,0 +1,131 @@
+"""
+Empacota o cache de tiles em disco em um arquivo MBTiles, para operação
+offline (TILE_PROVEDOR=mbtiles) em locais analisados com frequência.
+
+Uso:
+    python -m app.services.mbtiles_export saida.mbtiles
+    python -m app.services.mbtiles_export saida.mbtiles --zoom 19 20 --incluir-expirados
+"""
+import os
+import json
+import sqlite3
+import argparse
+import logging
+from app.api.config import settings
+from app.services import projecao, tile_cache
+
+logger = logging.getLogger(__name__)
+
+# Layout deduplicado do MBTiles: tiles com o mesmo conteúdo (mesmo hash no
+# cache) compartilham uma linha em `images`; `tiles` é uma view sobre o mapa
+ESQUEMA = """
+CREATE TABLE metadata (name TEXT, value TEXT);
+CREATE UNIQUE INDEX metadata_index ON metadata (name);
+CREATE TABLE images (tile_id TEXT PRIMARY KEY, tile_data BLOB);
+CREATE TABLE map (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_id TEXT);
+CREATE VIEW tiles AS
+    SELECT map.zoom_level AS zoom_level, map.tile_column AS tile_column,
+           map.tile_row AS tile_row, images.tile_data AS tile_data
+    FROM map JOIN images ON images.tile_id = map.tile_id;
+"""
+
+
+def _formato(conteudo):
+    if conteudo.startswith(b"\x89PNG"):
+        return "png"
+    if conteudo[:4] == b"RIFF" and conteudo[8:12] == b"WEBP":
+        return "webp"
+    return "jpg"
+
+
+def _limites(entradas):
+    """Bounds (oeste, sul, leste, norte) dos tiles do maior zoom exportado."""
+    zoom = max(z for z, *_ in entradas)
+    xs = [x for z, x, _, _, _ in entradas if z == zoom]
+    ys = [y for z, _, y, _, _ in entradas if z == zoom]
+    norte, oeste = projecao.pixel_para_gps(min(xs) * projecao.TILE_SIZE, min(ys) * projecao.TILE_SIZE, zoom)
+    sul, leste = projecao.pixel_para_gps((max(xs) + 1) * projecao.TILE_SIZE, (max(ys) + 1) * projecao.TILE_SIZE, zoom)
+    return ",".join(f"{float(v):.7f}" for v in (oeste, sul, leste, norte))
+
+
+def exportar(cache, caminho, zooms=None, incluir_expirados=False, nome="sip-tiles"):
+    """
+    Grava os tiles do cache em disco em um MBTiles. O arquivo é montado em um
+    temporário e renomeado ao final, então um provedor lendo o arquivo
+    anterior nunca vê uma exportação pela metade.
+
+    Returns:
+        Dicionário {tiles, imagens, bytes, zooms}
+    """
+    entradas = cache.entradas(zooms, incluir_expirados)
+    temporario = f"{caminho}.tmp"
+    if os.path.exists(temporario):
+        os.remove(temporario)
+
+    conn = sqlite3.connect(temporario)
+    gravadas = set()
+    ausentes = set()
+    formato = None
+    total_bytes = 0
+    exportadas = []
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(ESQUEMA)
+        for z, x, y, digest, arquivo in entradas:
+            if digest in ausentes:
+                continue
+            if digest not in gravadas:
+                try:
+                    with open(arquivo, "rb") as f:
+                        conteudo = f.read()
+                except FileNotFoundError:
+                    # Objeto removido pela limpeza LRU de outro worker
+                    ausentes.add(digest)
+                    continue
+                conn.execute("INSERT INTO images (tile_id, tile_data) VALUES (?, ?)", (digest, conteudo))
+                gravadas.add(digest)
+                total_bytes += len(conteudo)
+                formato = formato or _formato(conteudo)
+            conn.execute(
+                "INSERT INTO map (zoom_level, tile_column, tile_row, tile_id) VALUES (?, ?, ?, ?)",
+                (z, x, (1 << z) - 1 - y, digest),
+            )
+            exportadas.append((z, x, y, digest, arquivo))
+
+        # Índice criado depois da carga: mais rápido que mantê-lo a cada insert
+        conn.execute("CREATE UNIQUE INDEX map_index ON map (zoom_level, tile_column, tile_row)")
+        niveis = sorted({z for z, *_ in exportadas})
+        metadados = {"name": nome, "type": "baselayer", "version": "1", "format": formato or "jpg",
+                     "description": "Tiles exportados do cache do S-I-P"}
+        if niveis:
+            metadados.update(minzoom=str(niveis[0]), maxzoom=str(niveis[-1]), bounds=_limites(exportadas))
+        conn.executemany("INSERT INTO metadata (name, value) VALUES (?, ?)", metadados.items())
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(temporario, caminho)
+
+    relatorio = {"tiles": len(exportadas), "imagens": len(gravadas), "bytes": total_bytes, "zooms": niveis}
+    logger.info(f"MBTiles exportado em {caminho}: {relatorio}")
+    return relatorio
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Exporta o cache de tiles em disco para um arquivo MBTiles")
+    parser.add_argument("saida", help="Arquivo .mbtiles a gerar")
+    parser.add_argument("--zoom", type=int, nargs="+", help="Exporta apenas estes zooms")
+    parser.add_argument("--incluir-expirados", action="store_true", help="Inclui tiles fora do TTL do cache")
+    parser.add_argument("--nome", default="sip-tiles")
+    args = parser.parse_args()
+
+    if not settings.TILE_CACHE_HABILITADO:
+        parser.error("Cache de tiles em disco desabilitado (TILE_CACHE_HABILITADO)")
+    cache = tile_cache.obter_cache_disco()
+    relatorio = exportar(cache, args.saida, args.zoom, args.incluir_expirados, args.nome)
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
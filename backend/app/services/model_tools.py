@@ -0,0 +1,164 @@
+"""
+Ferramentas de exportação, quantização e comparação do detector de vagas.
+
+Uso:
+    python -m app.services.model_tools exportar
+    python -m app.services.model_tools quantizar
+    python -m app.services.model_tools comparar imagem1.jpg imagem2.jpg ...
+"""
+import json
+import time
+import shutil
+import argparse
+import logging
+import numpy as np
+from PIL import Image
+from app.api.config import settings
+from app.services import ai_service
+
+logger = logging.getLogger(__name__)
+
+
+def exportar_onnx(caminho_pt=None, caminho_onnx=None, tamanho_entrada=None):
+    """Exporta o modelo PyTorch (ultralytics) para ONNX com eixo de lote dinâmico."""
+    from ultralytics import YOLO
+
+    caminho_pt = caminho_pt or settings.MODEL_PATH
+    caminho_onnx = caminho_onnx or settings.ONNX_MODEL_PATH
+    exportado = YOLO(caminho_pt).export(
+        format="onnx",
+        imgsz=tamanho_entrada or settings.INFERENCIA_TAMANHO_ENTRADA,
+        dynamic=True,
+        simplify=True,
+    )
+    if exportado != caminho_onnx:
+        shutil.move(exportado, caminho_onnx)
+    logger.info(f"Modelo exportado para {caminho_onnx}")
+    return caminho_onnx
+
+
+def quantizar_int8(caminho_onnx=None, caminho_saida=None):
+    """
+    Gera a variante INT8 do modelo ONNX (quantização dinâmica dos pesos,
+    sem necessidade de dados de calibração).
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    caminho_onnx = caminho_onnx or settings.ONNX_MODEL_PATH
+    caminho_saida = caminho_saida or settings.ONNX_INT8_MODEL_PATH
+    quantize_dynamic(caminho_onnx, caminho_saida, weight_type=QuantType.QInt8)
+    logger.info(f"Modelo INT8 gravado em {caminho_saida}")
+    return caminho_saida
+
+
+def _iou(caixa, caixas):
+    x1 = np.maximum(caixa[0], caixas[:, 0])
+    y1 = np.maximum(caixa[1], caixas[:, 1])
+    x2 = np.minimum(caixa[2], caixas[:, 2])
+    y2 = np.minimum(caixa[3], caixas[:, 3])
+    intersecao = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (caixa[2] - caixa[0]) * (caixa[3] - caixa[1])
+    areas = (caixas[:, 2] - caixas[:, 0]) * (caixas[:, 3] - caixas[:, 1])
+    return intersecao / (area + areas - intersecao + 1e-9)
+
+
+def concordancia(referencia, candidato, iou_minimo=0.5):
+    """
+    Compara detecções de um backend com as do modelo de referência (float),
+    casando caixas do mesmo tipo com IoU >= iou_minimo.
+
+    Returns:
+        Dicionário com precisão, revocação e F1 relativos à referência
+    """
+    verdadeiros = total_ref = total_cand = 0
+    for dets_ref, dets_cand in zip(referencia, candidato):
+        total_ref += len(dets_ref)
+        total_cand += len(dets_cand)
+        tipos_ref = dets_ref.tipos()
+        tipos_cand = dets_cand.tipos()
+        disponiveis = np.ones(len(dets_ref), dtype=bool)
+        for i in np.argsort(-dets_cand.scores, kind="stable"):
+            candidatas = np.flatnonzero(disponiveis & (tipos_ref == tipos_cand[i]))
+            if not len(candidatas):
+                continue
+            ious = _iou(dets_cand.caixas[i], dets_ref.caixas[candidatas])
+            melhor = int(ious.argmax())
+            if ious[melhor] >= iou_minimo:
+                disponiveis[candidatas[melhor]] = False
+                verdadeiros += 1
+
+    precisao = verdadeiros / total_cand if total_cand else 1.0
+    revocacao = verdadeiros / total_ref if total_ref else 1.0
+    f1 = 2 * precisao * revocacao / (precisao + revocacao) if precisao + revocacao else 0.0
+    return {"precisao": precisao, "revocacao": revocacao, "f1": f1}
+
+
+def medir_latencia(backend, imagens, repeticoes=3):
+    """
+    Executa cada imagem `repeticoes` vezes (após aquecimento).
+
+    Returns:
+        Tupla (latências em ms, Deteccoes da primeira repetição)
+    """
+    backend.prever(imagens[:1])  # Aquecimento
+    latencias = []
+    resultados = []
+    for repeticao in range(repeticoes):
+        for imagem in imagens:
+            inicio = time.perf_counter()
+            deteccoes = backend.prever([imagem])[0]
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if repeticao == 0:
+                resultados.append(deteccoes)
+    latencias = np.array(latencias)
+    return {
+        "media_ms": float(latencias.mean()),
+        "p50_ms": float(np.percentile(latencias, 50)),
+        "p95_ms": float(np.percentile(latencias, 95)),
+    }, resultados
+
+
+def comparar_backends(imagens, referencia="onnx", candidatos=("onnx-int8",), repeticoes=3):
+    """
+    Mede a latência de cada backend e a concordância das detecções dos
+    candidatos com as do backend de referência (modelo float).
+    """
+    relatorio = {}
+    latencia, deteccoes_ref = medir_latencia(ai_service.criar_backend(referencia), imagens, repeticoes)
+    relatorio[referencia] = {"latencia": latencia}
+
+    for nome in candidatos:
+        latencia, deteccoes = medir_latencia(ai_service.criar_backend(nome), imagens, repeticoes)
+        relatorio[nome] = {
+            "latencia": latencia,
+            "concordancia_com_referencia": concordancia(deteccoes_ref, deteccoes),
+            "aceleracao": relatorio[referencia]["latencia"]["media_ms"] / latencia["media_ms"],
+        }
+    return relatorio
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Exporta, quantiza e compara o detector de vagas")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("exportar", help="Exporta MODEL_PATH para ONNX")
+    sub.add_parser("quantizar", help="Gera a variante INT8 do modelo ONNX")
+    comparar = sub.add_parser("comparar", help="Compara latência e concordância entre backends")
+    comparar.add_argument("imagens", nargs="+")
+    comparar.add_argument("--referencia", default="onnx")
+    comparar.add_argument("--candidatos", nargs="+", default=["onnx-int8", "torch"])
+    comparar.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.comando == "exportar":
+        exportar_onnx()
+    elif args.comando == "quantizar":
+        quantizar_int8()
+    else:
+        imagens = [np.asarray(Image.open(caminho).convert("RGB")) for caminho in args.imagens]
+        relatorio = comparar_backends(imagens, args.referencia, args.candidatos, args.repeticoes)
+        print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
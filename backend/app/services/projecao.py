@@ -0,0 +1,77 @@
+"""
+Projeção Web Mercator (EPSG:3857) entre lat/lon e pixels globais da grade de
+tiles XYZ, vetorizada com NumPy: aceita escalares ou arrays de qualquer forma.
+"""
+import numpy as np
+
+TILE_SIZE = 256
+
+
+def _escala(zoom):
+    return TILE_SIZE * 2.0 ** zoom
+
+
+def gps_para_pixel(lat, lon, zoom):
+    """
+    Projeta lat/lon para pixels globais no zoom informado (tile = pixel // 256).
+
+    Returns:
+        Tupla (x, y) de arrays float64
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    escala = _escala(zoom)
+    x = (lon + 180.0) / 360.0 * escala
+    y = (1.0 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2.0 * escala
+    return x, y
+
+
+def pixel_para_gps(x, y, zoom):
+    """
+    Inversa de `gps_para_pixel`.
+
+    Returns:
+        Tupla (lat, lon) de arrays float64
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    escala = _escala(zoom)
+    lon = x / escala * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * y / escala))))
+    return lat, lon
+
+
+def centros_das_caixas(caixas):
+    """Centros (x, y) de um array (N, 4) de caixas x_min, y_min, x_max, y_max."""
+    caixas = np.asarray(caixas, dtype=np.float64).reshape(-1, 4)
+    return (caixas[:, 0] + caixas[:, 2]) / 2, (caixas[:, 1] + caixas[:, 3]) / 2
+
+
+class ProjecaoImagem:
+    """
+    Projeção de uma imagem recortada da grade Web Mercator: pixels locais
+    (relativos ao canto superior esquerdo `origem_x`, `origem_y`, em pixels
+    globais no `zoom`) <-> lat/lon.
+    """
+
+    def __init__(self, zoom, origem_x, origem_y):
+        self.zoom = zoom
+        self.origem_x = origem_x
+        self.origem_y = origem_y
+
+    def pixels_para_gps(self, x, y):
+        return pixel_para_gps(np.asarray(x) + self.origem_x, np.asarray(y) + self.origem_y, self.zoom)
+
+    def gps_para_pixels(self, lat, lon):
+        x, y = gps_para_pixel(lat, lon, self.zoom)
+        return x - self.origem_x, y - self.origem_y
+
+    def caixas_para_gps(self, caixas):
+        """
+        Converte os centros de um array (N, 4) de caixas em pixels locais
+        para lat/lon numa única operação vetorizada.
+
+        Returns:
+            Tupla (lat, lon) de arrays (N,)
+        """
+        return self.pixels_para_gps(*centros_das_caixas(caixas))
@@ -0,0 +1,146 @@
+import json
+import time
+import hashlib
+import logging
+import redis.asyncio as redis_async
+from app.api.config import settings
+from app.services import serializacao
+
+logger = logging.getLogger(__name__)
+
+PREFIXO = "sip:analise"
+# Versão do formato do resultado armazenado (2: vagas compactas em colunas)
+FORMATO = 2
+
+
+class BackendMemoria:
+    """Backend local em memória, com expiração, para testes e desenvolvimento."""
+
+    def __init__(self):
+        self._itens = {}
+
+    async def get(self, chave):
+        item = self._itens.get(chave)
+        if item is None:
+            return None
+        valor, expira_em = item
+        if expira_em < time.time():
+            del self._itens[chave]
+            return None
+        return valor
+
+    async def set(self, chave, valor, ttl):
+        self._itens[chave] = (valor, time.time() + ttl)
+
+    async def delete(self, *chaves):
+        return sum(1 for chave in chaves if self._itens.pop(chave, None) is not None)
+
+    async def delete_prefixo(self, prefixo):
+        return await self.delete(*[c for c in list(self._itens) if c.startswith(prefixo)])
+
+    async def fechar(self):
+        pass
+
+
+class BackendRedis:
+    """Backend Redis compartilhado entre workers e réplicas da API."""
+
+    def __init__(self, url):
+        self._cliente = redis_async.from_url(url)
+
+    async def get(self, chave):
+        return await self._cliente.get(chave)
+
+    async def set(self, chave, valor, ttl):
+        await self._cliente.set(chave, valor, ex=ttl)
+
+    async def delete(self, *chaves):
+        if not chaves:
+            return 0
+        return await self._cliente.delete(*chaves)
+
+    async def delete_prefixo(self, prefixo):
+        removidas = 0
+        async for chave in self._cliente.scan_iter(match=f"{prefixo}*", count=500):
+            removidas += await self._cliente.delete(chave)
+        return removidas
+
+    async def fechar(self):
+        await self._cliente.aclose()
+
+
+class CacheResultados:
+    """
+    Cache dos resultados de `analisar-estacionamento` (sumário + vagas
+    compactas).
+
+    A chave combina o polígono quantizado (coordenadas arredondadas), o zoom,
+    a versão do modelo e a do formato do resultado, de modo que trocar o
+    modelo ou o formato invalida naturalmente os resultados antigos. Erros
+    do backend são registrados e tratados como ausência no cache, sem
+    interromper a análise.
+    """
+
+    def __init__(self, backend, ttl=None, versao_modelo=None, precisao=None):
+        self.backend = backend
+        self.ttl = ttl or settings.RESULT_CACHE_TTL
+        self.versao_modelo = versao_modelo or settings.MODEL_VERSION
+        self.precisao = precisao or settings.RESULT_CACHE_PRECISAO
+        self.acertos = 0
+        self.falhas = 0
+
+    def chave(self, pontos, zoom):
+        quantizado = [
+            (round(p.lat, self.precisao), round(p.lon, self.precisao))
+            for p in pontos
+        ]
+        digest = hashlib.sha1(json.dumps(quantizado).encode()).hexdigest()
+        return f"{PREFIXO}:{self.versao_modelo}:f{FORMATO}:{zoom}:{digest}"
+
+    async def obter(self, chave):
+        try:
+            valor = await self.backend.get(chave)
+        except Exception as e:
+            logger.warning(f"Erro ao consultar cache de resultados: {e}")
+            valor = None
+
+        if valor is None:
+            self.falhas += 1
+            return None
+        self.acertos += 1
+        return serializacao.loads(valor)
+
+    async def salvar(self, chave, resultado):
+        try:
+            await self.backend.set(chave, serializacao.dumps(resultado), self.ttl)
+        except Exception as e:
+            logger.warning(f"Erro ao gravar cache de resultados: {e}")
+
+    async def invalidar(self, chave):
+        """Remove um resultado específico. Retorna quantas chaves foram removidas."""
+        return await self.backend.delete(chave)
+
+    async def invalidar_tudo(self):
+        """Remove todos os resultados de análise em cache (todas as versões)."""
+        return await self.backend.delete_prefixo(PREFIXO)
+
+    async def fechar(self):
+        await self.backend.fechar()
+
+    def estatisticas(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+        }
+
+
+def criar_backend():
+    """Redis quando REDIS_URL está configurado; caso contrário, memória local."""
+    if settings.REDIS_URL:
+        return BackendRedis(settings.REDIS_URL)
+    logger.info("REDIS_URL não configurado; usando cache de resultados em memória")
+    return BackendMemoria()
+
+
+cache_resultados = CacheResultados(criar_backend())
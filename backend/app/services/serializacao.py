@@ -0,0 +1,66 @@
+"""
+Serialização rápida das respostas de análise, com orjson (codificação em C
+direto para bytes). As funções `*_em_partes` geram o corpo em blocos para
+`StreamingResponse`, sem montar o documento inteiro em memória: as Features
+GeoJSON são criadas bloco a bloco a partir das vagas compactas do resultado
+(`geo_service.vagas_compactas`).
+"""
+import orjson
+from app.api.config import settings
+from app.services import geo_service
+
+
+def dumps(obj):
+    """Codifica `obj` em JSON compacto (bytes)."""
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def loads(dados):
+    return orjson.loads(dados)
+
+
+def _features_em_lotes(vagas, tamanho_lote):
+    """Features de cada bloco de `tamanho_lote` vagas, codificadas como itens de um array JSON."""
+    total = len(vagas["codigos"])
+    for inicio in range(0, total, tamanho_lote):
+        # Um dumps por bloco: remove os colchetes do array codificado
+        yield dumps(geo_service.features_geojson(vagas, inicio, min(inicio + tamanho_lote, total)))[1:-1]
+
+
+def resultado_json_em_partes(resultado, tamanho_lote=None):
+    """
+    Gera o resultado da análise (`sumario` + FeatureCollection) como JSON,
+    criando e codificando as features em blocos de `tamanho_lote`.
+    """
+    tamanho_lote = tamanho_lote or settings.STREAM_TAMANHO_LOTE
+    yield b'{"sumario":' + dumps(resultado["sumario"]) + b',"vagas_geojson":{"type":"FeatureCollection","features":['
+    primeiro = True
+    for parte in _features_em_lotes(resultado["vagas"], tamanho_lote):
+        yield parte if primeiro else b"," + parte
+        primeiro = False
+    yield b"]}}"
+
+
+def features_ndjson_em_partes(resultado, tamanho_lote=None):
+    """
+    Gera as features como GeoJSON delimitado por linhas (uma Feature por
+    linha), para clientes que processam as vagas incrementalmente.
+    """
+    tamanho_lote = tamanho_lote or settings.STREAM_TAMANHO_LOTE
+    vagas = resultado["vagas"]
+    total = len(vagas["codigos"])
+    for inicio in range(0, total, tamanho_lote):
+        features = geo_service.features_geojson(vagas, inicio, min(inicio + tamanho_lote, total))
+        yield b"".join(dumps(feature) + b"\n" for feature in features)
+
+
+def objeto_com_resultado_em_partes(objeto, resultado, tamanho_lote=None):
+    """
+    Gera `objeto` (dicionário) como JSON com o campo `resultado` no formato
+    de `resultado_json_em_partes`, para respostas que embutem uma análise
+    (linhas do lote, estado de jobs).
+    """
+    cabecalho = dumps(objeto)
+    yield cabecalho[:-1] + (b',"resultado":' if len(cabecalho) > 2 else b'"resultado":')
+    yield from resultado_json_em_partes(resultado, tamanho_lote)
+    yield b"}"
@@ -0,0 +1,139 @@
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from app.api.config import settings
+from app.core.database import Base, criar_engine, criar_sessao
+from app.models import Analise, Vaga
+from app.services import geo_service
+from app.services.deteccoes import Deteccoes
+
+logger = logging.getLogger(__name__)
+
+
+class RepositorioAnalises:
+    """
+    Persistência das análises e busca espacial de resultados anteriores.
+
+    Funciona com PostgreSQL (produção) ou SQLite (testes/desenvolvimento).
+    As operações são síncronas; a camada assíncrona as executa em threads.
+    """
+
+    def __init__(self, url):
+        self.engine = criar_engine(url)
+        self._sessao = criar_sessao(self.engine)
+
+    def criar_tabelas(self):
+        Base.metadata.create_all(self.engine)
+
+    def salvar(self, bbox, vagas, zoom, versao_modelo, poligono=None):
+        """
+        Grava uma análise e suas vagas.
+
+        Args:
+            bbox: Bounding box da área analisada (min/max lat/lon)
+            vagas: Deteccoes com lat/lon
+            poligono: Lista de (lat, lon) do polígono analisado
+
+        Returns:
+            id da análise gravada
+        """
+        analise = Analise(
+            versao_modelo=versao_modelo,
+            zoom=zoom,
+            min_lat=bbox['min_lat'],
+            max_lat=bbox['max_lat'],
+            min_lon=bbox['min_lon'],
+            max_lon=bbox['max_lon'],
+            poligono=json.dumps([[lat, lon] for lat, lon in poligono]) if poligono else None,
+            total_vagas=len(vagas),
+            vagas=[
+                Vaga(tipo=tipo, lat=lat, lon=lon)
+                for tipo, lat, lon in zip(vagas.tipos().tolist(), vagas.lat.tolist(), vagas.lon.tolist())
+            ],
+        )
+        with self._sessao() as sessao:
+            sessao.add(analise)
+            sessao.commit()
+            return analise.id
+
+    def buscar_cobrindo(self, bbox, zoom, versao_modelo=None, max_idade=None, poligono=None, limite=20):
+        """
+        Análise recente, no mesmo zoom, cujo bbox contém inteiramente o bbox
+        informado, ou None se não houver.
+
+        Com `poligono` (lista de (lat, lon)), só vale uma análise cujo
+        polígono armazenado contenha o polígono informado: as vagas fora do
+        polígono analisado foram descartadas, e o bbox sozinho não garante
+        que a área pedida foi vista. `limite` é o número de candidatas
+        (pelo bbox) examinadas.
+        """
+        consulta = select(Analise).where(
+            Analise.zoom == zoom,
+            Analise.min_lat <= bbox['min_lat'],
+            Analise.max_lat >= bbox['max_lat'],
+            Analise.min_lon <= bbox['min_lon'],
+            Analise.max_lon >= bbox['max_lon'],
+        )
+        consulta = self._filtrar_modelo_e_idade(consulta, versao_modelo, max_idade)
+        if poligono is not None:
+            consulta = consulta.where(Analise.poligono.is_not(None))
+        with self._sessao() as sessao:
+            candidatas = sessao.scalars(consulta.order_by(Analise.criado_em.desc()).limit(limite))
+            for analise in candidatas:
+                if poligono is None or geo_service.poligono_contem(json.loads(analise.poligono), poligono):
+                    return analise
+        return None
+
+    def remover_sobrepostas(self, bbox):
+        """
+        Remove as análises (de qualquer modelo e zoom) cujo bbox intersecta o
+        bbox informado, para que a área volte a ser analisada.
+
+        Returns:
+            Número de análises removidas
+        """
+        consulta = select(Analise).where(
+            Analise.min_lat <= bbox['max_lat'],
+            Analise.max_lat >= bbox['min_lat'],
+            Analise.min_lon <= bbox['max_lon'],
+            Analise.max_lon >= bbox['min_lon'],
+        )
+        return self._remover(consulta)
+
+    def remover_todas(self):
+        """Remove todas as análises armazenadas. Returns: número removido"""
+        return self._remover(select(Analise))
+
+    def _remover(self, consulta):
+        with self._sessao() as sessao:
+            analises = list(sessao.scalars(consulta))
+            for analise in analises:
+                sessao.delete(analise)
+            sessao.commit()
+        return len(analises)
+
+    @staticmethod
+    def _filtrar_modelo_e_idade(consulta, versao_modelo, max_idade):
+        if versao_modelo is not None:
+            consulta = consulta.where(Analise.versao_modelo == versao_modelo)
+        if max_idade is not None:
+            limite = datetime.now(timezone.utc) - timedelta(seconds=max_idade)
+            consulta = consulta.where(Analise.criado_em >= limite)
+        return consulta
+
+
+def vagas_dentro_do_bbox(analise, bbox):
+    """Recorta as vagas de uma análise armazenada para o bbox informado (Deteccoes)."""
+    vagas = Deteccoes.de_gps(
+        [vaga.tipo for vaga in analise.vagas],
+        [vaga.lat for vaga in analise.vagas],
+        [vaga.lon for vaga in analise.vagas],
+    )
+    return vagas.filtrar(
+        (vagas.lat >= bbox['min_lat']) & (vagas.lat <= bbox['max_lat'])
+        & (vagas.lon >= bbox['min_lon']) & (vagas.lon <= bbox['max_lon'])
+    )
+
+
+repositorio_analises = RepositorioAnalises(settings.DATABASE_URL) if settings.PERSISTENCIA_HABILITADA else None
@@ -0,0 +1,360 @@
+import os
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from app.api.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CacheTilesDisco:
+    """
+    Cache persistente de tiles em disco, indexado por (z, x, y).
+
+    O conteúdo de cada tile é gravado uma única vez em `objetos/`, endereçado
+    pelo SHA-256 dos bytes (tiles idênticos, como áreas de água, compartilham
+    o mesmo arquivo). Um índice SQLite em modo WAL guarda o tamanho, a data de
+    download e o último acesso de cada tile, permitindo expiração por TTL e
+    remoção LRU quando o orçamento de bytes é excedido. Gravações de arquivos
+    são atômicas (arquivo temporário + rename) e o índice serializa as escritas,
+    então vários workers do uvicorn podem compartilhar o mesmo diretório.
+
+    Leituras não escrevem no índice: os acessos ficam em memória e são
+    gravados em lote (a cada `acessos_por_lote` tiles ou
+    TILE_CACHE_INTERVALO_ACESSOS segundos, e antes de cada limpeza), então o
+    LRU vê o último acesso com esse atraso. O orçamento de bytes é checado
+    por uma estimativa local (última soma + bytes gravados desde então); a
+    soma completa só é refeita quando a estimativa passa do orçamento ou a
+    cada `verificar_a_cada` gravações, para captar as dos outros workers.
+    """
+
+    def __init__(self, diretorio, max_bytes, ttl, acessos_por_lote=None, verificar_a_cada=None):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.acessos_por_lote = acessos_por_lote or settings.TILE_CACHE_ACESSOS_POR_LOTE
+        self.verificar_a_cada = verificar_a_cada or settings.TILE_CACHE_VERIFICAR_LIMITE_A_CADA
+        self._dir_objetos = os.path.join(diretorio, "objetos")
+        self._caminho_indice = os.path.join(diretorio, "indice.sqlite")
+        self._local = threading.local()
+
+        self._lock = threading.Lock()
+        self._acessos = {}
+        self._acessos_gravados_em = time.monotonic()
+        self._total_estimado = None
+        self._gravacoes_sem_verificar = 0
+
+        os.makedirs(self._dir_objetos, exist_ok=True)
+        with self._conexao() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tiles (
+                    z INTEGER NOT NULL,
+                    x INTEGER NOT NULL,
+                    y INTEGER NOT NULL,
+                    hash TEXT NOT NULL,
+                    tamanho INTEGER NOT NULL,
+                    criado_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL,
+                    PRIMARY KEY (z, x, y)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tiles_acesso ON tiles (acessado_em)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tiles_hash ON tiles (hash)")
+
+    def _conexao(self):
+        """Retorna a conexão SQLite da thread atual (sqlite3 não compartilha conexões entre threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._caminho_indice, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _caminho_objeto(self, digest):
+        return os.path.join(self._dir_objetos, digest[:2], digest)
+
+    def obter(self, z, x, y):
+        """
+        Retorna os bytes do tile se estiver no cache e dentro do TTL.
+
+        Returns:
+            bytes do tile, ou None em caso de ausência/expiração
+        """
+        conn = self._conexao()
+        row = conn.execute(
+            "SELECT hash, criado_em FROM tiles WHERE z = ? AND x = ? AND y = ?",
+            (z, x, y),
+        ).fetchone()
+        if row is None:
+            return None
+
+        digest, criado_em = row
+        agora = time.time()
+        if agora - criado_em > self.ttl:
+            return None
+
+        try:
+            with open(self._caminho_objeto(digest), "rb") as f:
+                conteudo = f.read()
+        except FileNotFoundError:
+            # Objeto removido por outro worker durante a limpeza
+            conn.execute("DELETE FROM tiles WHERE z = ? AND x = ? AND y = ?", (z, x, y))
+            return None
+
+        self._registrar_acesso(z, x, y, agora)
+        return conteudo
+
+    def _registrar_acesso(self, z, x, y, agora):
+        with self._lock:
+            self._acessos[(z, x, y)] = agora
+            gravar = (
+                len(self._acessos) >= self.acessos_por_lote
+                or time.monotonic() - self._acessos_gravados_em >= settings.TILE_CACHE_INTERVALO_ACESSOS
+            )
+        if gravar:
+            self.gravar_acessos()
+
+    def gravar_acessos(self):
+        """Grava no índice, em uma única transação, os acessos pendentes."""
+        with self._lock:
+            acessos, self._acessos = self._acessos, {}
+            self._acessos_gravados_em = time.monotonic()
+        if not acessos:
+            return
+        conn = self._conexao()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "UPDATE tiles SET acessado_em = MAX(acessado_em, ?) WHERE z = ? AND x = ? AND y = ?",
+                [(agora, z, x, y) for (z, x, y), agora in acessos.items()],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def tiles_frescos(self, z, tiles, validade_min=0.0):
+        """
+        Dos tiles (x, y) informados, os que estão no cache e continuarão dentro
+        do TTL por pelo menos `validade_min` segundos. Uma única consulta pelo
+        retângulo envolvente, sem ler os objetos nem alterar o último acesso.
+
+        Returns:
+            Conjunto de (x, y)
+        """
+        if not tiles:
+            return set()
+        xs = [x for x, _ in tiles]
+        ys = [y for _, y in tiles]
+        criado_desde = time.time() - self.ttl + validade_min
+        rows = self._conexao().execute(
+            "SELECT x, y FROM tiles WHERE z = ? AND x BETWEEN ? AND ? AND y BETWEEN ? AND ? AND criado_em >= ?",
+            (z, min(xs), max(xs), min(ys), max(ys), criado_desde),
+        ).fetchall()
+        return {(x, y) for x, y in rows} & set(tiles)
+
+    def entradas(self, zooms=None, incluir_expirados=False):
+        """
+        Tiles indexados, ordenados por zoom, x e y (exportação do cache).
+
+        Returns:
+            Lista de (z, x, y, hash, caminho do objeto)
+        """
+        condicoes, parametros = [], []
+        if not incluir_expirados:
+            condicoes.append("criado_em >= ?")
+            parametros.append(time.time() - self.ttl)
+        if zooms:
+            condicoes.append(f"z IN ({', '.join('?' * len(zooms))})")
+            parametros.extend(zooms)
+        sql = "SELECT z, x, y, hash FROM tiles"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        rows = self._conexao().execute(sql + " ORDER BY z, x, y", parametros).fetchall()
+        return [(z, x, y, digest, self._caminho_objeto(digest)) for z, x, y, digest in rows]
+
+    def salvar(self, z, x, y, conteudo):
+        """Grava o tile no cache e aplica a remoção LRU se o orçamento for excedido."""
+        digest = hashlib.sha256(conteudo).hexdigest()
+        caminho = self._caminho_objeto(digest)
+
+        if not os.path.exists(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            fd, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(conteudo)
+                os.replace(temporario, caminho)
+            except BaseException:
+                if os.path.exists(temporario):
+                    os.remove(temporario)
+                raise
+
+        agora = time.time()
+        conn = self._conexao()
+        conn.execute(
+            "INSERT OR REPLACE INTO tiles (z, x, y, hash, tamanho, criado_em, acessado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (z, x, y, digest, len(conteudo), agora, agora),
+        )
+
+        with self._lock:
+            self._gravacoes_sem_verificar += 1
+            if self._total_estimado is not None:
+                self._total_estimado += len(conteudo)
+            verificar = (
+                self._total_estimado is None
+                or self._total_estimado > self.max_bytes
+                or self._gravacoes_sem_verificar >= self.verificar_a_cada
+            )
+        if verificar:
+            self._aplicar_limite()
+
+    def tamanho_total(self):
+        """Soma dos tamanhos dos tiles indexados, em bytes."""
+        row = self._conexao().execute("SELECT COALESCE(SUM(tamanho), 0) FROM tiles").fetchone()
+        return row[0]
+
+    def _aplicar_limite(self):
+        """Remove os tiles acessados há mais tempo até voltar a 90% do orçamento."""
+        total = self.tamanho_total()
+        self._atualizar_estimativa(total)
+        if total <= self.max_bytes:
+            return
+
+        # A ordem LRU precisa dos acessos ainda em memória
+        self.gravar_acessos()
+
+        alvo = self.max_bytes * 0.9
+        conn = self._conexao()
+        removidos = []
+
+        # BEGIN IMMEDIATE serializa a limpeza entre workers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            total = conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM tiles").fetchone()[0]
+            cursor = conn.execute("SELECT z, x, y, hash, tamanho FROM tiles ORDER BY acessado_em")
+            for z, x, y, digest, tamanho in cursor.fetchall():
+                if total <= alvo:
+                    break
+                conn.execute("DELETE FROM tiles WHERE z = ? AND x = ? AND y = ?", (z, x, y))
+                total -= tamanho
+                removidos.append(digest)
+
+            orfaos = [
+                digest for digest in set(removidos)
+                if conn.execute("SELECT 1 FROM tiles WHERE hash = ? LIMIT 1", (digest,)).fetchone() is None
+            ]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._atualizar_estimativa(total)
+
+        for digest in orfaos:
+            try:
+                os.remove(self._caminho_objeto(digest))
+            except FileNotFoundError:
+                pass
+
+        logger.info(f"Cache de tiles: {len(removidos)} tiles removidos (LRU)")
+
+    def _atualizar_estimativa(self, total):
+        with self._lock:
+            self._total_estimado = total
+            self._gravacoes_sem_verificar = 0
+
+
+class CacheLRUMemoria:
+    """
+    Cache LRU em memória limitado pelo total de bytes dos valores, e não pelo
+    número de entradas. Os valores armazenados são compartilhados entre
+    requisições e devem ser tratados como somente leitura.
+    """
+
+    def __init__(self, max_bytes, medir_tamanho):
+        self.max_bytes = max_bytes
+        self._medir_tamanho = medir_tamanho
+        self._itens = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.falhas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return item[0]
+
+    def salvar(self, chave, valor):
+        tamanho = self._medir_tamanho(valor)
+        if tamanho > self.max_bytes:
+            return
+
+        with self._lock:
+            anterior = self._itens.pop(chave, None)
+            if anterior is not None:
+                self._bytes -= anterior[1]
+            self._itens[chave] = (valor, tamanho)
+            self._bytes += tamanho
+
+            while self._bytes > self.max_bytes:
+                _, (_, tamanho_removido) = self._itens.popitem(last=False)
+                self._bytes -= tamanho_removido
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._bytes = 0
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                "itens": len(self._itens),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+            }
+
+
+def tamanho_imagem(imagem):
+    """Bytes ocupados por um tile decodificado (array NumPy)."""
+    return imagem.nbytes
+
+
+_cache_disco = None
+_cache_lock = threading.Lock()
+
+# Tiles decodificados, compartilhados entre requisições do mesmo processo
+cache_memoria = CacheLRUMemoria(settings.TILE_CACHE_MEMORIA_MAX_BYTES, tamanho_imagem)
+
+
+def obter_cache_disco():
+    """Retorna o cache de tiles em disco do processo, ou None se estiver desabilitado."""
+    global _cache_disco
+    if not settings.TILE_CACHE_HABILITADO:
+        return None
+    if _cache_disco is None:
+        with _cache_lock:
+            if _cache_disco is None:
+                _cache_disco = CacheTilesDisco(
+                    settings.TILE_CACHE_DIR,
+                    max_bytes=settings.TILE_CACHE_MAX_BYTES,
+                    ttl=settings.TILE_CACHE_TTL,
+                )
+    return _cache_disco
@@ -0,0 +1,239 @@
+import io
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from PIL import Image
+from app.api.config import settings
+from app.services import tile_cache, tile_providers
+
+logger = logging.getLogger(__name__)
+
+# Origem dos tiles (HTTP XYZ, MBTiles ou diretório), conforme TILE_PROVEDOR
+provedor = tile_providers.criar_provedor()
+
+
+def obter_cache_disco():
+    """Cache em disco dos tiles, usado apenas para provedores remotos (ou None)."""
+    return tile_cache.obter_cache_disco() if provedor.remoto else None
+
+
+def _decodificar_tile(zoom, tx, ty, conteudo):
+    """
+    Decodifica os bytes do tile em um array RGB (altura, largura, 3), marcado
+    como somente leitura, e o guarda no cache em memória. Os mosaicos copiam
+    os tiles direto deste array para o buffer de destino.
+    """
+    tile_image = np.asarray(Image.open(io.BytesIO(conteudo)).convert('RGB'))
+    tile_image.setflags(write=False)
+    tile_cache.cache_memoria.salvar((zoom, tx, ty), tile_image)
+    return tile_image
+
+
+def _gravar_cache_disco(cache, zoom, tx, ty, conteudo):
+    try:
+        cache.salvar(zoom, tx, ty, conteudo)
+    except Exception as e:
+        logger.warning(f"Erro ao gravar tile ({tx},{ty}) no cache: {e}")
+
+
+def baixar_tile(tx, ty, zoom, cliente):
+    """
+    Obtém um tile decodificado. Consulta primeiro o cache em memória de tiles
+    decodificados, depois o cache em disco e só então o provedor.
+
+    Returns:
+        Array RGB do tile (somente leitura), ou None se o provedor não o tiver
+    """
+    tile_image = tile_cache.cache_memoria.obter((zoom, tx, ty))
+    if tile_image is not None:
+        return tile_image
+
+    cache = obter_cache_disco()
+    conteudo = cache.obter(zoom, tx, ty) if cache else None
+
+    if conteudo is None:
+        conteudo = provedor.obter(zoom, tx, ty, cliente)
+        if conteudo is None:
+            return None
+        if cache:
+            _gravar_cache_disco(cache, zoom, tx, ty, conteudo)
+
+    # Decodificar ainda na thread de download
+    return _decodificar_tile(zoom, tx, ty, conteudo)
+
+
+async def baixar_tile_async(tx, ty, zoom, cliente):
+    """
+    Versão assíncrona de `baixar_tile`: a rede é acessada sem bloquear o
+    event loop e o acesso ao disco e a decodificação rodam em threads.
+    """
+    tile_image = tile_cache.cache_memoria.obter((zoom, tx, ty))
+    if tile_image is not None:
+        return tile_image
+
+    cache = obter_cache_disco()
+    conteudo = await asyncio.to_thread(cache.obter, zoom, tx, ty) if cache else None
+
+    if conteudo is None:
+        conteudo = await provedor.obter_async(zoom, tx, ty, cliente)
+        if conteudo is None:
+            return None
+        if cache:
+            await asyncio.to_thread(_gravar_cache_disco, cache, zoom, tx, ty, conteudo)
+
+    return await asyncio.to_thread(_decodificar_tile, zoom, tx, ty, conteudo)
+
+
+def _tile_do_lote(tx, ty, zoom, lidos):
+    """Como `baixar_tile`, mas com os bytes já lidos em lote do provedor local."""
+    tile_image = tile_cache.cache_memoria.obter((zoom, tx, ty))
+    if tile_image is not None:
+        return tile_image
+    conteudo = lidos.get((tx, ty))
+    return _decodificar_tile(zoom, tx, ty, conteudo) if conteudo is not None else None
+
+
+async def gravar_tile_async(tx, ty, zoom, cliente, cache):
+    """
+    Baixa o tile do provedor e o grava no cache em disco, sem decodificá-lo
+    (pré-aquecimento do cache).
+
+    Returns:
+        True se o tile foi gravado
+    """
+    conteudo = await provedor.obter_async(zoom, tx, ty, cliente)
+    if conteudo is None:
+        return False
+    await asyncio.to_thread(cache.salvar, zoom, tx, ty, conteudo)
+    return True
+
+
+def baixar_tiles(tiles, zoom, ao_receber, cliente, max_concorrencia=None, prazo=None):
+    """
+    Baixa tiles em paralelo com concorrência limitada e prazo total.
+
+    `ao_receber(tx, ty, imagem)` é chamado na thread chamadora assim que
+    cada tile chega, permitindo montar o mosaico de forma incremental.
+    Tiles que não chegam dentro do prazo são contados como falha. Com
+    provedores de leitura em lote (MBTiles), os bytes de todos os tiles vêm
+    de uma única consulta e as threads apenas decodificam.
+
+    Args:
+        tiles: Lista de tuplas (tx, ty)
+        zoom: Nível de zoom dos tiles
+        ao_receber: Callback chamado para cada tile baixado com sucesso
+        cliente: ClienteHttp compartilhado usado para os downloads
+        max_concorrencia: Número máximo de downloads simultâneos
+        prazo: Tempo máximo (s) para o conjunto inteiro de tiles
+
+    Returns:
+        Tupla (tiles_baixados, tiles_com_falha)
+    """
+    max_concorrencia = max_concorrencia or settings.TILE_MAX_CONCORRENCIA
+    prazo = prazo or settings.TILE_PRAZO_TOTAL
+    limite = time.monotonic() + prazo
+
+    baixados = 0
+    falhas = 0
+
+    lidos = provedor.obter_varios(zoom, tiles) if provedor.em_lote else None
+
+    executor = ThreadPoolExecutor(max_workers=max_concorrencia, thread_name_prefix="tile")
+    try:
+        pendentes = {
+            (
+                executor.submit(baixar_tile, tx, ty, zoom, cliente) if lidos is None
+                else executor.submit(_tile_do_lote, tx, ty, zoom, lidos)
+            ): (tx, ty)
+            for tx, ty in tiles
+        }
+
+        while pendentes:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+
+            concluidos, _ = wait(pendentes, timeout=restante, return_when=FIRST_COMPLETED)
+            for future in concluidos:
+                tx, ty = pendentes.pop(future)
+                try:
+                    tile_image = future.result()
+                except Exception as e:
+                    logger.warning(f"Erro ao baixar tile ({tx},{ty}): {e}")
+                    tile_image = None
+
+                if tile_image is None:
+                    falhas += 1
+                    continue
+
+                ao_receber(tx, ty, tile_image)
+                baixados += 1
+
+        if pendentes:
+            logger.warning(f"Prazo de {prazo}s esgotado com {len(pendentes)} tiles pendentes")
+            falhas += len(pendentes)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return baixados, falhas
+
+
+async def baixar_tiles_async(tiles, zoom, ao_receber, cliente, max_concorrencia=None, prazo=None):
+    """
+    Versão assíncrona de `baixar_tiles`, com a mesma semântica de
+    concorrência, prazo e contagem. `ao_receber` roda no event loop.
+
+    Returns:
+        Tupla (tiles_baixados, tiles_com_falha)
+    """
+    max_concorrencia = max_concorrencia or settings.TILE_MAX_CONCORRENCIA
+    prazo = prazo or settings.TILE_PRAZO_TOTAL
+    limite = time.monotonic() + prazo
+    semaforo = asyncio.Semaphore(max_concorrencia)
+    lidos = await asyncio.to_thread(provedor.obter_varios, zoom, tiles) if provedor.em_lote else None
+
+    async def baixar_limitado(tx, ty):
+        async with semaforo:
+            if lidos is not None:
+                return await asyncio.to_thread(_tile_do_lote, tx, ty, zoom, lidos)
+            return await baixar_tile_async(tx, ty, zoom, cliente)
+
+    baixados = 0
+    falhas = 0
+
+    pendentes = {
+        asyncio.ensure_future(baixar_limitado(tx, ty)): (tx, ty)
+        for tx, ty in tiles
+    }
+    try:
+        while pendentes:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+
+            concluidos, _ = await asyncio.wait(pendentes, timeout=restante, return_when=asyncio.FIRST_COMPLETED)
+            for task in concluidos:
+                tx, ty = pendentes.pop(task)
+                try:
+                    tile_image = task.result()
+                except Exception as e:
+                    logger.warning(f"Erro ao baixar tile ({tx},{ty}): {e}")
+                    tile_image = None
+
+                if tile_image is None:
+                    falhas += 1
+                    continue
+
+                ao_receber(tx, ty, tile_image)
+                baixados += 1
+
+        if pendentes:
+            logger.warning(f"Prazo de {prazo}s esgotado com {len(pendentes)} tiles pendentes")
+            falhas += len(pendentes)
+    finally:
+        for task in pendentes:
+            task.cancel()
+
+    return baixados, falhas
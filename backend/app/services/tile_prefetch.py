@@ -0,0 +1,280 @@
+"""
+Pré-aquecimento do cache de tiles em disco para estacionamentos conhecidos.
+
+Uso:
+    python -m app.services.tile_prefetch areas.json --zoom 19 20
+    python -m app.services.tile_prefetch --bbox -10.948,-37.074,-10.946,-37.072 --zoom 20
+
+`areas.json` tem o mesmo formato do corpo de `POST /api/v1/admin/prefetch`
+({"areas": [...], "zooms": [...]}) ou é apenas a lista de áreas.
+"""
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import logging
+from collections import OrderedDict
+from app.api.config import settings
+from app.schemas.parking_schema import PrefetchRequest
+from app.services import map_service, projecao, tile_fetcher
+from app.services.http_client import ClienteHttp
+
+logger = logging.getLogger(__name__)
+
+
+def tiles_da_area(area, zoom):
+    """
+    Tiles que cobrem a área no zoom: o retângulo de tiles do bbox, pela mesma
+    conversão lat/lon -> tile de `obter_imagem_satelite_tiles`, e, para
+    polígonos, apenas os tiles que o intersectam.
+
+    Raises:
+        ValueError se o retângulo passar de PREFETCH_MAX_TILES tiles
+    """
+    if area.bbox is not None:
+        min_lat, max_lat = area.bbox.min_lat, area.bbox.max_lat
+        min_lon, max_lon = area.bbox.min_lon, area.bbox.max_lon
+    else:
+        lats = [p.lat for p in area.pontos]
+        lons = [p.lon for p in area.pontos]
+        min_lat, max_lat, min_lon, max_lon = min(lats), max(lats), min(lons), max(lons)
+
+    x0, y0 = map_service.lat_lon_to_tile(max_lat, min_lon, zoom)
+    x1, y1 = map_service.lat_lon_to_tile(min_lat, max_lon, zoom)
+    total = (x1 - x0 + 1) * (y1 - y0 + 1)
+    if total > settings.PREFETCH_MAX_TILES:
+        raise ValueError(f"Área com {total} tiles no zoom {zoom} (máximo {settings.PREFETCH_MAX_TILES})")
+
+    if area.bbox is not None:
+        return [(tx, ty) for tx in range(x0, x1 + 1) for ty in range(y0, y1 + 1)]
+    xs, ys = projecao.gps_para_pixel(lats, lons, zoom)
+    return map_service.tiles_do_poligono(list(zip(xs.tolist(), ys.tolist())), zoom)
+
+
+def planejar(areas, zooms):
+    """
+    União dos tiles das áreas (sem repetir os compartilhados), por zoom.
+
+    Returns:
+        Dicionário {zoom: [(tx, ty), ...]}
+
+    Raises:
+        ValueError se o total passar de PREFETCH_MAX_TILES tiles
+    """
+    plano = {}
+    for zoom in dict.fromkeys(zooms):
+        tiles = set()
+        for area in areas:
+            tiles.update(tiles_da_area(area, zoom))
+        plano[zoom] = sorted(tiles)
+    total = sum(len(tiles) for tiles in plano.values())
+    if total > settings.PREFETCH_MAX_TILES:
+        raise ValueError(f"Pré-carregamento com {total} tiles (máximo {settings.PREFETCH_MAX_TILES})")
+    return plano
+
+
+async def prefetch(plano, cliente, cache, validade_min=0.0, concorrencia=None, tamanho_lote=None,
+                   pausa=None, ao_progredir=None):
+    """
+    Baixa para o cache em disco os tiles do plano (`planejar`), em lotes de
+    `tamanho_lote` tiles com até `concorrencia` downloads simultâneos e
+    `pausa` segundos entre lotes. Tiles que continuarão frescos por pelo
+    menos `validade_min` segundos não são baixados de novo.
+
+    `ao_progredir(progresso)` recebe os contadores após cada etapa.
+
+    Returns:
+        Dicionário {total, frescos, baixados, falhas, segundos}
+    """
+    concorrencia = concorrencia or settings.PREFETCH_CONCORRENCIA
+    tamanho_lote = tamanho_lote or settings.PREFETCH_TAMANHO_LOTE
+    pausa = settings.PREFETCH_PAUSA if pausa is None else pausa
+    inicio = time.monotonic()
+    semaforo = asyncio.Semaphore(concorrencia)
+    progresso = {"total": sum(len(tiles) for tiles in plano.values()), "frescos": 0, "baixados": 0, "falhas": 0}
+
+    def notificar():
+        progresso["segundos"] = round(time.monotonic() - inicio, 3)
+        if ao_progredir is not None:
+            ao_progredir(dict(progresso))
+
+    async def gravar(tx, ty, zoom):
+        async with semaforo:
+            try:
+                return await tile_fetcher.gravar_tile_async(tx, ty, zoom, cliente, cache)
+            except Exception as e:
+                logger.warning(f"Erro ao pré-carregar tile ({tx},{ty}) no zoom {zoom}: {e}")
+                return False
+
+    primeiro_lote = True
+    for zoom, tiles in plano.items():
+        frescos = await asyncio.to_thread(cache.tiles_frescos, zoom, tiles, validade_min)
+        progresso["frescos"] += len(frescos)
+        notificar()
+
+        pendentes = [tile for tile in tiles if tile not in frescos]
+        for i in range(0, len(pendentes), tamanho_lote):
+            if not primeiro_lote and pausa:
+                await asyncio.sleep(pausa)
+            primeiro_lote = False
+            gravados = await asyncio.gather(*(gravar(tx, ty, zoom) for tx, ty in pendentes[i:i + tamanho_lote]))
+            progresso["baixados"] += sum(gravados)
+            progresso["falhas"] += len(gravados) - sum(gravados)
+            notificar()
+
+    notificar()
+    logger.info(
+        f"Pré-carregamento concluído: {progresso['baixados']} baixados, {progresso['frescos']} frescos, "
+        f"{progresso['falhas']} falhas em {progresso['segundos']}s"
+    )
+    return progresso
+
+
+class GerenciadorPrefetch:
+    """
+    Pré-carregamentos disparados pela API de administração, executados em
+    tarefas de fundo no próprio processo. No máximo `max_simultaneos`
+    execuções rodam ao mesmo tempo; guarda o estado das `max_historico`
+    execuções mais recentes.
+    """
+
+    def __init__(self, max_historico=20, max_simultaneos=None):
+        self.max_historico = max_historico
+        self.max_simultaneos = max_simultaneos or settings.PREFETCH_MAX_SIMULTANEOS
+        self._execucoes = OrderedDict()
+        self._tarefas = {}
+
+    async def iniciar(self, pedido):
+        """
+        Raises:
+            RuntimeError se o cache em disco estiver desabilitado, o provedor
+                for local ou já houver `max_simultaneos` execuções em andamento
+            ValueError se o pedido exceder PREFETCH_MAX_TILES
+        """
+        cache = tile_fetcher.obter_cache_disco()
+        if cache is None:
+            raise RuntimeError("Cache de tiles em disco desabilitado (TILE_CACHE_HABILITADO) ou provedor de tiles local")
+        self._verificar_vagas()
+        plano = await asyncio.to_thread(planejar, pedido.areas, pedido.zooms)
+        # Outro pedido pode ter começado enquanto este era planejado
+        self._verificar_vagas()
+
+        execucao = {
+            "id": uuid.uuid4().hex,
+            "status": "processando",
+            "zooms": list(plano),
+            "areas": len(pedido.areas),
+            "progresso": {"total": sum(len(tiles) for tiles in plano.values())},
+            "criado_em": time.time(),
+            "atualizado_em": time.time(),
+        }
+        self._execucoes[execucao["id"]] = execucao
+        while len(self._execucoes) > self.max_historico:
+            self._execucoes.popitem(last=False)
+        self._tarefas[execucao["id"]] = asyncio.create_task(
+            self._executar(execucao, plano, cache, pedido.validade_min)
+        )
+        logger.info(f"Pré-carregamento {execucao['id']} iniciado ({execucao['progresso']['total']} tiles)")
+        return execucao
+
+    def _verificar_vagas(self):
+        if len(self._tarefas) >= self.max_simultaneos:
+            raise RuntimeError(f"Já há {len(self._tarefas)} pré-carregamentos em andamento; tente novamente mais tarde")
+
+    async def _executar(self, execucao, plano, cache, validade_min):
+        def ao_progredir(progresso):
+            execucao.update(progresso=progresso, atualizado_em=time.time())
+
+        try:
+            progresso = await prefetch(plano, map_service.cliente_tiles, cache, validade_min, ao_progredir=ao_progredir)
+            execucao.update(status="concluido", progresso=progresso, atualizado_em=time.time())
+        except Exception as e:
+            logger.error(f"Pré-carregamento {execucao['id']} falhou: {e}")
+            execucao.update(status="erro", erro=str(e), atualizado_em=time.time())
+        finally:
+            self._tarefas.pop(execucao["id"], None)
+
+    def obter(self, execucao_id):
+        return self._execucoes.get(execucao_id)
+
+    def listar(self):
+        return list(reversed(self._execucoes.values()))
+
+    async def fechar(self):
+        tarefas = list(self._tarefas.values())
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+
+
+gerenciador_prefetch = GerenciadorPrefetch()
+
+
+def _pedido_da_linha_de_comando(parser, args):
+    dados = {"areas": []}
+    if args.arquivo:
+        with open(args.arquivo, encoding="utf-8") as f:
+            conteudo = json.load(f)
+        dados = conteudo if isinstance(conteudo, dict) else {"areas": conteudo}
+    for bbox in args.bbox:
+        try:
+            min_lat, min_lon, max_lat, max_lon = (float(v) for v in bbox.split(","))
+        except ValueError:
+            parser.error(f"--bbox inválido: {bbox}")
+        dados["areas"].append({"bbox": {"min_lat": min_lat, "min_lon": min_lon, "max_lat": max_lat, "max_lon": max_lon}})
+    if args.zoom:
+        dados["zooms"] = args.zoom
+    if args.validade_min is not None:
+        dados["validade_min"] = args.validade_min
+    if not dados["areas"]:
+        parser.error("Informe um arquivo de áreas ou --bbox")
+    return PrefetchRequest(**dados)
+
+
+def _logar_progresso(progresso):
+    feitos = progresso["frescos"] + progresso["baixados"] + progresso["falhas"]
+    logger.info(
+        f"{feitos}/{progresso['total']} tiles (frescos: {progresso['frescos']}, "
+        f"baixados: {progresso['baixados']}, falhas: {progresso['falhas']})"
+    )
+
+
+async def _executar_linha_de_comando(plano, cache, pedido, args):
+    cliente = ClienteHttp()
+    try:
+        return await prefetch(
+            plano, cliente, cache, pedido.validade_min,
+            args.concorrencia, args.tamanho_lote, args.pausa, ao_progredir=_logar_progresso,
+        )
+    finally:
+        await cliente.fechar_async()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Pré-carrega no cache em disco os tiles de estacionamentos")
+    parser.add_argument("arquivo", nargs="?", help="JSON com {areas, zooms} ou uma lista de áreas")
+    parser.add_argument("--bbox", action="append", default=[], help="min_lat,min_lon,max_lat,max_lon (pode repetir)")
+    parser.add_argument("--zoom", type=int, nargs="+", help=f"Níveis de zoom (padrão: {settings.ZOOM_MAX})")
+    parser.add_argument("--validade-min", type=float, help="Rebaixa tiles que expiram em menos que este tempo (s)")
+    parser.add_argument("--concorrencia", type=int, help=f"Downloads simultâneos (padrão: {settings.PREFETCH_CONCORRENCIA})")
+    parser.add_argument("--tamanho-lote", type=int, help=f"Tiles por lote (padrão: {settings.PREFETCH_TAMANHO_LOTE})")
+    parser.add_argument("--pausa", type=float, help=f"Pausa entre lotes em segundos (padrão: {settings.PREFETCH_PAUSA})")
+    args = parser.parse_args()
+
+    pedido = _pedido_da_linha_de_comando(parser, args)
+    cache = tile_fetcher.obter_cache_disco()
+    if cache is None:
+        parser.error("Cache de tiles em disco desabilitado (TILE_CACHE_HABILITADO) ou provedor de tiles local")
+    try:
+        plano = planejar(pedido.areas, pedido.zooms)
+    except ValueError as e:
+        parser.error(str(e))
+
+    progresso = asyncio.run(_executar_linha_de_comando(plano, cache, pedido, args))
+    print(json.dumps(progresso, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
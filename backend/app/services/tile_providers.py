@@ -0,0 +1,174 @@
+import os
+import asyncio
+import sqlite3
+import threading
+import logging
+from app.api.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ProvedorXYZ:
+    """
+    Servidor HTTP de tiles no esquema XYZ, a partir de um modelo de URL com
+    `{x}`, `{y}` e `{z}` (ex.: Google Maps satélite, ou o servidor local de
+    `tile_server` para testes de carga).
+    """
+
+    remoto = True
+    em_lote = False
+
+    def __init__(self, modelo_url):
+        self.modelo_url = modelo_url
+
+    def url(self, zoom, tx, ty):
+        return self.modelo_url.format(x=tx, y=ty, z=zoom)
+
+    def _conteudo(self, response, tx, ty):
+        if response.status_code != 200:
+            logger.warning(f"Tile ({tx},{ty}) retornou status {response.status_code}")
+            return None
+        return response.content
+
+    def obter(self, zoom, tx, ty, cliente):
+        """Bytes do tile, ou None se o servidor não retornou 200."""
+        return self._conteudo(cliente.get(self.url(zoom, tx, ty)), tx, ty)
+
+    async def obter_async(self, zoom, tx, ty, cliente):
+        return self._conteudo(await cliente.get_async(self.url(zoom, tx, ty)), tx, ty)
+
+    def descrever(self):
+        return {"tipo": "xyz", "modelo_url": self.modelo_url}
+
+
+class _ProvedorLocal:
+    """Base dos provedores em disco: leitura síncrona, levada a uma thread na versão assíncrona."""
+
+    remoto = False
+    em_lote = False
+
+    def obter(self, zoom, tx, ty, cliente=None):
+        raise NotImplementedError
+
+    async def obter_async(self, zoom, tx, ty, cliente=None):
+        return await asyncio.to_thread(self.obter, zoom, tx, ty)
+
+
+def _faixas_por_coluna(tiles):
+    """Agrupa tiles (tx, ty) em faixas (tx, ty_inicio, ty_fim) de linhas consecutivas da mesma coluna."""
+    faixas = []
+    for tx, ty in sorted(set(tiles)):
+        if faixas and faixas[-1][0] == tx and faixas[-1][2] == ty - 1:
+            faixas[-1][2] = ty
+        else:
+            faixas.append([tx, ty, ty])
+    return [tuple(faixa) for faixa in faixas]
+
+
+class ProvedorMBTiles(_ProvedorLocal):
+    """
+    Arquivo MBTiles (SQLite, tabela ou view `tiles`), para operação offline
+    com imagens pré-baixadas (ver `mbtiles_export`). As linhas seguem o
+    esquema TMS, com o eixo y invertido em relação ao XYZ usado no restante
+    do sistema.
+
+    As conexões são somente leitura e usam mmap (`mmap_bytes`), de modo que
+    as leituras vêm direto do page cache do sistema operacional, sem passar
+    pelo cache de páginas do SQLite. `obter_varios` lê todos os tiles de um
+    mosaico com uma única consulta por faixa.
+    """
+
+    em_lote = True
+
+    def __init__(self, caminho, mmap_bytes=None):
+        if not os.path.exists(caminho):
+            raise FileNotFoundError(f"MBTiles não encontrado: {caminho}")
+        self.caminho = caminho
+        self.mmap_bytes = settings.TILE_MBTILES_MMAP_BYTES if mmap_bytes is None else mmap_bytes
+        self._local = threading.local()
+
+    def _conexao(self):
+        """Conexão somente leitura da thread atual (sqlite3 não compartilha conexões entre threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.caminho}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_bytes)}")
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+        return conn
+
+    def obter(self, zoom, tx, ty, cliente=None):
+        row = self._conexao().execute(
+            "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (zoom, tx, (1 << zoom) - 1 - ty),
+        ).fetchone()
+        return row[0] if row else None
+
+    def obter_varios(self, zoom, tiles):
+        """
+        Lê vários tiles agrupando-os em faixas contíguas de linhas por coluna
+        e fazendo uma consulta por faixa (pelo índice zoom/coluna/linha). Só
+        os tiles pedidos são lidos, mesmo quando o conjunto reúne áreas
+        distantes (ex.: a união de tiles de um lote).
+
+        Returns:
+            Dicionário {(tx, ty): bytes} com os tiles pedidos presentes no arquivo
+        """
+        n = (1 << zoom) - 1
+        conn = self._conexao()
+        lidos = {}
+        for tx, inicio, fim in _faixas_por_coluna(tiles):
+            rows = conn.execute(
+                "SELECT tile_row, tile_data FROM tiles "
+                "WHERE zoom_level = ? AND tile_column = ? AND tile_row BETWEEN ? AND ?",
+                (zoom, tx, n - fim, n - inicio),
+            )
+            for linha, dados in rows:
+                lidos[(tx, n - linha)] = dados
+        return lidos
+
+    def descrever(self):
+        return {"tipo": "mbtiles", "caminho": self.caminho}
+
+
+class ProvedorDiretorio(_ProvedorLocal):
+    """Árvore de arquivos `{diretorio}/{z}/{x}/{y}.{extensão}`."""
+
+    EXTENSOES = ("jpg", "jpeg", "png", "webp")
+
+    def __init__(self, diretorio, extensoes=None):
+        if not os.path.isdir(diretorio):
+            raise FileNotFoundError(f"Diretório de tiles não encontrado: {diretorio}")
+        self.diretorio = diretorio
+        self.extensoes = tuple(extensoes or self.EXTENSOES)
+
+    def obter(self, zoom, tx, ty, cliente=None):
+        base = os.path.join(self.diretorio, str(zoom), str(tx), str(ty))
+        for extensao in self.extensoes:
+            try:
+                with open(f"{base}.{extensao}", "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                continue
+        return None
+
+    def descrever(self):
+        return {"tipo": "diretorio", "diretorio": self.diretorio}
+
+
+def criar_provedor():
+    """
+    Provedor de tiles conforme TILE_PROVEDOR: "xyz" (TILE_URL_MODELO),
+    "mbtiles" (TILE_MBTILES) ou "diretorio" (TILE_DIRETORIO).
+    """
+    tipo = settings.TILE_PROVEDOR
+    if tipo == "mbtiles":
+        provedor = ProvedorMBTiles(settings.TILE_MBTILES)
+    elif tipo == "diretorio":
+        provedor = ProvedorDiretorio(settings.TILE_DIRETORIO)
+    elif tipo == "xyz":
+        provedor = ProvedorXYZ(settings.TILE_URL_MODELO)
+    else:
+        raise ValueError(f"TILE_PROVEDOR desconhecido: {tipo}")
+    logger.info(f"Provedor de tiles: {provedor.descrever()}")
+    return provedor
@@ -0,0 +1,194 @@
+"""
+Servidor de tiles XYZ local e leve, substituto do Google Maps em testes de
+carga e benchmarks sem rede. Serve os tiles de um provedor local (MBTiles ou
+diretório) ou tiles sintéticos, com latência e erros injetáveis.
+
+Uso:
+    python -m app.services.tile_server --porta 8090 --latencia-ms 40 --jitter-ms 20 --taxa-erro 0.02
+    TILE_URL_MODELO="http://127.0.0.1:8090/{z}/{x}/{y}.jpg" uvicorn main:app
+"""
+import io
+import re
+import time
+import random
+import argparse
+import threading
+import logging
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from PIL import Image
+from app.services import tile_providers
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_TILE = re.compile(r"^/(\d+)/(\d+)/(\d+)(?:\.\w+)?$")
+
+
+@lru_cache(maxsize=16)
+def _tile_sintetico(variacao):
+    # Ruído sobre um gradiente: comprime como uma imagem de satélite, não como cor sólida
+    gerador = np.random.default_rng(variacao)
+    gradiente = np.linspace(40, 160, 256, dtype=np.float32)
+    pixels = gradiente[None, :, None] + gerador.normal(0, 25, (256, 256, 3)).astype(np.float32)
+    pixels[..., variacao % 3] += 30
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def tile_sintetico(zoom, tx, ty):
+    """JPEG 256x256 determinístico por tile (16 variações, codificadas uma única vez)."""
+    return _tile_sintetico((tx * 7 + ty * 13 + zoom) % 16)
+
+
+class ServidorTiles:
+    """
+    Servidor HTTP/1.1 (keep-alive) de tiles em `/{z}/{x}/{y}.jpg`.
+
+    Cada resposta espera `latencia_ms` mais um atraso uniforme de até
+    `jitter_ms`; uma fração `taxa_erro` das requisições recebe `status_erro`
+    (por padrão 503, que o ClienteHttp trata como transitório). Com
+    `semente`, a sequência de atrasos e erros é reproduzível.
+    """
+
+    def __init__(self, host="127.0.0.1", porta=0, provedor=None, latencia_ms=0.0, jitter_ms=0.0,
+                 taxa_erro=0.0, status_erro=503, semente=None):
+        self.host = host
+        self.porta = porta
+        self.provedor = provedor
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.taxa_erro = taxa_erro
+        self.status_erro = status_erro
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+        self._servidor = None
+        self._thread = None
+        self.requisicoes = 0
+        self.servidos = 0
+        self.erros_injetados = 0
+        self.nao_encontrados = 0
+
+    @property
+    def url_modelo(self):
+        """Modelo de URL para TILE_URL_MODELO / ProvedorXYZ."""
+        return f"http://{self.host}:{self.porta}/{{z}}/{{x}}/{{y}}.jpg"
+
+    def _sortear(self):
+        with self._lock:
+            self.requisicoes += 1
+            atraso = (self.latencia_ms + self._aleatorio.uniform(0, self.jitter_ms)) / 1000
+            falhar = self._aleatorio.random() < self.taxa_erro
+        return atraso, falhar
+
+    def _conteudo(self, zoom, tx, ty):
+        if self.provedor is None:
+            return tile_sintetico(zoom, tx, ty)
+        return self.provedor.obter(zoom, tx, ty)
+
+    def _responder(self, caminho):
+        """Returns: (status, bytes)"""
+        correspondencia = CAMINHO_TILE.match(caminho.split("?", 1)[0])
+        if correspondencia is None:
+            return 404, b""
+        atraso, falhar = self._sortear()
+        if atraso > 0:
+            time.sleep(atraso)
+        if falhar:
+            with self._lock:
+                self.erros_injetados += 1
+            return self.status_erro, b""
+        zoom, tx, ty = (int(v) for v in correspondencia.groups())
+        conteudo = self._conteudo(zoom, tx, ty)
+        with self._lock:
+            if conteudo is None:
+                self.nao_encontrados += 1
+            else:
+                self.servidos += 1
+        return (404, b"") if conteudo is None else (200, conteudo)
+
+    def iniciar(self):
+        servidor_tiles = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, conteudo = servidor_tiles._responder(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", "image/jpeg" if status == 200 else "text/plain")
+                self.send_header("Content-Length", str(len(conteudo)))
+                self.end_headers()
+                self.wfile.write(conteudo)
+
+            def log_message(self, formato, *args):
+                logger.debug(formato % args)
+
+        self._servidor = ThreadingHTTPServer((self.host, self.porta), Manipulador)
+        self._servidor.daemon_threads = True
+        self.porta = self._servidor.server_address[1]
+        self._thread = threading.Thread(target=self._servidor.serve_forever, name="tile-server", daemon=True)
+        self._thread.start()
+        logger.info(f"Servidor de tiles em {self.url_modelo}")
+        return self
+
+    def encerrar(self):
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.encerrar()
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "requisicoes": self.requisicoes,
+                "servidos": self.servidos,
+                "erros_injetados": self.erros_injetados,
+                "nao_encontrados": self.nao_encontrados,
+            }
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Servidor de tiles local com latência e erros injetáveis")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8090)
+    origem = parser.add_mutually_exclusive_group()
+    origem.add_argument("--mbtiles", help="Serve os tiles deste arquivo MBTiles")
+    origem.add_argument("--diretorio", help="Serve os tiles de {diretorio}/{z}/{x}/{y}.jpg|png|webp")
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas com erro (0 a 1)")
+    parser.add_argument("--status-erro", type=int, default=503)
+    parser.add_argument("--semente", type=int)
+    args = parser.parse_args()
+
+    provedor = None
+    if args.mbtiles:
+        provedor = tile_providers.ProvedorMBTiles(args.mbtiles)
+    elif args.diretorio:
+        provedor = tile_providers.ProvedorDiretorio(args.diretorio)
+
+    servidor = ServidorTiles(
+        args.host, args.porta, provedor, args.latencia_ms, args.jitter_ms,
+        args.taxa_erro, args.status_erro, args.semente,
+    ).iniciar()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.encerrar()
+        logger.info(f"Servidor de tiles encerrado: {servidor.estatisticas()}")
+
+
+if __name__ == "__main__":
+    main()
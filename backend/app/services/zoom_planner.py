@@ -0,0 +1,109 @@
+import math
+import logging
+import numpy as np
+from dataclasses import dataclass, asdict
+from fastapi import HTTPException
+from app.api.config import settings
+from app.services import projecao
+from app.services.map_service import tiles_do_poligono
+
+logger = logging.getLogger(__name__)
+
+# Metros por pixel no equador no zoom 0 (tiles de 256 px)
+METROS_POR_PIXEL_Z0 = 2 * math.pi * 6378137 / projecao.TILE_SIZE
+
+
+@dataclass
+class PlanoZoom:
+    """Zoom escolhido para uma área e a estimativa de custo da aquisição."""
+    zoom: int
+    tiles: int
+    largura_pixels: int
+    altura_pixels: int
+    metros_por_pixel: float
+    vaga_pixels: float
+    resolucao_reduzida: bool = False
+
+    @property
+    def pixels(self):
+        return self.largura_pixels * self.altura_pixels
+
+    def como_dict(self):
+        dados = asdict(self)
+        dados["pixels"] = self.pixels
+        return dados
+
+
+def metros_por_pixel(lat, zoom):
+    return METROS_POR_PIXEL_Z0 * math.cos(math.radians(lat)) / 2 ** zoom
+
+
+def estimar_custo(pontos, zoom, max_tiles=None, max_pixels=None):
+    """
+    Tiles e dimensões (px) do mosaico do polígono no zoom informado.
+
+    A contagem exata de tiles percorre o retângulo envolvente; quando as
+    dimensões já estouram `max_pixels`, ou a área do polígono sozinha já
+    exige mais que `max_tiles` tiles, devolve essa cota inferior sem
+    enumerar os tiles (áreas enormes em zooms altos).
+    """
+    xs, ys = projecao.gps_para_pixel([p.lat for p in pontos], [p.lon for p in pontos], zoom)
+    largura = max(1, math.ceil(xs.max()) - math.floor(xs.min()))
+    altura = max(1, math.ceil(ys.max()) - math.floor(ys.min()))
+    area = 0.5 * abs(np.dot(xs, np.roll(ys, 1)) - np.dot(ys, np.roll(xs, 1)))
+    tiles_minimos = math.ceil(area / projecao.TILE_SIZE ** 2)
+    if (max_pixels is not None and largura * altura > max_pixels) or (
+        max_tiles is not None and tiles_minimos > max_tiles
+    ):
+        return tiles_minimos, largura, altura
+    return len(tiles_do_poligono(list(zip(xs.tolist(), ys.tolist())), zoom)), largura, altura
+
+
+def planejar_zoom(pontos, zoom_min=None, zoom_max=None, vaga_min_pixels=None,
+                  orcamento_tiles=None, orcamento_pixels=None):
+    """
+    Escolhe o menor zoom em que uma vaga (VAGA_LARGURA_METROS) ocupa ao menos
+    `vaga_min_pixels` pixels, já que zooms maiores só multiplicam tiles sem
+    ganho para o detector. Se esse zoom estourar o orçamento de tiles/pixels,
+    reduz o zoom até caber e marca `resolucao_reduzida`.
+
+    Returns:
+        PlanoZoom
+    """
+    zoom_min = settings.ZOOM_MIN if zoom_min is None else zoom_min
+    zoom_max = settings.ZOOM_MAX if zoom_max is None else zoom_max
+    vaga_min_pixels = settings.VAGA_MIN_PIXELS if vaga_min_pixels is None else vaga_min_pixels
+    orcamento_tiles = settings.ORCAMENTO_TILES if orcamento_tiles is None else orcamento_tiles
+    orcamento_pixels = settings.ORCAMENTO_PIXELS if orcamento_pixels is None else orcamento_pixels
+
+    lat_centro = sum(p.lat for p in pontos) / len(pontos)
+
+    # Menor zoom que resolve a vaga com pixels suficientes
+    zoom_ideal = zoom_max
+    for zoom in range(zoom_min, zoom_max + 1):
+        if settings.VAGA_LARGURA_METROS / metros_por_pixel(lat_centro, zoom) >= vaga_min_pixels:
+            zoom_ideal = zoom
+            break
+
+    for zoom in range(zoom_ideal, zoom_min - 1, -1):
+        tiles, largura, altura = estimar_custo(pontos, zoom, orcamento_tiles, orcamento_pixels)
+        if tiles <= orcamento_tiles and largura * altura <= orcamento_pixels:
+            mpp = metros_por_pixel(lat_centro, zoom)
+            plano = PlanoZoom(
+                zoom=zoom,
+                tiles=tiles,
+                largura_pixels=largura,
+                altura_pixels=altura,
+                metros_por_pixel=round(mpp, 4),
+                vaga_pixels=round(settings.VAGA_LARGURA_METROS / mpp, 1),
+                resolucao_reduzida=zoom < zoom_ideal,
+            )
+            if plano.resolucao_reduzida:
+                logger.warning(f"Área grande: zoom reduzido de {zoom_ideal} para {zoom} ({plano.vaga_pixels} px por vaga)")
+            logger.info(f"Plano de zoom: {plano}")
+            return plano
+
+    raise HTTPException(
+        status_code=413,
+        detail=f"Área excede o orçamento de tiles/pixels mesmo no zoom {zoom_min}"
+    )
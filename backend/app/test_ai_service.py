@@ -0,0 +1,184 @@
+import time
+import asyncio
+import numpy as np
+from app.services import ai_service
+from app.services.ai_service import MotorInferencia, aplicar_nms, decodificar_saida_yolo, gerar_janelas
+from app.services.deteccoes import Deteccoes
+
+
+class BackendFalso:
+    def __init__(self):
+        self.tamanhos_lote = []
+
+    def prever(self, imagens):
+        self.tamanhos_lote.append(len(imagens))
+        return [
+            Deteccoes([[0, 0, img.shape[1], img.shape[0]]], [0.9], [0], ["comum"])
+            for img in imagens
+        ]
+
+
+def test_motor_agrupa_requisicoes_concorrentes_em_um_lote():
+    backend = BackendFalso()
+    motor = MotorInferencia(backend, max_lote=8, max_espera_ms=200)
+    try:
+        imagens = [np.zeros((10 + i, 20, 3), dtype=np.uint8) for i in range(5)]
+        futuros = [motor.submeter(img) for img in imagens]
+        resultados = [f.result(timeout=5) for f in futuros]
+    finally:
+        motor.encerrar()
+
+    assert backend.tamanhos_lote == [5]
+    assert [r.caixas[0, 3] for r in resultados] == [10, 11, 12, 13, 14]
+
+
+def test_motor_respeita_tamanho_maximo_do_lote():
+    backend = BackendFalso()
+    motor = MotorInferencia(backend, max_lote=2, max_espera_ms=200)
+    try:
+        futuros = [motor.submeter(np.zeros((4, 4, 3), dtype=np.uint8)) for _ in range(5)]
+        for f in futuros:
+            f.result(timeout=5)
+    finally:
+        motor.encerrar()
+
+    assert sum(backend.tamanhos_lote) == 5
+    assert max(backend.tamanhos_lote) <= 2
+
+
+def test_motor_sobrevive_a_chamador_cancelado(monkeypatch):
+    class BackendLento(BackendFalso):
+        def prever(self, imagens):
+            time.sleep(0.05)
+            return super().prever(imagens)
+
+    motor = MotorInferencia(BackendLento(), max_lote=1, max_espera_ms=0)
+    monkeypatch.setattr(ai_service, "_motor", motor)
+    imagem = np.zeros((4, 4, 3), dtype=np.uint8)
+
+    async def cenario():
+        # A primeira chamada ocupa o motor; a segunda é cancelada na fila e a
+        # terceira é cancelada durante o forward pass
+        primeira = asyncio.ensure_future(ai_service.analisar_imagem_com_ia_async(imagem))
+        segunda = asyncio.ensure_future(ai_service.analisar_imagem_com_ia_async(imagem))
+        await asyncio.sleep(0.01)
+        segunda.cancel()
+        await primeira
+        terceira = asyncio.ensure_future(ai_service.analisar_imagem_com_ia_async(imagem))
+        await asyncio.sleep(0.01)
+        terceira.cancel()
+        await asyncio.sleep(0.1)
+        return await asyncio.wait_for(ai_service.analisar_imagem_com_ia_async(imagem), timeout=5)
+
+    try:
+        assert len(asyncio.run(cenario())) == 1
+        assert motor._thread.is_alive()
+        assert motor.imagens == 3
+    finally:
+        motor.encerrar()
+
+
+def test_inferencia_cancelada_so_retorna_sem_janelas_em_uso(monkeypatch):
+    class BackendMonitorado(BackendFalso):
+        em_inferencia = 0
+
+        def prever(self, imagens):
+            self.em_inferencia += 1
+            time.sleep(0.05)
+            self.em_inferencia -= 1
+            return super().prever(imagens)
+
+    backend = BackendMonitorado()
+    motor = MotorInferencia(backend, max_lote=1, max_espera_ms=0)
+    monkeypatch.setattr(ai_service, "_motor", motor)
+    imagem = np.zeros((100, 400, 3), dtype=np.uint8)
+
+    async def cenario():
+        tarefa = asyncio.ensure_future(ai_service.analisar_imagem_fatiada_async(imagem, tamanho_janela=100, sobreposicao=0))
+        await asyncio.sleep(0.08)
+        tarefa.cancel()
+        try:
+            await tarefa
+        except asyncio.CancelledError:
+            pass
+        # Nenhuma janela em inferência nem processada depois do retorno
+        em_inferencia, lotes = backend.em_inferencia, len(backend.tamanhos_lote)
+        await asyncio.sleep(0.15)
+        return em_inferencia, lotes
+
+    try:
+        em_inferencia, lotes = asyncio.run(cenario())
+        assert em_inferencia == 0
+        assert len(backend.tamanhos_lote) == lotes < 4
+    finally:
+        motor.encerrar()
+
+
+def test_nms_suprime_apenas_sobreposicoes_da_mesma_classe():
+    caixas = np.array([
+        [0, 0, 10, 10],
+        [1, 1, 11, 11],    # sobrepõe a primeira, mesma classe
+        [1, 1, 11, 11],    # sobrepõe, mas é de outra classe
+        [50, 50, 60, 60],
+    ], dtype=np.float64)
+    scores = np.array([0.9, 0.8, 0.7, 0.6])
+    classes = np.array([0, 0, 1, 0])
+
+    assert aplicar_nms(caixas, scores, classes, 0.5).tolist() == [0, 2, 3]
+
+
+def test_decodificar_saida_yolo_desfaz_letterbox():
+    # Uma predição (cx, cy, w, h, score_classe0, score_classe1) no espaço 640x640
+    saida = np.array([[320.0], [330.0], [20.0], [40.0], [0.1], [0.95]])
+    caixas, scores, classes = decodificar_saida_yolo(
+        saida, escala=0.5, pad=(0, 10), conf_min=0.25, iou_limite=0.45
+    )
+
+    assert classes.tolist() == [1]
+    assert np.allclose(caixas[0], [620, 600, 660, 680])
+
+
+def test_gerar_janelas_cobre_imagem_com_sobreposicao():
+    janelas = gerar_janelas(2560, 1280, 1280, 0.2)
+
+    assert janelas[0] == (0, 0, 1280, 1280)
+    assert janelas[-1] == (1280, 0, 2560, 1280)
+    assert all(x1 - x0 == 1280 for x0, _, x1, _ in janelas)
+    assert len(janelas) == 3
+
+
+def test_inferencia_fatiada_processa_so_janelas_no_poligono_e_mescla(monkeypatch):
+    class BackendVagaPintada:
+        """Detecta a região pintada de branco visível em cada janela."""
+
+        def __init__(self):
+            self.janelas = 0
+
+        def prever(self, imagens):
+            self.janelas += len(imagens)
+            resultados = []
+            for img in imagens:
+                ys, xs = np.nonzero(img[..., 0])
+                if len(xs) == 0:
+                    resultados.append(Deteccoes.vazio(["comum"]))
+                    continue
+                caixa = [xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]
+                resultados.append(Deteccoes([caixa], [0.9], [0], ["comum"]))
+            return resultados
+
+    backend = BackendVagaPintada()
+    motor = MotorInferencia(backend, max_lote=8, max_espera_ms=50)
+    monkeypatch.setattr(ai_service, "_motor", motor)
+    try:
+        imagem = np.zeros((1000, 1000, 3), dtype=np.uint8)
+        imagem[100:180, 380:420] = 255  # Vaga na área de sobreposição entre janelas
+        poligono = [(0, 0), (400, 0), (400, 400), (0, 400)]
+        deteccoes = ai_service.analisar_imagem_fatiada(
+            imagem, poligono_pixels=poligono, tamanho_janela=500, sobreposicao=0.2
+        )
+    finally:
+        motor.encerrar()
+
+    # Janelas de 500 px com passo 400: só as que começam em 0 ou 400 tocam o polígono
+    assert backend.janelas == 4
+    assert len(deteccoes) == 1 and deteccoes.caixas.tolist() == [[380, 100, 420, 180]]
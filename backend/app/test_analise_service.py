@@ -0,0 +1,81 @@
+import asyncio
+import numpy as np
+from app.schemas.parking_schema import PontoGPS
+from app.services import analise_service, ai_service, map_service, tile_fetcher
+from app.services.deteccoes import Deteccoes
+from app.services.result_cache import BackendMemoria, CacheResultados
+from app.services.storage_service import RepositorioAnalises
+
+
+def _triangulo(lat, lon, d=0.0004):
+    return [PontoGPS(lat=lat, lon=lon), PontoGPS(lat=lat, lon=lon + d), PontoGPS(lat=lat - d, lon=lon + d / 2)]
+
+
+def test_analise_em_lote_baixa_tiles_compartilhados_uma_vez(monkeypatch):
+    pedidos = []
+
+    async def baixar_tiles_async(tiles, zoom, ao_receber, cliente, **kwargs):
+        pedidos.extend(tiles)
+        for tx, ty in tiles:
+            ao_receber(tx, ty, np.full((256, 256, 3), 90, dtype=np.uint8))
+        return len(tiles), 0
+
+    async def detectar_async(imagem, poligono_pixels=None):
+        # Uma vaga no primeiro vértice do polígono (dentro dele)
+        x, y = poligono_pixels[0]
+        return Deteccoes([[x, y, x + 4, y + 4]], [0.9], [0], ["comum"])
+
+    monkeypatch.setattr(tile_fetcher, "baixar_tiles_async", baixar_tiles_async)
+    monkeypatch.setattr(ai_service, "detectar_async", detectar_async)
+    monkeypatch.setattr(analise_service, "repositorio_analises", None)
+    monkeypatch.setattr(analise_service, "cache_resultados", CacheResultados(BackendMemoria()))
+
+    # Duas áreas vizinhas (compartilham tiles) e uma grande demais para o orçamento
+    lotes = [_triangulo(-10.9470, -37.0730), _triangulo(-10.9471, -37.0728), _triangulo(-10.0, -37.0, d=5)]
+
+    async def cenario():
+        return [item async for item in analise_service.analisar_lote(lotes)]
+
+    respostas = dict(asyncio.run(cenario()))
+
+    assert set(respostas) == {0, 1, 2}
+    assert isinstance(respostas[2], Exception)
+    assert respostas[0]["sumario"]["total_de_vagas_identificadas"] == 1
+    assert respostas[1]["sumario"]["total_de_vagas_identificadas"] == 1
+    assert len(pedidos) == len(set(pedidos))
+    tiles_separados = sum(len(map_service.planejar_mosaico_poligono(l, 20).tiles) for l in lotes[:2])
+    assert len(pedidos) < tiles_separados
+
+
+def test_invalidar_cache_forca_nova_inferencia(monkeypatch, tmp_path):
+    chamadas = []
+
+    async def baixar_tiles_async(tiles, zoom, ao_receber, cliente, **kwargs):
+        for tx, ty in tiles:
+            ao_receber(tx, ty, np.full((256, 256, 3), 90, dtype=np.uint8))
+        return len(tiles), 0
+
+    async def detectar_async(imagem, poligono_pixels=None):
+        chamadas.append(1)
+        x, y = poligono_pixels[0]
+        return Deteccoes([[x, y, x + 4, y + 4]], [0.9], [0], ["comum"])
+
+    repositorio = RepositorioAnalises(f"sqlite:///{tmp_path / 'analises.db'}")
+    repositorio.criar_tabelas()
+    monkeypatch.setattr(tile_fetcher, "baixar_tiles_async", baixar_tiles_async)
+    monkeypatch.setattr(ai_service, "detectar_async", detectar_async)
+    monkeypatch.setattr(analise_service, "repositorio_analises", repositorio)
+    monkeypatch.setattr(analise_service, "cache_resultados", CacheResultados(BackendMemoria()))
+    pontos = _triangulo(-10.9470, -37.0730)
+
+    async def cenario():
+        await analise_service.analisar_area(pontos)
+        await analise_service.analisar_area(pontos)
+        removidos = await analise_service.invalidar_cache(pontos)
+        await analise_service.analisar_area(pontos)
+        return removidos
+
+    removidos = asyncio.run(cenario())
+
+    assert removidos == 2  # resultado em cache + análise armazenada
+    assert len(chamadas) == 2
@@ -0,0 +1,22 @@
+from app.services.benchmark import comparar, resumir
+
+
+def test_resumir_percentis_e_vazao():
+    estatisticas = resumir([i / 1000 for i in range(1, 101)], duracao=2.0)
+    assert estatisticas["n"] == 100
+    assert estatisticas["p50_ms"] == 50.5
+    assert 95 <= estatisticas["p95_ms"] <= 96
+    assert estatisticas["max_ms"] == 100.0
+    assert estatisticas["vazao_por_s"] == 50.0
+    assert resumir([]) == {"n": 0}
+
+
+def test_comparar_aponta_apenas_regressoes_acima_da_tolerancia():
+    base = {"etapas": {"montagem": {"p95_ms": 10.0}, "jpeg": {"p95_ms": 20.0}, "inferencia": {"ignorada": "x"}},
+            "carga": {"p95_ms": 100.0}}
+    atual = {"etapas": {"montagem": {"p95_ms": 10.5}, "jpeg": {"p95_ms": 30.0}, "inferencia": {"p95_ms": 5.0}},
+             "carga": {"p95_ms": 150.0}}
+
+    regressoes = {r["etapa"]: r for r in comparar(base, atual, tolerancia=0.10)}
+    assert set(regressoes) == {"jpeg", "carga"}
+    assert regressoes["jpeg"]["variacao"] == 0.5
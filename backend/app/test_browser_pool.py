@@ -0,0 +1,72 @@
+from app.services import browser_pool
+
+
+class DriverFalso:
+    def __init__(self):
+        self.encerrado = False
+        self.saudavel = True
+
+    def execute_script(self, script):
+        if not self.saudavel:
+            raise RuntimeError("navegador travado")
+        return "complete"
+
+    def quit(self):
+        self.encerrado = True
+
+
+def _pool(monkeypatch, **kwargs):
+    pool = browser_pool.PoolNavegadores(**kwargs)
+    criados = []
+
+    def criar():
+        driver = DriverFalso()
+        criados.append(driver)
+        return browser_pool._Navegador(driver)
+
+    monkeypatch.setattr(pool, "_criar", criar)
+    return pool, criados
+
+
+def test_pool_reaproveita_e_recicla_apos_max_usos(monkeypatch):
+    pool, criados = _pool(monkeypatch, max_navegadores=1, max_usos=2)
+
+    with pool.adquirir() as d1:
+        pass
+    with pool.adquirir() as d2:
+        pass
+    with pool.adquirir() as d3:
+        pass
+
+    assert d1 is d2
+    assert d1.encerrado and d3 is not d1
+    assert len(criados) == 2
+
+
+def test_pool_substitui_navegador_sem_resposta(monkeypatch):
+    pool, criados = _pool(monkeypatch, max_navegadores=1, max_usos=10)
+
+    with pool.adquirir() as d1:
+        pass
+    d1.saudavel = False
+
+    with pool.adquirir() as d2:
+        pass
+
+    assert d2 is not d1 and d1.encerrado
+    assert pool.estatisticas()["total"] == 1
+
+
+def test_rede_ociosa_so_apos_contagem_de_recursos_estabilizar(monkeypatch):
+    estados = iter([[300, 0], [420, 0], [420, 2], [420, 0], [420, 0], [420, 0]])
+    agora = iter([0.0, 1.0, 2.0, 3.0, 4.0, 5.0])
+    monkeypatch.setattr(browser_pool.time, "monotonic", lambda: next(agora))
+
+    class DriverMaps:
+        def execute_script(self, script):
+            assert "PerformanceObserver" in script
+            return next(estados)
+
+    condicao = browser_pool._RedeOcioso(janela=1.5)
+    driver = DriverMaps()
+    assert [condicao(driver) for _ in range(6)] == [False, False, False, False, False, True]
@@ -0,0 +1,26 @@
+import numpy as np
+from app.services.buffer_pool import PoolBuffers
+
+
+def test_pool_reaproveita_buffer_e_zera_conteudo():
+    pool = PoolBuffers(max_bytes=10_000)
+    a = pool.adquirir(20, 30)
+    a[:] = 255
+    pool.liberar(a)
+
+    b = pool.adquirir(10, 10)
+    assert b.shape == (10, 10, 3) and not b.any()
+    assert np.shares_memory(a, b)
+    assert pool.estatisticas()["reaproveitados"] == 1
+
+
+def test_pool_limita_bytes_ociosos():
+    pool = PoolBuffers(max_bytes=5_000)
+    grandes = [pool.adquirir(30, 30) for _ in range(3)]  # 2700 bytes cada
+    for buffer in grandes:
+        pool.liberar(buffer)
+    pool.liberar(pool.adquirir(50, 50))  # 7500 bytes: maior que o limite, descartado
+
+    estatisticas = pool.estatisticas()
+    assert estatisticas["livres"] == 1 and estatisticas["bytes_livres"] <= 5_000
+    assert estatisticas["em_uso"] == 0
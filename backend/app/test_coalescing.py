@@ -0,0 +1,40 @@
+import asyncio
+from app.services.coalescing import SingleFlight
+
+
+def test_single_flight_compartilha_execucao_em_andamento():
+    sf = SingleFlight("teste")
+    chamadas = []
+
+    async def computar():
+        chamadas.append(1)
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    async def cenario():
+        resultados = await asyncio.gather(*(sf.executar("k", computar) for _ in range(10)))
+        depois = await sf.executar("k", computar)
+        return resultados, depois
+
+    resultados, depois = asyncio.run(cenario())
+
+    assert len(chamadas) == 2
+    assert all(r is resultados[0] for r in resultados)
+    assert depois == {"ok": True}
+    assert sf.estatisticas() == {"em_andamento": 0, "execucoes": 2, "coalescidas": 9}
+
+
+def test_single_flight_propaga_erro_para_todos():
+    sf = SingleFlight("teste")
+
+    async def falhar():
+        await asyncio.sleep(0.01)
+        raise ValueError("falhou")
+
+    async def cenario():
+        return await asyncio.gather(
+            *(sf.executar("k", falhar) for _ in range(3)), return_exceptions=True
+        )
+
+    erros = asyncio.run(cenario())
+    assert all(isinstance(e, ValueError) for e in erros)
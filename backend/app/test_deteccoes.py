@@ -0,0 +1,23 @@
+import numpy as np
+from app.services.deteccoes import Deteccoes
+
+
+def test_concatenar_reconcilia_categorias_e_conta_por_tipo():
+    a = Deteccoes([[0, 0, 1, 1], [2, 2, 3, 3]], [0.9, 0.8], [0, 1], ["comum", "idoso"])
+    b = Deteccoes([[4, 4, 5, 5]], [0.7], [0], ["idoso"])
+
+    todas = Deteccoes.concatenar([a, b])
+
+    assert todas.tipos().tolist() == ["comum", "idoso", "idoso"]
+    assert todas.contagem_por_tipo() == {"comum": 1, "idoso": 2}
+
+
+def test_filtrar_e_deslocar_preservam_colunas_paralelas():
+    d = Deteccoes([[0, 0, 2, 2], [10, 10, 12, 12]], [0.9, 0.8], [0, 0], ["comum"])
+    d = d.com_gps([1.0, 2.0], [3.0, 4.0]).deslocar(100, 50).filtrar(np.array([False, True]))
+
+    assert d.caixas.tolist() == [[110, 60, 112, 62]]
+    assert d.como_dicts() == [{
+        "tipo": "comum", "box_pixels": [110, 60, 112, 62],
+        "confianca": np.float32(0.8).item(), "coords_gps": {"lat": 2.0, "lon": 4.0},
+    }]
@@ -0,0 +1,23 @@
+import io
+from PIL import Image
+from app.services import image_encoder
+
+
+def test_escolher_formato_prioriza_parametro_e_negocia_accept():
+    assert image_encoder.escolher_formato("png", "image/webp,*/*") == "png"
+    assert image_encoder.escolher_formato(None, "image/avif,image/webp,*/*") == "webp"
+    assert image_encoder.escolher_formato(None, "*/*") == "jpeg"
+    assert image_encoder.escolher_formato(None, "image/webp;q=0, */*") == "jpeg"
+    assert image_encoder.escolher_formato(None, "image/jpeg, image/webp;q=0.5") == "jpeg"
+    assert image_encoder.escolher_formato(None, None) == "jpeg"
+
+
+def test_codificar_reduz_e_gera_formato_pedido():
+    imagem = Image.new("RGB", (1280, 640), (30, 120, 60))
+    for formato, nome_pil in (("jpeg", "JPEG"), ("webp", "WEBP"), ("png", "PNG")):
+        dados = image_encoder.codificar(imagem, formato, qualidade=70, largura_max=500)
+        lida = Image.open(io.BytesIO(dados))
+        assert lida.format == nome_pil
+        assert lida.size == (500, 250)
+    # Fator inteiro usa redução por blocos
+    assert image_encoder.redimensionar(imagem, 640).size == (640, 320)
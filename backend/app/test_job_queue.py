@@ -0,0 +1,110 @@
+import asyncio
+from app.schemas.parking_schema import PontoGPS
+from app.services.job_queue import BackendFilaMemoria, FilaAnalises, CONCLUIDO, ERRO, PENDENTE
+
+PONTOS = [PontoGPS(lat=-10.9472, lon=-37.0731)] * 3
+
+
+def test_job_reporta_progresso_e_resultado_aos_assinantes():
+    async def analisar(pontos, ao_progredir):
+        for fracao in (0.2, 0.6):
+            ao_progredir("baixando_imagem", fracao)
+            await asyncio.sleep(0.02)
+        return {"sumario": {"total_de_vagas_identificadas": len(pontos)}}
+
+    async def cenario():
+        fila = FilaAnalises(BackendFilaMemoria(), analisar, workers=1, intervalo_progresso=0)
+        job = await fila.submeter(PONTOS)
+        eventos = []
+
+        async def acompanhar():
+            async for estado in fila.acompanhar(job["id"]):
+                eventos.append(estado)
+
+        acompanhamento = asyncio.create_task(acompanhar())
+        await asyncio.sleep(0)
+        await fila.iniciar()
+        await asyncio.wait_for(acompanhamento, 5)
+        final = await fila.obter(job["id"])
+        await fila.fechar()
+        return eventos, final
+
+    eventos, final = asyncio.run(cenario())
+
+    assert eventos[-1]["status"] == CONCLUIDO
+    assert 0.6 in [e["progresso"] for e in eventos if e.get("etapa") == "baixando_imagem"]
+    assert final["resultado"] == {"sumario": {"total_de_vagas_identificadas": 3}}
+
+
+def test_job_com_falha_registra_erro():
+    async def analisar(pontos, ao_progredir):
+        raise RuntimeError("sem imagem")
+
+    async def cenario():
+        fila = FilaAnalises(BackendFilaMemoria(), analisar, workers=2, intervalo_progresso=0)
+        await fila.iniciar()
+        job = await fila.submeter(PONTOS)
+        estados = [e async for e in fila.acompanhar(job["id"])]
+        await fila.fechar()
+        return estados[-1], fila.estatisticas()
+
+    final, estatisticas = asyncio.run(cenario())
+
+    assert final["status"] == ERRO and final["erro"] == "sem imagem"
+    assert estatisticas["falhas"] == 1
+
+
+def test_worker_continua_apos_erro_do_backend():
+    class BackendInstavel(BackendFilaMemoria):
+        falhar = True
+
+        async def salvar(self, job, ttl):
+            if self.falhar and job.get("status") != PENDENTE:
+                self.falhar = False
+                raise ConnectionError("backend indisponível")
+            await super().salvar(job, ttl)
+
+    async def analisar(pontos, ao_progredir):
+        return {"sumario": {"total_de_vagas_identificadas": len(pontos)}}
+
+    async def cenario():
+        fila = FilaAnalises(BackendInstavel(), analisar, workers=1, intervalo_progresso=0)
+        await fila.iniciar()
+        perdido = await fila.submeter(PONTOS)
+        job = await fila.submeter(PONTOS)
+        estados = await asyncio.wait_for(_ultimo_estado(fila, job["id"]), 5)
+        await fila.fechar()
+        return estados, await fila.obter(perdido["id"]), fila.estatisticas()
+
+    final, perdido, estatisticas = asyncio.run(cenario())
+
+    assert final["status"] == CONCLUIDO
+    assert perdido["status"] == ERRO
+    assert estatisticas["falhas"] == 1 and estatisticas["processados"] == 1
+
+
+async def _ultimo_estado(fila, job_id):
+    return [e async for e in fila.acompanhar(job_id)][-1]
+
+
+def test_falha_ao_gravar_resultado_termina_job_com_erro():
+    class BackendSemResultado(BackendFilaMemoria):
+        async def salvar(self, job, ttl):
+            if job.get("status") == CONCLUIDO:
+                raise ConnectionError("backend indisponível")
+            await super().salvar(job, ttl)
+
+    async def analisar(pontos, ao_progredir):
+        return {"sumario": {"total_de_vagas_identificadas": len(pontos)}}
+
+    async def cenario():
+        fila = FilaAnalises(BackendSemResultado(), analisar, workers=1, intervalo_progresso=0)
+        await fila.iniciar()
+        job = await fila.submeter(PONTOS)
+        final = await asyncio.wait_for(_ultimo_estado(fila, job["id"]), 5)
+        await fila.fechar()
+        return final
+
+    final = asyncio.run(cenario())
+
+    assert final["status"] == ERRO and "backend indisponível" in final["erro"]
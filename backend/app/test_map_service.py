@@ -0,0 +1,59 @@
+import asyncio
+import numpy as np
+from app.schemas.parking_schema import PontoGPS
+from app.services import map_service
+from app.services.buffer_pool import PoolBuffers
+
+
+def test_tiles_do_poligono_ignora_tiles_fora_do_triangulo():
+    # Triângulo cobrindo a metade superior esquerda de um bloco 3x3 de tiles
+    t = map_service.TILE_SIZE
+    triangulo = [(10, 10), (3 * t - 10, 10), (10, 3 * t - 10)]
+    tiles = map_service.tiles_do_poligono(triangulo, 20)
+    assert (0, 0) in tiles and (2, 0) in tiles and (0, 2) in tiles
+    assert (2, 2) not in tiles
+    assert len(tiles) < 9
+
+
+def test_mosaico_de_tiles_cola_no_buffer_do_pool_e_mascara(monkeypatch):
+    pool = PoolBuffers(max_bytes=64 * 1024 * 1024)
+    monkeypatch.setattr(map_service, "pool_mosaicos", pool)
+    t = map_service.TILE_SIZE
+    plano = map_service.PlanoMosaico(
+        zoom=20, poligono_global=[(100, 100), (400, 100), (100, 400)],
+        origem_x=100, origem_y=100, largura=300, altura=300, tiles=[(0, 0), (1, 0), (0, 1)],
+    )
+    tile = np.full((t, t, 3), 200, dtype=np.uint8)
+    mosaico = map_service.montar_mosaico_de_tiles(plano, {(0, 0): tile, (1, 0): tile, (0, 1): tile})
+
+    assert mosaico.imagem.shape == (300, 300, 3)
+    assert mosaico.imagem[10, 10].tolist() == [200, 200, 200]   # dentro do triângulo
+    assert mosaico.imagem[290, 290].tolist() == [0, 0, 0]       # fora: mascarado
+    mosaico.liberar()
+    mosaico.liberar()
+    assert pool.estatisticas()["em_uso"] == 0 and pool.estatisticas()["livres"] == 1
+
+
+def test_fallback_selenium_captura_no_zoom_do_plano(monkeypatch):
+    capturas = []
+
+    async def tiles_falham(plano, ao_progredir=None):
+        raise RuntimeError("sem tiles")
+
+    def selenium_falso(bbox, width, height, zoom=map_service.ZOOM_PADRAO):
+        capturas.append(zoom)
+        return np.full((height, width, 3), 100, dtype=np.uint8)
+
+    monkeypatch.setattr(map_service, "_montar_mosaico_tiles_async", tiles_falham)
+    monkeypatch.setattr(map_service, "obter_imagem_satelite", selenium_falso)
+    pontos = [PontoGPS(lat=-10.9466, lon=-37.0738), PontoGPS(lat=-10.9466, lon=-37.0724),
+              PontoGPS(lat=-10.9477, lon=-37.0724)]
+
+    mosaico = asyncio.run(map_service.obter_mosaico_poligono_async(pontos, zoom=17, max_retries=1))
+
+    assert capturas == [17]
+    assert mosaico.zoom == 17
+    # O polígono em pixels (zoom 17) cabe na captura centralizada
+    xs, ys = zip(*mosaico.poligono_pixels)
+    altura, largura = mosaico.imagem.shape[:2]
+    assert 0 <= min(xs) and max(xs) <= largura and 0 <= min(ys) and max(ys) <= altura
@@ -0,0 +1,27 @@
+import numpy as np
+from app.services import projecao, geo_service
+
+
+def test_gps_pixel_ida_e_volta_vetorizado():
+    lats = np.array([-10.9472, 0.0, 51.5])
+    lons = np.array([-37.0731, 0.0, -0.12])
+    x, y = projecao.gps_para_pixel(lats, lons, 20)
+    lat2, lon2 = projecao.pixel_para_gps(x, y, 20)
+    np.testing.assert_allclose(lat2, lats, atol=1e-9)
+    np.testing.assert_allclose(lon2, lons, atol=1e-9)
+
+
+def test_caixas_para_gps_usa_origem_da_imagem():
+    # Origem no canto do tile (0, 0) do zoom 1: o centro da imagem global é (0, 0)
+    p = projecao.ProjecaoImagem(zoom=1, origem_x=0, origem_y=0)
+    lat, lon = p.caixas_para_gps([[246, 246, 266, 266], [0, 0, 0, 0]])
+    np.testing.assert_allclose([lat[0], lon[0]], [0.0, 0.0], atol=1e-9)
+    assert lon[1] == -180.0 and lat[1] > 85
+
+
+def test_pontos_no_poligono_igual_ao_escalar():
+    poligono = [(0, 0), (10, 0), (10, 10), (5, 4), (0, 10)]
+    xs, ys = np.meshgrid(np.linspace(-1, 11, 25), np.linspace(-1, 11, 25))
+    vetorizado = geo_service.pontos_no_poligono(xs, ys, poligono)
+    escalar = [[geo_service.ponto_no_poligono(x, y, poligono) for x, y in zip(lx, ly)] for lx, ly in zip(xs, ys)]
+    assert (vetorizado == np.array(escalar)).all()
@@ -0,0 +1,35 @@
+import asyncio
+from app.schemas.parking_schema import PontoGPS
+from app.services.result_cache import BackendMemoria, CacheResultados
+
+PONTOS = [
+    PontoGPS(lat=-10.94720, lon=-37.07310),
+    PontoGPS(lat=-10.94750, lon=-37.07280),
+    PontoGPS(lat=-10.94790, lon=-37.07330),
+]
+
+
+def test_cache_resultados_grava_le_e_invalida():
+    cache = CacheResultados(BackendMemoria(), ttl=60, versao_modelo="v1", precisao=5)
+    chave = cache.chave(PONTOS, 20)
+
+    async def cenario():
+        assert await cache.obter(chave) is None
+        await cache.salvar(chave, {"sumario": {"total_de_vagas_identificadas": 3}})
+        lido = await cache.obter(chave)
+        removidos = await cache.invalidar(chave)
+        return lido, removidos, await cache.obter(chave)
+
+    lido, removidos, depois = asyncio.run(cenario())
+    assert lido == {"sumario": {"total_de_vagas_identificadas": 3}}
+    assert removidos == 1 and depois is None
+
+
+def test_chave_quantiza_pontos_e_inclui_versao_do_modelo():
+    v1 = CacheResultados(BackendMemoria(), versao_modelo="v1", precisao=5)
+    v2 = CacheResultados(BackendMemoria(), versao_modelo="v2", precisao=5)
+    ruidoso = [PontoGPS(lat=p.lat + 1e-7, lon=p.lon - 1e-7) for p in PONTOS]
+
+    assert v1.chave(PONTOS, 20) == v1.chave(ruidoso, 20)
+    assert v1.chave(PONTOS, 20) != v1.chave(PONTOS, 19)
+    assert v1.chave(PONTOS, 20) != v2.chave(PONTOS, 20)
@@ -0,0 +1,38 @@
+import json
+from app.services import geo_service, serializacao
+from app.services.deteccoes import Deteccoes
+
+VAGAS = Deteccoes.de_gps(["comum", "idoso", "comum"], [-10.9, -10.91, -10.92], [-37.0, -37.1, -37.2])
+RESULTADO = {
+    "sumario": {"total_de_vagas_identificadas": 3},
+    "vagas": geo_service.vagas_compactas(VAGAS),
+}
+FEATURES = [
+    {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]},
+     "properties": {"id": i, "tipo_vaga": tipo}}
+    for i, (tipo, lat, lon) in enumerate([("comum", -10.9, -37.0), ("idoso", -10.91, -37.1), ("comum", -10.92, -37.2)])
+]
+
+
+def test_resultado_json_em_partes_equivale_ao_documento_completo():
+    esperado = {"sumario": RESULTADO["sumario"], "vagas_geojson": {"type": "FeatureCollection", "features": FEATURES}}
+    for tamanho_lote in (1, 2, 10):
+        corpo = b"".join(serializacao.resultado_json_em_partes(RESULTADO, tamanho_lote))
+        assert json.loads(corpo) == esperado
+
+
+def test_resultado_sem_vagas_gera_feature_collection_vazia():
+    vazio = {"sumario": {"total_de_vagas_identificadas": 0}, "vagas": geo_service.vagas_compactas(Deteccoes.vazio())}
+    corpo = json.loads(b"".join(serializacao.resultado_json_em_partes(vazio)))
+    assert corpo["vagas_geojson"] == {"type": "FeatureCollection", "features": []}
+
+
+def test_features_ndjson_uma_feature_por_linha():
+    linhas = b"".join(serializacao.features_ndjson_em_partes(RESULTADO, 2)).decode().splitlines()
+    assert [json.loads(l) for l in linhas] == FEATURES
+
+
+def test_objeto_com_resultado_embute_o_geojson():
+    corpo = json.loads(b"".join(serializacao.objeto_com_resultado_em_partes({"indice": 4}, RESULTADO, 2)))
+    assert corpo["indice"] == 4
+    assert corpo["resultado"]["vagas_geojson"]["features"] == FEATURES
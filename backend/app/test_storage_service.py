@@ -0,0 +1,74 @@
+from app.services import geo_service
+from app.services.deteccoes import Deteccoes
+from app.services.storage_service import RepositorioAnalises, vagas_dentro_do_bbox
+
+BBOX = {"min_lat": -10.9480, "max_lat": -10.9470, "min_lon": -37.0735, "max_lon": -37.0725}
+VAGAS = Deteccoes.de_gps(["comum", "idoso"], [-10.9475, -10.9471], [-37.0730, -37.0726])
+
+
+def _repositorio(tmp_path):
+    repo = RepositorioAnalises(f"sqlite:///{tmp_path / 'teste.db'}")
+    repo.criar_tabelas()
+    return repo
+
+
+def test_busca_analise_que_cobre_o_bbox(tmp_path):
+    repo = _repositorio(tmp_path)
+    repo.salvar(BBOX, VAGAS, zoom=20, versao_modelo="v1")
+
+    menor = {"min_lat": -10.9478, "max_lat": -10.9473, "min_lon": -37.0733, "max_lon": -37.0728}
+    analise = repo.buscar_cobrindo(menor, 20, versao_modelo="v1", max_idade=3600)
+
+    assert analise is not None and analise.total_vagas == 2
+    recortadas = vagas_dentro_do_bbox(analise, menor)
+    assert recortadas.tipos().tolist() == ["comum"]
+    assert (recortadas.lat.tolist(), recortadas.lon.tolist()) == ([-10.9475], [-37.0730])
+    assert repo.buscar_cobrindo(menor, 20, versao_modelo="v2") is None
+    assert repo.buscar_cobrindo(menor, 19, versao_modelo="v1") is None
+
+
+def test_remover_sobrepostas_ignora_areas_disjuntas(tmp_path):
+    repo = _repositorio(tmp_path)
+    repo.salvar(BBOX, VAGAS, zoom=20, versao_modelo="v1")
+
+    vizinho = {"min_lat": -10.9472, "max_lat": -10.9460, "min_lon": -37.0728, "max_lon": -37.0710}
+    longe = {"min_lat": -11.0, "max_lat": -10.99, "min_lon": -37.0, "max_lon": -36.99}
+
+    assert repo.buscar_cobrindo(vizinho, 20) is None
+    assert repo.remover_sobrepostas(longe) == 0
+    assert repo.remover_sobrepostas(vizinho) == 1
+    assert repo.buscar_cobrindo(BBOX, 20) is None
+
+
+def test_busca_cobrindo_exige_que_o_poligono_armazenado_contenha_o_pedido(tmp_path):
+    repo = _repositorio(tmp_path)
+    # Triângulos complementares com o mesmo bbox
+    a = [(BBOX["min_lat"], BBOX["min_lon"]), (BBOX["max_lat"], BBOX["min_lon"]), (BBOX["max_lat"], BBOX["max_lon"])]
+    b = [(BBOX["min_lat"], BBOX["min_lon"]), (BBOX["min_lat"], BBOX["max_lon"]), (BBOX["max_lat"], BBOX["max_lon"])]
+    repo.salvar(BBOX, VAGAS, zoom=20, versao_modelo="v1", poligono=a)
+
+    assert repo.buscar_cobrindo(BBOX, 20, poligono=a) is not None
+    assert repo.buscar_cobrindo(BBOX, 20, poligono=b) is None
+
+    menor = {"min_lat": -10.9478, "max_lat": -10.9473, "min_lon": -37.0733, "max_lon": -37.0728}
+    dentro_de_a = [(-10.9476, -37.0733), (-10.9473, -37.0733), (-10.9473, -37.0730)]
+    assert repo.buscar_cobrindo(menor, 20, poligono=dentro_de_a) is not None
+
+
+def test_busca_cobrindo_ignora_analises_sem_poligono(tmp_path):
+    repo = _repositorio(tmp_path)
+    repo.salvar(BBOX, VAGAS, zoom=20, versao_modelo="v1")
+    retangulo = [(BBOX["min_lat"], BBOX["min_lon"]), (BBOX["min_lat"], BBOX["max_lon"]),
+                 (BBOX["max_lat"], BBOX["max_lon"]), (BBOX["max_lat"], BBOX["min_lon"])]
+
+    assert repo.buscar_cobrindo(BBOX, 20) is not None
+    assert repo.buscar_cobrindo(BBOX, 20, poligono=retangulo) is None
+
+
+def test_poligono_contem_considera_reentrancias():
+    em_u = [(0, 0), (3, 0), (3, 3), (2, 3), (2, 1), (1, 1), (1, 3), (0, 3)]
+    assert geo_service.poligono_contem(em_u, [(0, 0), (3, 0), (3, 1), (0, 1)])
+    assert geo_service.poligono_contem(em_u, em_u)
+    # Retângulo sobre a reentrância do U: vértices dentro, mas cobre área não analisada
+    assert not geo_service.poligono_contem(em_u, [(0.5, 0.5), (2.5, 0.5), (2.5, 2.5), (0.5, 2.5)])
+    assert not geo_service.poligono_contem(em_u, [(0, 2), (3, 2), (3, 2.5), (0, 2.5)])
@@ -0,0 +1,68 @@
+import time
+from app.services.tile_cache import CacheTilesDisco, CacheLRUMemoria
+
+
+def test_cache_disco_grava_e_le(tmp_path):
+    cache = CacheTilesDisco(str(tmp_path), max_bytes=10_000, ttl=60)
+
+    assert cache.obter(20, 1, 2) is None
+    cache.salvar(20, 1, 2, b"tile")
+    assert cache.obter(20, 1, 2) == b"tile"
+
+
+def test_cache_disco_expira_por_ttl(tmp_path):
+    cache = CacheTilesDisco(str(tmp_path), max_bytes=10_000, ttl=0.05)
+
+    cache.salvar(20, 1, 2, b"tile")
+    time.sleep(0.1)
+    assert cache.obter(20, 1, 2) is None
+
+
+def test_cache_disco_remove_menos_usados(tmp_path):
+    cache = CacheTilesDisco(str(tmp_path), max_bytes=250, ttl=60)
+
+    cache.salvar(20, 0, 0, b"a" * 100)
+    cache.salvar(20, 1, 0, b"b" * 100)
+    cache.obter(20, 0, 0)  # (0, 0) passa a ser o mais recente
+    cache.salvar(20, 2, 0, b"c" * 100)
+
+    assert cache.obter(20, 1, 0) is None
+    assert cache.obter(20, 0, 0) == b"a" * 100
+    assert cache.obter(20, 2, 0) == b"c" * 100
+    assert cache.tamanho_total() <= 250
+
+
+def test_cache_memoria_limita_por_bytes_e_conta_acertos():
+    cache = CacheLRUMemoria(max_bytes=10, medir_tamanho=len)
+
+    cache.salvar("a", b"12345")
+    cache.salvar("b", b"12345")
+    assert cache.obter("a") == b"12345"
+    cache.salvar("c", b"12345")  # excede o limite e remove "b"
+
+    assert cache.obter("b") is None
+    assert cache.obter("c") == b"12345"
+    stats = cache.estatisticas()
+    assert (stats["acertos"], stats["falhas"], stats["bytes"]) == (2, 1, 10)
+
+
+def test_cache_disco_grava_acessos_em_lote_e_confere_limite_por_estimativa(tmp_path, monkeypatch):
+    cache = CacheTilesDisco(str(tmp_path), max_bytes=10_000, ttl=60, acessos_por_lote=3, verificar_a_cada=100)
+    somas = []
+    tamanho_total = cache.tamanho_total
+    monkeypatch.setattr(cache, "tamanho_total", lambda: somas.append(1) or tamanho_total())
+
+    for x in range(5):
+        cache.salvar(20, x, 0, b"t" * 100)
+    # Só a primeira gravação faz a soma completa; as demais usam a estimativa
+    assert len(somas) == 1
+
+    def acessado_em(x):
+        return cache._conexao().execute("SELECT acessado_em FROM tiles WHERE x = ?", (x,)).fetchone()[0]
+
+    antes = acessado_em(0)
+    cache.obter(20, 0, 0)
+    cache.obter(20, 1, 0)
+    assert acessado_em(0) == antes
+    cache.obter(20, 2, 0)  # completa o lote
+    assert acessado_em(0) > antes
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from PIL import Image
+from app.services import tile_fetcher
+
+
+def test_baixar_tiles_conta_sucessos_e_falhas(monkeypatch):
+    def baixar_tile_falso(tx, ty, zoom, cliente):
+        if tx == 1:
+            return None
+        if tx == 2:
+            raise IOError("erro de rede")
+        return Image.new("RGB", (256, 256))
+
+    monkeypatch.setattr(tile_fetcher, "baixar_tile", baixar_tile_falso)
+
+    recebidos = []
+    baixados, falhas = tile_fetcher.baixar_tiles(
+        [(0, 0), (1, 0), (2, 0), (3, 0)], 20,
+        lambda tx, ty, img: recebidos.append((tx, ty)), cliente=None,
+    )
+
+    assert (baixados, falhas) == (2, 2)
+    assert sorted(recebidos) == [(0, 0), (3, 0)]
+
+
+def test_baixar_tiles_respeita_prazo(monkeypatch):
+    def baixar_tile_lento(tx, ty, zoom, cliente):
+        if tx == 0:
+            return Image.new("RGB", (256, 256))
+        time.sleep(2)
+        return Image.new("RGB", (256, 256))
+
+    monkeypatch.setattr(tile_fetcher, "baixar_tile", baixar_tile_lento)
+
+    inicio = time.monotonic()
+    baixados, falhas = tile_fetcher.baixar_tiles(
+        [(0, 0), (1, 0)], 20, lambda *args: None, cliente=None, prazo=0.3,
+    )
+
+    assert time.monotonic() - inicio < 1.5
+    assert (baixados, falhas) == (1, 1)
+
+
+def test_baixar_tiles_async_conta_sucessos_e_falhas(monkeypatch):
+    async def baixar_tile_falso(tx, ty, zoom, cliente):
+        if tx == 1:
+            return None
+        if tx == 2:
+            await asyncio.sleep(2)
+        return Image.new("RGB", (256, 256))
+
+    monkeypatch.setattr(tile_fetcher, "baixar_tile_async", baixar_tile_falso)
+
+    recebidos = []
+    baixados, falhas = asyncio.run(tile_fetcher.baixar_tiles_async(
+        [(0, 0), (1, 0), (2, 0), (3, 0)], 20,
+        lambda tx, ty, img: recebidos.append((tx, ty)), cliente=None, prazo=0.3,
+    ))
+
+    assert (baixados, falhas) == (2, 2)
+    assert sorted(recebidos) == [(0, 0), (3, 0)]
+
+
+def test_cliente_async_por_loop_e_fechado_no_encerramento():
+    from app.services.http_client import ClienteHttp
+
+    cliente = ClienteHttp()
+
+    async def obter():
+        return cliente._obter_cliente_async()[0]
+
+    primeiro = asyncio.run(obter())
+    segundo = asyncio.run(obter())
+    assert primeiro is not segundo
+    # O cliente do loop já encerrado é descartado ao criar o do novo loop
+    assert len(cliente._clientes_async) == 1
+
+    async def usar_e_fechar():
+        atual = cliente._obter_cliente_async()[0]
+        await cliente.fechar_async()
+        return atual
+
+    assert asyncio.run(usar_e_fechar()).is_closed
+    assert cliente._clientes_async == {}
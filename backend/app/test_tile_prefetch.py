@@ -0,0 +1,84 @@
+import asyncio
+from app.schemas.parking_schema import AreaPrefetch
+from app.services import tile_prefetch
+from app.services.tile_cache import CacheTilesDisco
+
+
+class RespostaFalsa:
+    status_code = 200
+    content = b"tile"
+
+
+class ClienteFalso:
+    def __init__(self):
+        self.urls = []
+
+    async def get_async(self, url):
+        self.urls.append(url)
+        return RespostaFalsa()
+
+
+BBOX = AreaPrefetch(bbox={"min_lat": -10.9480, "min_lon": -37.0740, "max_lat": -10.9470, "max_lon": -37.0725})
+TRIANGULO = AreaPrefetch(pontos=[
+    {"lat": -10.9470, "lon": -37.0740}, {"lat": -10.9470, "lon": -37.0725}, {"lat": -10.9480, "lon": -37.0740},
+])
+
+
+def test_poligono_usa_subconjunto_dos_tiles_do_bbox():
+    tiles_bbox = set(tile_prefetch.tiles_da_area(BBOX, 20))
+    tiles_triangulo = set(tile_prefetch.tiles_da_area(TRIANGULO, 20))
+
+    assert tiles_triangulo < tiles_bbox
+    assert tile_prefetch.planejar([BBOX, TRIANGULO], [20, 20])[20] == sorted(tiles_bbox)
+
+
+def test_prefetch_baixa_em_lotes_e_pula_tiles_frescos(tmp_path):
+    cache = CacheTilesDisco(str(tmp_path), max_bytes=10_000_000, ttl=60)
+    plano = tile_prefetch.planejar([BBOX], [20])
+    tx, ty = plano[20][0]
+    cache.salvar(20, tx, ty, b"fresco")
+    cliente = ClienteFalso()
+    progressos = []
+
+    progresso = asyncio.run(tile_prefetch.prefetch(
+        plano, cliente, cache, concorrencia=2, tamanho_lote=3, pausa=0, ao_progredir=progressos.append,
+    ))
+
+    total = len(plano[20])
+    assert progresso["frescos"] == 1 and progresso["baixados"] == total - 1 and progresso["falhas"] == 0
+    assert len(cliente.urls) == total - 1
+    assert cache.tiles_frescos(20, plano[20]) == set(plano[20])
+    # Sem margem suficiente de validade, o tile volta a ser baixado
+    assert cache.tiles_frescos(20, plano[20], validade_min=120) == set()
+    assert len(progressos) >= 2
+
+
+def test_gerenciador_limita_execucoes_simultaneas(monkeypatch, tmp_path):
+    cache = CacheTilesDisco(str(tmp_path), max_bytes=10_000_000, ttl=60)
+    monkeypatch.setattr(tile_prefetch.tile_fetcher, "obter_cache_disco", lambda: cache)
+    liberar = asyncio.Event()
+
+    async def prefetch_bloqueado(*args, **kwargs):
+        await liberar.wait()
+        return {}
+
+    monkeypatch.setattr(tile_prefetch, "prefetch", prefetch_bloqueado)
+    pedido = tile_prefetch.PrefetchRequest(areas=[BBOX], zooms=[20])
+
+    async def cenario():
+        gerenciador = tile_prefetch.GerenciadorPrefetch(max_simultaneos=1)
+        await gerenciador.iniciar(pedido)
+        try:
+            await gerenciador.iniciar(pedido)
+        except RuntimeError:
+            recusado = True
+        else:
+            recusado = False
+        liberar.set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        await gerenciador.iniciar(pedido)
+        await gerenciador.fechar()
+        return recusado
+
+    assert asyncio.run(cenario())
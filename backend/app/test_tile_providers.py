@@ -0,0 +1,85 @@
+import io
+import asyncio
+import sqlite3
+from PIL import Image
+from app.services import mbtiles_export, tile_cache, tile_fetcher, tile_providers
+from app.services.http_client import ClienteHttp
+from app.services.tile_cache import CacheTilesDisco
+from app.services.tile_providers import ProvedorDiretorio, ProvedorMBTiles, ProvedorXYZ
+from app.services.tile_server import ServidorTiles
+
+
+def test_mbtiles_inverte_eixo_y_do_esquema_tms(tmp_path):
+    caminho = str(tmp_path / "tiles.mbtiles")
+    with sqlite3.connect(caminho) as conn:
+        conn.execute("CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)")
+        conn.execute("INSERT INTO tiles VALUES (2, 1, 3, ?)", (b"tile",))  # y XYZ = 2^2 - 1 - 3 = 0
+
+    provedor = ProvedorMBTiles(caminho)
+    assert provedor.obter(2, 1, 0) == b"tile"
+    assert provedor.obter(2, 1, 3) is None
+
+
+def test_diretorio_procura_extensoes_conhecidas(tmp_path):
+    (tmp_path / "20" / "5").mkdir(parents=True)
+    (tmp_path / "20" / "5" / "7.png").write_bytes(b"png")
+
+    provedor = ProvedorDiretorio(str(tmp_path))
+    assert provedor.obter(20, 5, 7) == b"png"
+    assert provedor.obter(20, 5, 8) is None
+
+
+def test_servidor_local_serve_tiles_e_injeta_erros():
+    cliente = ClienteHttp(max_tentativas=1)
+    try:
+        with ServidorTiles(semente=1) as servidor:
+            conteudo = ProvedorXYZ(servidor.url_modelo).obter(20, 3, 4, cliente)
+            assert Image.open(io.BytesIO(conteudo)).size == (256, 256)
+
+        with ServidorTiles(taxa_erro=1.0) as servidor:
+            assert ProvedorXYZ(servidor.url_modelo).obter(20, 3, 4, cliente) is None
+            assert servidor.estatisticas()["erros_injetados"] == 1
+    finally:
+        cliente.fechar()
+
+
+def _jpeg(cor):
+    buffer = io.BytesIO()
+    Image.new("RGB", (256, 256), cor).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_exporta_cache_para_mbtiles_e_le_mosaico_em_uma_consulta(tmp_path, monkeypatch):
+    cache = CacheTilesDisco(str(tmp_path / "cache"), max_bytes=10_000_000, ttl=60)
+    agua, terra = _jpeg((0, 0, 200)), _jpeg((0, 150, 0))
+    cache.salvar(18, 100, 200, agua)
+    cache.salvar(18, 101, 200, agua)
+    cache.salvar(18, 100, 201, terra)
+
+    caminho = str(tmp_path / "offline.mbtiles")
+    relatorio = mbtiles_export.exportar(cache, caminho)
+    assert (relatorio["tiles"], relatorio["imagens"], relatorio["zooms"]) == (3, 2, [18])
+
+    provedor = ProvedorMBTiles(caminho)
+    assert provedor.obter(18, 100, 201) == terra
+    assert set(provedor.obter_varios(18, [(100, 200), (101, 200), (101, 201)])) == {(100, 200), (101, 200)}
+
+    consultas = []
+    obter_varios = provedor.obter_varios
+    monkeypatch.setattr(provedor, "obter_varios", lambda *a: consultas.append(a) or obter_varios(*a))
+    monkeypatch.setattr(tile_fetcher, "provedor", provedor)
+    tile_cache.cache_memoria.limpar()
+
+    recebidos = {}
+    baixados, falhas = asyncio.run(tile_fetcher.baixar_tiles_async(
+        [(100, 200), (101, 200), (100, 201), (101, 201)], 18,
+        lambda tx, ty, tile: recebidos.__setitem__((tx, ty), tile), cliente=None,
+    ))
+
+    assert (baixados, falhas) == (3, 1) and len(consultas) == 1
+    assert recebidos[(100, 201)][0, 0, 1] > 100  # verde (terra)
+
+
+def test_faixas_por_coluna_agrupa_apenas_linhas_consecutivas():
+    tiles = [(10, 5), (10, 6), (10, 7), (10, 9), (11, 5), (900, 4000), (10, 6)]
+    assert tile_providers._faixas_por_coluna(tiles) == [(10, 5, 7), (10, 9, 9), (11, 5, 5), (900, 4000, 4000)]
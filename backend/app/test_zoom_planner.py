@@ -0,0 +1,25 @@
+from app.schemas.parking_schema import PontoGPS
+from app.services import zoom_planner
+
+
+def _quadrado(lado_graus, lat=-10.9472, lon=-37.0731):
+    return [
+        PontoGPS(lat=lat, lon=lon),
+        PontoGPS(lat=lat, lon=lon + lado_graus),
+        PontoGPS(lat=lat + lado_graus, lon=lon + lado_graus),
+        PontoGPS(lat=lat + lado_graus, lon=lon),
+    ]
+
+
+def test_planejar_zoom_escolhe_menor_zoom_que_resolve_a_vaga():
+    plano = zoom_planner.planejar_zoom(_quadrado(0.001), zoom_min=16, zoom_max=21, vaga_min_pixels=12)
+    assert plano.vaga_pixels >= 12
+    assert zoom_planner.planejar_zoom(_quadrado(0.001), zoom_min=16, zoom_max=21, vaga_min_pixels=6).zoom == plano.zoom - 1
+    assert not plano.resolucao_reduzida
+
+
+def test_planejar_zoom_reduz_resolucao_para_caber_no_orcamento():
+    plano = zoom_planner.planejar_zoom(_quadrado(0.02), zoom_max=20, vaga_min_pixels=12, orcamento_tiles=100)
+    assert plano.tiles <= 100
+    assert plano.zoom < 20
+    assert plano.resolucao_reduzida
@@ -1,6 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.router import api_router
+from app.services import map_service, ai_service
+from app.services.result_cache import cache_resultados
+from app.services.storage_service import repositorio_analises
+from app.services.job_queue import fila_analises
+from app.services.tile_prefetch import gerenciador_prefetch
+import asyncio
 import logging
 import os
 
@@ -64,9 +70,22 @@ def read_root():
 async def startup_event():
     logger.info("🚀 Iniciando S-I-P API...")
     logger.info("📚 Documentação disponível em: /docs")
+    await map_service.iniciar()
+    await ai_service.iniciar()
+    if repositorio_analises is not None:
+        try:
+            await asyncio.to_thread(repositorio_analises.criar_tabelas)
+        except Exception as e:
+            logger.warning(f"Banco de dados indisponível; análises não serão persistidas: {e}")
+    await fila_analises.iniciar()
     logger.info("✅ API pronta para receber requisições")
 
 # Evento de shutdown
 @app.on_event("shutdown")
 async def shutdown_event():
-    logger.info("👋 Encerrando S-I-P API...")
\ No newline at end of file
+    logger.info("👋 Encerrando S-I-P API...")
+    await fila_analises.fechar()
+    await gerenciador_prefetch.fechar()
+    await map_service.fechar()
+    await asyncio.to_thread(ai_service.fechar)
+    await cache_resultados.fechar()
\ No newline at end of file